@@ -9,11 +9,18 @@ State Management - 状态管理详解
 4. Checkpoint 持久化
 """
 
+import os
+import sys
 from typing import TypedDict, Annotated, Sequence
 from langgraph.graph import StateGraph, END
 from operator import add
 import json
 
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from shared.reducers import bounded_append
+
 
 # ==========================================
 # 1. 基础状态定义
@@ -45,15 +52,14 @@ class MessageState(TypedDict):
     iteration: int
 
 
-def append_with_limit(existing: list, new: list, limit: int = 10) -> list:
-    """自定义 reducer: 保持列表长度限制"""
-    combined = existing + new
-    return combined[-limit:]  # 只保留最后 limit 条
-
-
+# 自定义 reducer: 保持列表长度限制
+#
+# shared.reducers.bounded_append 基于 deque(maxlen=limit)：每次合并只复制仍会保留的
+# 旧条目再追加新条目，工作量为 O(limit + len(new))，与运行了多久无关；
+# 超出容量时自动丢弃最旧的条目。
 class LimitedMessageState(TypedDict):
     """带长度限制的消息状态"""
-    messages: Annotated[list[str], lambda x, y: append_with_limit(x, y, 5)]
+    messages: Annotated[Sequence[str], bounded_append(5)]  # 值是 deque
     metadata: dict
 
 
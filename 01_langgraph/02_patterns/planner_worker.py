@@ -12,11 +12,34 @@ Planner-Worker Pattern - 规划器-执行者模式
 > "规划器-执行者模式是编码任务的主导模式。
 > 规划器智能体将高级目标分解为一系列细粒度的步骤，
 > 执行者智能体然后逐一执行这些步骤。"
+
+执行模式：
+- sequential: Worker 自循环，逐个执行子任务
+- parallel:   Send 扇出，所有待执行子任务并发执行（受并发上限约束），
+              结果经 reducer 合并后再综合。N 个相互独立的子任务的
+              墙钟时间约等于单个子任务。只适用于没有依赖的子任务，
+              默认使用 independent_planner_node 规划互不依赖的子任务；
+              子任务有依赖时直接报错，应改用 dag。
+- dag:        按 dependencies 分波次调度：每一波并发执行所有依赖已完成的
+              子任务，关键路径上的子任务优先派发；失败的子任务会剪除其
+              所有下游。总耗时约等于关键路径长度。
 """
 
-from typing import TypedDict, Literal
+import time
+from operator import add
+from typing import Annotated, Callable, Optional, TypedDict, Literal
 from langgraph.graph import StateGraph, END
-import json
+from langgraph.types import Send
+
+
+# 模拟单个子任务的执行耗时（秒），用于观察串行 / 并行的墙钟时间差异
+WORKER_LATENCY_SECONDS = 0.5
+
+# 并行模式默认的最大并发数
+DEFAULT_MAX_CONCURRENCY = 4
+
+# 模拟执行失败的子任务 id（用于观察 dag 模式剪除下游）
+FAILING_SUBTASK_IDS: set[str] = set()
 
 
 # ==========================================
@@ -26,21 +49,48 @@ import json
 class SubTask(TypedDict):
     id: str
     description: str
-    status: Literal["pending", "in_progress", "completed", "failed"]
+    status: Literal["pending", "in_progress", "completed", "failed", "skipped"]
     result: str | None
+    # 依赖的子任务 id，全部完成后才能执行（dag 模式按此调度，parallel 模式要求为空）
+    dependencies: list[str]
+
+
+def merge_subtasks(existing: list[SubTask], updates: list[SubTask]) -> list[SubTask]:
+    """Reducer: 按 id 合并子任务更新
+
+    并行 Worker 各自只返回自己负责的子任务，这里按 id 覆盖旧值，
+    新出现的 id 追加到末尾，保持规划时的顺序。
+    """
+    if not existing:
+        return list(updates)
+
+    position = {st["id"]: i for i, st in enumerate(existing)}
+    merged = list(existing)
+    for st in updates:
+        if st["id"] in position:
+            merged[position[st["id"]]] = st
+        else:
+            position[st["id"]] = len(merged)
+            merged.append(st)
+    return merged
 
 
 class PlannerWorkerState(TypedDict):
     # 原始任务
     original_task: str
-    # 分解后的子任务
-    subtasks: list[SubTask]
-    # 当前执行的子任务索引
+    # 分解后的子任务（按 id 合并，支持并行 Worker 同时写入）
+    subtasks: Annotated[list[SubTask], merge_subtasks]
+    # 当前执行的子任务索引（仅串行模式使用）
     current_index: int
     # 最终结果
     final_result: str
     # 执行日志
-    execution_log: list[str]
+    execution_log: Annotated[list[str], add]
+
+
+class WorkerInput(TypedDict):
+    """并行模式下通过 Send 分发给单个 Worker 的输入"""
+    subtask: SubTask
 
 
 # ==========================================
@@ -63,70 +113,123 @@ def planner_node(state: PlannerWorkerState) -> PlannerWorkerState:
             "id": "1",
             "description": f"Analyze requirements for: {task}",
             "status": "pending",
-            "result": None
+            "result": None,
+            "dependencies": []
         },
         {
             "id": "2",
             "description": f"Design solution architecture",
             "status": "pending",
-            "result": None
+            "result": None,
+            "dependencies": ["1"]
         },
         {
             "id": "3",
             "description": f"Implement core functionality",
             "status": "pending",
-            "result": None
+            "result": None,
+            "dependencies": ["2"]
         },
         {
             "id": "4",
             "description": f"Write tests and documentation",
             "status": "pending",
-            "result": None
+            "result": None,
+            "dependencies": ["2"]
         }
     ]
     
-    state["subtasks"] = subtasks
-    state["current_index"] = 0
-    state["execution_log"].append(f"Planned {len(subtasks)} subtasks")
-    
     print(f"   Created {len(subtasks)} subtasks:")
     for st in subtasks:
         print(f"   - [{st['id']}] {st['description']}")
     
-    return state
+    return {
+        "subtasks": subtasks,
+        "current_index": 0,
+        "execution_log": [f"Planned {len(subtasks)} subtasks"]
+    }
+
+
+def independent_planner_node(state: PlannerWorkerState) -> PlannerWorkerState:
+    """
+    规划器：分解为互不依赖的子任务（parallel 模式默认使用）
+    
+    各子任务只依赖原始任务本身，可以同时执行。
+    """
+    print("\n📋 PLANNER: Decomposing task into independent subtasks...")
+    
+    task = state["original_task"]
+    aspects = ["password hashing", "session storage", "OAuth providers", "rate limiting"]
+    subtasks = [
+        {
+            "id": str(i),
+            "description": f"Research {aspect} options for: {task}",
+            "status": "pending",
+            "result": None,
+            "dependencies": []
+        }
+        for i, aspect in enumerate(aspects, start=1)
+    ]
+    
+    print(f"   Created {len(subtasks)} independent subtasks:")
+    for st in subtasks:
+        print(f"   - [{st['id']}] {st['description']}")
+    
+    return {
+        "subtasks": subtasks,
+        "current_index": 0,
+        "execution_log": [f"Planned {len(subtasks)} independent subtasks"]
+    }
 
 
 # ==========================================
 # Worker 节点
 # ==========================================
 
-def worker_node(state: PlannerWorkerState) -> PlannerWorkerState:
-    """
-    执行者：执行当前子任务
-    """
-    idx = state["current_index"]
-    subtask = state["subtasks"][idx]
-    
+def execute_subtask(subtask: SubTask) -> SubTask:
+    """执行单个子任务，返回更新后的子任务（不修改入参）"""
     print(f"\n⚙️ WORKER: Executing subtask [{subtask['id']}]")
     print(f"   Task: {subtask['description']}")
     
-    # 更新状态为进行中
-    state["subtasks"][idx]["status"] = "in_progress"
-    
     # 模拟执行（实际应用中调用 LLM 或工具）
-    result = f"Completed: {subtask['description']}"
-    
-    # 更新为完成
-    state["subtasks"][idx]["status"] = "completed"
-    state["subtasks"][idx]["result"] = result
-    state["execution_log"].append(f"Completed subtask {subtask['id']}")
+    time.sleep(WORKER_LATENCY_SECONDS)
+    if subtask["id"] in FAILING_SUBTASK_IDS:
+        error = f"Simulated failure: {subtask['description']}"
+        print(f"   ❌ Failed: {error}")
+        return {**subtask, "status": "failed", "result": error}
     
+    result = f"Completed: {subtask['description']}"
     print(f"   ✅ Result: {result}")
+    return {**subtask, "status": "completed", "result": result}
+
+
+def worker_node(state: PlannerWorkerState) -> PlannerWorkerState:
+    """
+    执行者：执行当前子任务（串行模式）
+    """
+    idx = state["current_index"]
+    done = execute_subtask(state["subtasks"][idx])
+    
+    return {
+        "subtasks": [done],
+        "execution_log": [f"{done['status'].capitalize()} subtask {done['id']}"],
+        # 移动到下一个
+        "current_index": idx + 1
+    }
+
+
+def parallel_worker_node(payload: WorkerInput) -> PlannerWorkerState:
+    """
+    执行者：执行 Send 分发来的单个子任务（并行模式）
     
-    # 移动到下一个
-    state["current_index"] += 1
+    只返回自己负责的子任务，由 merge_subtasks 合并回状态。
+    """
+    done = execute_subtask(payload["subtask"])
     
-    return state
+    return {
+        "subtasks": [done],
+        "execution_log": [f"{done['status'].capitalize()} subtask {done['id']} (parallel)"]
+    }
 
 
 # ==========================================
@@ -140,6 +243,123 @@ def should_continue(state: PlannerWorkerState) -> Literal["worker", "synthesize"
     return "synthesize"
 
 
+def dispatch_subtasks(state: PlannerWorkerState) -> list[Send] | Literal["synthesizer"]:
+    """并行模式：为每个待执行子任务生成一个 Send（map 步骤）
+
+    所有子任务同时扇出，不考虑执行顺序；有依赖的子任务需要用 dag 模式调度。
+    """
+    pending = [st for st in state["subtasks"] if st["status"] == "pending"]
+    if not pending:
+        return "synthesizer"
+    
+    dependent = [st["id"] for st in pending if st.get("dependencies")]
+    if dependent:
+        raise ValueError(
+            f"Subtasks {dependent} have dependencies; use mode='dag' instead of 'parallel'"
+        )
+    
+    print(f"\n🚀 DISPATCH: Fanning out {len(pending)} subtasks")
+    return [Send("parallel_worker", {"subtask": st}) for st in pending]
+
+
+# ==========================================
+# DAG 调度
+# ==========================================
+
+def critical_path_lengths(subtasks: list[SubTask]) -> dict[str, int]:
+    """计算每个子任务到终点的最长依赖链长度（含自身）
+
+    数值越大说明它越处在关键路径上，越应该优先派发。
+    """
+    dependents: dict[str, list[str]] = {st["id"]: [] for st in subtasks}
+    for st in subtasks:
+        for dep in st.get("dependencies", []):
+            if dep in dependents:
+                dependents[dep].append(st["id"])
+
+    lengths: dict[str, int] = {}
+    visiting: set[str] = set()
+
+    def visit(task_id: str) -> int:
+        if task_id in lengths:
+            return lengths[task_id]
+        if task_id in visiting:  # 依赖成环，交给调度器处理
+            return 0
+        visiting.add(task_id)
+        lengths[task_id] = 1 + max((visit(d) for d in dependents[task_id]), default=0)
+        visiting.discard(task_id)
+        return lengths[task_id]
+
+    for task_id in dependents:
+        visit(task_id)
+    return lengths
+
+
+def ready_subtasks(subtasks: list[SubTask]) -> list[SubTask]:
+    """依赖全部完成的待执行子任务，按关键路径长度降序排列"""
+    status = {st["id"]: st["status"] for st in subtasks}
+    ready = [
+        st for st in subtasks
+        if st["status"] == "pending"
+        and all(status.get(dep) == "completed" for dep in st.get("dependencies", []))
+    ]
+    lengths = critical_path_lengths(subtasks)
+    return sorted(ready, key=lambda st: lengths[st["id"]], reverse=True)
+
+
+def scheduler_node(state: PlannerWorkerState) -> PlannerWorkerState:
+    """
+    调度器：剪除依赖失败的子任务，检测无法满足的依赖
+    
+    实际派发由 dispatch_ready_subtasks 完成，每一波执行完后回到这里。
+    """
+    subtasks = {st["id"]: st for st in state["subtasks"]}
+    updates: dict[str, SubTask] = {}
+    log = []
+    
+    # 失败 / 被跳过 / 不存在的依赖会传递性地剪除下游
+    changed = True
+    while changed:
+        changed = False
+        for st in subtasks.values():
+            if st["status"] != "pending":
+                continue
+            broken = [
+                dep for dep in st.get("dependencies", [])
+                if dep not in subtasks or subtasks[dep]["status"] in ("failed", "skipped")
+            ]
+            if broken:
+                pruned = {**st, "status": "skipped", "result": f"Dependency not satisfied: {', '.join(broken)}"}
+                subtasks[st["id"]] = updates[st["id"]] = pruned
+                log.append(f"Pruned subtask {st['id']} (blocked by {', '.join(broken)})")
+                changed = True
+    
+    # 仍有待执行任务却没有可执行的：依赖成环
+    pending = [st for st in subtasks.values() if st["status"] == "pending"]
+    if pending and not ready_subtasks(list(subtasks.values())):
+        for st in pending:
+            updates[st["id"]] = {**st, "status": "skipped", "result": "Dependency cycle"}
+            log.append(f"Pruned subtask {st['id']} (dependency cycle)")
+    
+    for line in log:
+        print(f"\n✂️ SCHEDULER: {line}")
+    
+    return {
+        "subtasks": list(updates.values()),
+        "execution_log": log
+    }
+
+
+def dispatch_ready_subtasks(state: PlannerWorkerState) -> list[Send] | Literal["synthesizer"]:
+    """DAG 模式：派发一波依赖已满足的子任务，关键路径优先"""
+    wave = ready_subtasks(state["subtasks"])
+    if not wave:
+        return "synthesizer"
+    
+    print(f"\n🌊 SCHEDULER: Dispatching wave of {len(wave)}: {[st['id'] for st in wave]}")
+    return [Send("parallel_worker", {"subtask": st}) for st in wave]
+
+
 # ==========================================
 # Synthesizer 节点
 # ==========================================
@@ -155,50 +375,96 @@ def synthesizer_node(state: PlannerWorkerState) -> PlannerWorkerState:
         if subtask["status"] == "completed":
             results.append(f"✅ [{subtask['id']}] {subtask['result']}")
         else:
-            results.append(f"❌ [{subtask['id']}] {subtask['status']}")
-    
-    state["final_result"] = "\n".join(results)
-    state["execution_log"].append("Synthesized final result")
+            results.append(f"❌ [{subtask['id']}] {subtask['status']}: {subtask['result']}")
     
     print("   All subtasks completed!")
     
-    return state
+    return {
+        "final_result": "\n".join(results),
+        "execution_log": ["Synthesized final result"]
+    }
 
 
 # ==========================================
 # 构建图
 # ==========================================
 
-def create_planner_worker_graph():
-    """创建规划器-执行者图"""
+def create_planner_worker_graph(
+    mode: Literal["sequential", "parallel", "dag"] = "sequential",
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    planner: Optional[Callable[[PlannerWorkerState], PlannerWorkerState]] = None
+):
+    """创建规划器-执行者图
+    
+    Args:
+        mode: "sequential" 逐个执行；"parallel" 扇出并发执行所有子任务
+            （子任务有依赖时报错）；"dag" 按依赖关系分波次并发执行
+        max_concurrency: 并行 / DAG 模式下同时执行的子任务上限
+        planner: 规划节点；默认 parallel 模式使用 independent_planner_node，
+            其他模式使用 planner_node
+    """
+    if planner is None:
+        planner = independent_planner_node if mode == "parallel" else planner_node
     
     workflow = StateGraph(PlannerWorkerState)
     
     # 添加节点
-    workflow.add_node("planner", planner_node)
-    workflow.add_node("worker", worker_node)
+    workflow.add_node("planner", planner)
     workflow.add_node("synthesizer", synthesizer_node)
     
     # 设置入口
     workflow.set_entry_point("planner")
     
-    # Planner -> Worker
-    workflow.add_edge("planner", "worker")
-    
-    # Worker -> 条件路由
-    workflow.add_conditional_edges(
-        "worker",
-        should_continue,
-        {
-            "worker": "worker",
-            "synthesize": "synthesizer"
-        }
-    )
+    if mode == "sequential":
+        workflow.add_node("worker", worker_node)
+        
+        # Planner -> Worker
+        workflow.add_edge("planner", "worker")
+        
+        # Worker -> 条件路由
+        workflow.add_conditional_edges(
+            "worker",
+            should_continue,
+            {
+                "worker": "worker",
+                "synthesize": "synthesizer"
+            }
+        )
+    elif mode == "parallel":
+        workflow.add_node("parallel_worker", parallel_worker_node)
+        
+        # Planner -> N 个 Worker（Send 扇出）
+        workflow.add_conditional_edges(
+            "planner",
+            dispatch_subtasks,
+            ["parallel_worker", "synthesizer"]
+        )
+        
+        # 所有 Worker 完成后汇合到 Synthesizer
+        workflow.add_edge("parallel_worker", "synthesizer")
+    elif mode == "dag":
+        workflow.add_node("scheduler", scheduler_node)
+        workflow.add_node("parallel_worker", parallel_worker_node)
+        
+        # Planner -> Scheduler -> 一波 Worker -> Scheduler -> ...
+        workflow.add_edge("planner", "scheduler")
+        workflow.add_conditional_edges(
+            "scheduler",
+            dispatch_ready_subtasks,
+            ["parallel_worker", "synthesizer"]
+        )
+        workflow.add_edge("parallel_worker", "scheduler")
+    else:
+        raise ValueError(f"Unknown mode: {mode}")
     
     # Synthesizer -> END
     workflow.add_edge("synthesizer", END)
     
-    return workflow.compile()
+    app = workflow.compile()
+    if mode in ("parallel", "dag"):
+        # 限制同一超步内并发执行的任务数
+        app = app.with_config(max_concurrency=max_concurrency)
+    return app
 
 
 # ==========================================
@@ -251,15 +517,14 @@ def visualize_workflow():
 # Main
 # ==========================================
 
-def main():
-    print("=" * 60)
-    print("🏗️ Planner-Worker Pattern Demo")
+def run_demo(mode: str) -> float:
+    """运行一次指定模式的演示，返回墙钟耗时（秒）"""
+    print("\n" + "=" * 60)
+    print(f"▶️  Mode: {mode}")
     print("=" * 60)
     
-    visualize_workflow()
-    
     # 创建图
-    app = create_planner_worker_graph()
+    app = create_planner_worker_graph(mode=mode)
     
     # 初始状态
     initial_state = {
@@ -274,7 +539,9 @@ def main():
     print("\n" + "-" * 60)
     
     # 运行
+    start = time.perf_counter()
     result = app.invoke(initial_state)
+    elapsed = time.perf_counter() - start
     
     # 输出结果
     print("\n" + "=" * 60)
@@ -285,6 +552,28 @@ def main():
     print("\n📝 Execution Log:")
     for log in result["execution_log"]:
         print(f"   • {log}")
+    
+    return elapsed
+
+
+def main():
+    print("=" * 60)
+    print("🏗️ Planner-Worker Pattern Demo")
+    print("=" * 60)
+    
+    visualize_workflow()
+    
+    # sequential / dag 执行有依赖的计划（2←1, 3←2, 4←2）；
+    # parallel 执行互不依赖的计划，墙钟时间约等于单个子任务
+    timings = {mode: run_demo(mode) for mode in ("sequential", "dag", "parallel")}
+    
+    print("\n" + "=" * 60)
+    print("⏱️  Wall Time Comparison")
+    print("=" * 60)
+    for mode, elapsed in timings.items():
+        plan = "independent plan" if mode == "parallel" else "dependent plan"
+        print(f"   {mode:<12} {elapsed:.2f}s  "
+              f"({elapsed / WORKER_LATENCY_SECONDS:.1f}x one subtask, {plan})")
 
 
 if __name__ == "__main__":
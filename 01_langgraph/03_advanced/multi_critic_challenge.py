@@ -16,10 +16,15 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from dotenv import load_dotenv
 load_dotenv()
 
-from langgraph.graph import StateGraph, END
+from langgraph.graph import END
 from langchain_openai import AzureChatOpenAI
 from langchain_core.messages import HumanMessage
 
+from shared.batch_aggregation import aggregate_batch, critic_weights, score_matrix
+from shared.settings import get_settings
+from shared.tracing import TracedStateGraph, TracingCallbackHandler, configure_tracing, trace_run
+from shared.usage import UsageCallbackHandler, track_usage
+
 
 # ==========================================
 # 状态定义
@@ -37,6 +42,11 @@ class ChallengeState(TypedDict):
     revision_history: Annotated[list[str], operator.add]
 
 
+# 安全权重更高
+CRITIC_WEIGHTS = {"Security": 0.6, "Quality": 0.4}
+DEFAULT_CRITIC_WEIGHT = 0.5
+
+
 # ==========================================
 # LLM
 # ==========================================
@@ -264,25 +274,22 @@ def aggregator(state: ChallengeState) -> ChallengeState:
     print("📊 AGGREGATOR")
     print('='*60)
     
-    scores = state["critic_scores"]
-    
-    # 安全权重更高
-    weights = {"Security": 0.6, "Quality": 0.4}
+    # critic_scores 按 operator.add 累积了历轮结果，每个 Critic 只取最新一条
+    scores = list({s["critic_name"]: s for s in state["critic_scores"]}.values())
+    critics = [s["critic_name"] for s in scores]
+    weights = critic_weights(critics, CRITIC_WEIGHTS, DEFAULT_CRITIC_WEIGHT)
+    decision = aggregate_batch(
+        score_matrix([{s["critic_name"]: s["score"] for s in scores}], critics),
+        weights,
+        conflict_range=None,
+    )
     
-    total = 0
-    weight_sum = 0
     all_feedback = []
-    
-    for s in scores:
-        name = s["critic_name"]
-        score = s["score"]
-        w = weights.get(name, 0.5)
-        total += score * w
-        weight_sum += w
+    for s, w in zip(scores, weights):
         all_feedback.append(s["feedback"])
-        print(f"   {name}: {score}/10 (weight: {w})")
+        print(f"   {s['critic_name']}: {s['score']}/10 (weight: {w:g})")
     
-    final = total / weight_sum if weight_sum > 0 else 0
+    final = float(decision.scores[0])
     print(f"\n   🎯 Weighted Score: {final:.1f}/10")
     
     return {
@@ -324,7 +331,7 @@ def route_decision(state: ChallengeState) -> Literal["end", "writer"]:
 # ==========================================
 
 def build_challenge_graph():
-    workflow = StateGraph(ChallengeState)
+    workflow = TracedStateGraph(ChallengeState, name="multi-critic-challenge")
     
     workflow.add_node("writer", bad_writer_node)
     workflow.add_node("security_critic", security_critic_strict)
@@ -367,6 +374,9 @@ def main():
     ╚════════════════════════════════════════════════════════════╝
     """)
     
+    # 链路追踪：TRACE_EXPORTER=console / file
+    observability = get_settings().observability
+    configure_tracing(observability.trace_exporter, observability.trace_file)
     app = build_challenge_graph()
     
     initial_state: ChallengeState = {
@@ -381,7 +391,12 @@ def main():
         "revision_history": []
     }
     
-    result = app.invoke(initial_state)
+    # 模型不是由 shared.get_llm 创建的，通过调用配置挂上用量回调
+    with track_usage("challenge") as ledger, trace_run("challenge"):
+        result = app.invoke(
+            initial_state,
+            config={"callbacks": [UsageCallbackHandler(), TracingCallbackHandler()]}
+        )
     
     print("\n" + "="*60)
     print("📊 CHALLENGE RESULTS")
@@ -399,6 +414,9 @@ def main():
     print("-"*60)
     print(result["code"])
     print("-"*60)
+    
+    print("\n💰 Usage by node:")
+    print(ledger.format_summary(by="node"))
 
 
 if __name__ == "__main__":
@@ -7,6 +7,12 @@ Advanced Multi-Critic System - 高级多维度批评家系统
 2. 评分聚合与冲突解决
 3. 迭代改进循环
 4. 人工介入机制
+5. 可选的 best-of-N Writer（并行生成多个候选，静态检查选优后再送评）
+6. 一票否决：安全 Critic 判定 critical 等否决级结果时，取消同轮其余 Critic，
+   直接带着阻断意见回到 Writer（规则见 settings 的 multi_critic.veto_rules）
+7. 按差异选择 Critic：修订只影响部分关注点时（例如只改了文档字符串），
+   只重跑结论可能改变的 Critic，其余沿用上一轮评分
+8. 可选的增量评审：第二轮起 Critic 只收到 unified diff 和自己上一轮的结论
 
 架构图：
                     ┌─────────────────────────────────────────────┐
@@ -47,12 +53,12 @@ Advanced Multi-Critic System - 高级多维度批评家系统
             └──────────┘
 """
 
+import asyncio
 import os
 import sys
-from typing import TypedDict, Annotated, Literal, Optional
+import uuid
+from typing import TypedDict, Annotated, Literal, Optional, Sequence
 from dataclasses import dataclass
-import operator
-import json
 
 # 添加项目根目录
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
@@ -60,22 +66,47 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 from dotenv import load_dotenv
 load_dotenv()
 
-from langgraph.graph import StateGraph, END
-from langchain_openai import AzureChatOpenAI
+from langgraph.graph import END
 from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda, RunnableParallel
+from pydantic import BaseModel, Field, field_validator
+
+from shared.batch_aggregation import aggregate_batch, critic_weights, score_matrix
+from shared.code_checks import rank_candidates
+from shared.diff_analysis import DEFAULT_CRITIC_CONCERNS, analyze_diff, select_critics, unified_diff
+from shared.early_exit import VetoBoard, check_veto
+from shared.history import HistoryCompactor
+from shared.json_stream import JsonExtractionError
+from shared.llm_providers import get_llm as get_provider_llm, ainvoke_structured
+from shared.metrics import metrics
+from shared.profiling import disable_node_profiling, enable_node_profiling
+from shared.rate_limit import print_rate_limit_report
+from shared.reducers import bounded_append, keyed_merge
+from shared.settings import apply_graph_settings, get_settings
+from shared.prompts.layout import CachedPrompt
+from shared.tokens import count_message_tokens, count_tokens
+from shared.tracing import (
+    TracedStateGraph, configure_tracing, critical_path, format_critical_path, load_spans, trace_run
+)
+from shared.usage import track_usage, usage_scope
 
 
 # ==========================================
 # 配置
 # ==========================================
 
-@dataclass
-class CriticConfig:
-    """Critic 系统配置"""
-    max_iterations: int = 3
-    pass_threshold: float = 7.0  # 总分 10 分，7 分及格
-    require_human_review: bool = False  # 是否需要人工审核
-    human_review_threshold: float = 6.0  # 低于此分数需人工审核
+# 迭代次数、及格线、人工审核阈值、提示词预算、并发与超时都在
+# get_settings().multi_critic 中（环境变量 MULTI_CRITIC__* 或 settings.toml），
+# 每次使用时读取，修改配置文件无需重启
+
+# 修订历史最多保留的条目数（用于状态 reducer，启动时确定）
+REVISION_HISTORY_LIMIT = get_settings().multi_critic.revision_history_limit
+
+# 结构化评审轮次最多保留的条目数（更早的只以摘要形式进入提示词）
+REVIEW_ROUNDS_LIMIT = get_settings().multi_critic.review_rounds_limit
+
+# 每轮评审的否决记录（按 round_id），否决后取消同轮其余 Critic
+VETO_BOARD = VetoBoard()
 
 
 # ==========================================
@@ -92,17 +123,66 @@ class CriticScore:
     passed: bool
 
 
+# 各 Critic 的结构化输出 schema
+# 字段描述会随 schema 一起发给模型，提示词中不再重复描述 JSON 格式
+
+class QualityScores(BaseModel):
+    """代码质量分项评分（0-10）"""
+    readability: float = Field(ge=0, le=10, description="Clear naming and structure")
+    maintainability: float = Field(ge=0, le=10, description="Modularity, DRY")
+    documentation: float = Field(ge=0, le=10, description="Docstrings and comments")
+    error_handling: float = Field(ge=0, le=10, description="Exceptions and edge cases")
+    type_hints: float = Field(ge=0, le=10, description="Completeness and correctness")
+
+
+class CodeQualityReview(BaseModel):
+    """代码质量 Critic 输出"""
+    scores: Optional[QualityScores] = None
+    average_score: float = Field(ge=0, le=10, description="Overall quality score 0-10")
+    feedback: str = Field("No feedback", description="Overall assessment")
+    suggestions: list[str] = Field(default_factory=list, description="Concrete improvements")
+
+
+class SecurityReview(BaseModel):
+    """安全 Critic 输出"""
+    security_score: float = Field(ge=0, le=10, description="Security score 0-10, 10 = no issues")
+    vulnerabilities_found: list[str] = Field(default_factory=list)
+    risk_level: Literal["low", "medium", "high", "critical", "unknown"] = "unknown"
+    feedback: str = Field("No feedback", description="Security assessment")
+    suggestions: list[str] = Field(default_factory=list, description="How to fix each issue")
+
+    @field_validator("risk_level", mode="before")
+    @classmethod
+    def _normalize_risk(cls, value):
+        return str(value).strip().lower() if value else "unknown"
+
+
+class StyleReview(BaseModel):
+    """风格 Critic 输出"""
+    style_score: float = Field(ge=0, le=10, description="Style score 0-10")
+    pep8_issues: list[str] = Field(default_factory=list)
+    feedback: str = Field("No feedback", description="Style assessment")
+    suggestions: list[str] = Field(default_factory=list, description="Style improvements")
+
+
 class MultiCriticState(TypedDict):
     """多 Critic 系统状态"""
     # 输入
     task: str
     code: str
+    previous_code: str           # 上一轮代码，用于按差异选择 Critic
+    
+    # 本轮评审编号（Writer 每次生成代码时更新），用于同轮 Critic 之间的否决
+    round_id: str
     
-    # Critic 评分
-    critic_scores: Annotated[list[dict], operator.add]
+    # Critic 评分，按 critic_name 合并：每轮覆盖上一轮同一 Critic 的结果
+    critic_scores: Annotated[dict[str, dict], keyed_merge("critic_name")]
+    # 本轮的否决原因（没有时为 None）
+    veto: Optional[str]
     
     # 聚合结果
     final_score: float
+    score_passed: bool           # 聚合规则的通过判定（加权分达标且未被否决）
     aggregated_feedback: str
     conflicts: list[str]
     
@@ -112,22 +192,32 @@ class MultiCriticState(TypedDict):
     needs_human_review: bool
     human_decision: Optional[str]
     
-    # 历史
-    revision_history: Annotated[list[str], operator.add]
+    # 历史（环形缓冲，只保留最近 REVISION_HISTORY_LIMIT 条）
+    revision_history: Annotated[Sequence[str], bounded_append(REVISION_HISTORY_LIMIT)]
+    # 每轮聚合后的结构化评审记录，供 Writer 压缩成历史摘要
+    review_rounds: Annotated[Sequence[dict], bounded_append(REVIEW_ROUNDS_LIMIT)]
 
 
 # ==========================================
 # LLM 初始化
 # ==========================================
 
-def get_llm():
-    """获取 Azure OpenAI LLM"""
-    return AzureChatOpenAI(
-        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-        deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o"),
-        api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01"),
-        temperature=0.3,
+def get_llm(temperature: float = 0.3, coalesce: bool = True):
+    """获取 Azure OpenAI LLM
+
+    Args:
+        coalesce: 合并相同输入的并发调用；需要多个独立样本时（best-of-N 候选）传 False
+    """
+    # 三个 Critic 并行调用同一个部署，共享限流器避免 429 重试风暴；
+    # 配置了备用提供商时，慢回复会被对冲到备用提供商；
+    # 批量评审中同时发出的相同提示词只请求一次
+    return get_provider_llm(
+        provider="azure",
+        model=get_settings().llm.azure_deployment or "gpt-4o",
+        temperature=temperature,
+        rate_limit=True,
+        fallbacks=get_settings().llm.fallback_providers,
+        coalesce=coalesce,
     )
 
 
@@ -135,19 +225,11 @@ def get_llm():
 # Writer Node
 # ==========================================
 
-def writer_node(state: MultiCriticState) -> MultiCriticState:
-    """代码生成/修改节点"""
-    print(f"\n{'='*60}")
-    print(f"✍️  WRITER (Iteration {state['iteration'] + 1})")
-    print('='*60)
-    
-    llm = get_llm()
-    
-    if state["iteration"] == 0:
-        # 首次生成
-        prompt = f"""You are an expert Python developer. Write clean, well-documented code.
+# 提示词布局：静态说明放在 system 前缀（跨调用逐字相同，可命中提供商的前缀缓存），
+# 可变内容放在 human 消息末尾，按变化频率从低到高排列
 
-Task: {state['task']}
+WRITER_PROMPT = CachedPrompt(
+    system="""You are an expert Python developer. Write clean, well-documented code.
 
 Requirements:
 1. Follow PEP 8 style guidelines
@@ -156,25 +238,11 @@ Requirements:
 4. Handle potential errors
 5. Consider security best practices
 
-Output ONLY the Python code, no explanations."""
-        
-        print(f"   📋 Task: {state['task']}")
-        print("   🔄 Generating initial code...")
-        
-    else:
-        # 基于反馈修改
-        feedback = state.get("aggregated_feedback", "")
-        prompt = f"""You are an expert Python developer. Revise the code based on feedback.
+Output ONLY the Python code, no explanations.""",
+    human="Task: {task}",
+)
 
-Original Task: {state['task']}
-
-Current Code:
-```python
-{state['code']}
-```
-
-Feedback to address:
-{feedback}
+WRITER_REVISION_SYSTEM_PROMPT = """You are an expert Python developer. Revise the code based on feedback.
 
 Revision Requirements:
 1. Address ALL feedback points
@@ -182,25 +250,127 @@ Revision Requirements:
 3. Improve code quality
 
 Output ONLY the revised Python code, no explanations."""
+
+WRITER_REVISION_PROMPT = """Original Task: {task}
+
+Earlier review rounds (digest):
+{history}
+
+Feedback to address:
+{feedback}
+
+Current Code:
+```python
+{code}
+```"""
+
+
+def extract_code(text: str) -> str:
+    """去掉回复中的代码块标记"""
+    if "```python" in text:
+        return text.split("```python")[1].split("```")[0].strip()
+    if "```" in text:
+        return text.split("```")[1].split("```")[0].strip()
+    return text
+
+
+# 候选生成失败时的占位输出（不影响其他候选）
+_FAILED_CANDIDATE = RunnableLambda(lambda _: None)
+
+
+def generate_code(messages: list) -> tuple[str, str]:
+    """生成代码；writer_candidates > 1 时 best-of-N
+    
+    N 个候选以不同温度并行生成，先用语法解析和 AST 规则（shared.code_checks）
+    打分，只把最好的一个交给 LLM Critic：多花的是并行的 token，
+    省下的是一整轮 Writer + 3 个 Critic 的串行往返。
+    
+    Returns:
+        (代码, 附加到修订历史的说明)
+    """
+    settings = get_settings().multi_critic
+    if settings.writer_candidates <= 1:
+        return extract_code(get_llm().invoke(messages).content), ""
+    
+    temperatures = [
+        settings.writer_temperatures[i % len(settings.writer_temperatures)]
+        for i in range(settings.writer_candidates)
+    ]
+    # 候选数多于温度数时温度会重复，同温度同提示词的调用不能合并，否则"多出来"的
+    # 候选只是同一个回复的副本
+    candidates = RunnableParallel({
+        f"candidate_{i}": get_llm(temperature=t, coalesce=False).with_fallbacks([_FAILED_CANDIDATE])
+        for i, t in enumerate(temperatures)
+    }).invoke(messages)
+    
+    outputs = [candidates[f"candidate_{i}"] for i in range(len(temperatures))]
+    generated = [i for i, output in enumerate(outputs) if output is not None]
+    if not generated:
+        raise RuntimeError(f"all {len(outputs)} writer candidates failed")
+    
+    ranked = rank_candidates(extract_code(outputs[i].content) for i in generated)
+    print(f"   🎲 {len(generated)}/{len(outputs)} candidates, ranked by static checks:")
+    for rank, (index, code, report) in enumerate(ranked, 1):
+        marker = "👉" if rank == 1 else "  "
+        print(f"   {marker} T={temperatures[generated[index]]:.1f}  static {report.score:4.1f}  {report.summary()}")
+    
+    best_index, best_code, best_report = ranked[0]
+    return best_code, (
+        f", best of {len(generated)} at T={temperatures[generated[best_index]]:.1f}, "
+        f"static {best_report.score:.1f}"
+    )
+
+
+def writer_node(state: MultiCriticState) -> MultiCriticState:
+    """代码生成/修改节点"""
+    print(f"\n{'='*60}")
+    print(f"✍️  WRITER (Iteration {state['iteration'] + 1})")
+    print('='*60)
+    
+    if state["iteration"] == 0:
+        # 首次生成
+        messages = WRITER_PROMPT.messages(task=state["task"])
+        
+        print(f"   📋 Task: {state['task']}")
+        print("   🔄 Generating initial code...")
+        
+    else:
+        # 基于反馈修改：最新代码和最新反馈原文保留，更早的评审压缩成摘要
+        feedback = state.get("aggregated_feedback", "")
+        budget = get_settings().multi_critic.prompt_token_budget - count_tokens(WRITER_REVISION_SYSTEM_PROMPT)
+        compactor = HistoryCompactor(token_budget=budget)
+        prompt = compactor.build_prompt(
+            WRITER_REVISION_PROMPT,
+            task=state["task"],
+            code=state["code"],
+            latest_feedback=feedback,
+            earlier_rounds=list(state.get("review_rounds", []))[:-1]
+        )
+        messages = [
+            SystemMessage(content=WRITER_REVISION_SYSTEM_PROMPT),
+            HumanMessage(content=prompt),
+        ]
         
         print(f"   📋 Revising based on feedback...")
         print(f"   📝 Feedback summary: {feedback[:100]}...")
     
-    response = llm.invoke([HumanMessage(content=prompt)])
-    code = response.content
+    prompt_tokens = count_message_tokens(messages)
+    print(f"   🔢 Prompt tokens: {prompt_tokens}")
     
-    # 清理代码块标记
-    if "```python" in code:
-        code = code.split("```python")[1].split("```")[0].strip()
-    elif "```" in code:
-        code = code.split("```")[1].split("```")[0].strip()
+    with usage_scope(iteration=state["iteration"] + 1):
+        code, note = generate_code(messages)
     
     print(f"   ✅ Code generated ({len(code)} chars)")
     
     return {
         "code": code,
+        "previous_code": state["code"],
         "iteration": state["iteration"] + 1,
-        "revision_history": [f"Iteration {state['iteration'] + 1}: Generated/Revised code"]
+        "round_id": uuid.uuid4().hex,
+        "veto": None,
+        "revision_history": [
+            f"Iteration {state['iteration'] + 1}: Generated/Revised code ({prompt_tokens} prompt tokens{note})"
+        ]
     }
 
 
@@ -208,185 +378,273 @@ Output ONLY the revised Python code, no explanations."""
 # Critic Nodes
 # ==========================================
 
-def code_quality_critic(state: MultiCriticState) -> MultiCriticState:
+# 各 Critic 的评审说明是静态 system 前缀，human 消息只有代码
+CRITIC_CODE_PROMPT = """Code:
+```python
+{code}
+```"""
+
+# 增量评审：与完整评审共用 system 前缀，human 消息是上一轮结论 + diff
+CRITIC_DIFF_PROMPT = """The code you reviewed earlier has been revised. The next part shows your previous
+findings and a unified diff with a few lines of context around each change.
+Keep findings that still apply, drop the ones the revision fixed, add issues
+the revision introduced, and score the revised code as a whole.
+
+Previous findings (iteration {previous_iteration}, score {previous_score}/10):
+{previous_findings}
+
+Diff:
+```diff
+{diff}
+```"""
+
+QUALITY_CRITIC_PROMPT = CachedPrompt(
+    system="""You are a code quality expert. Evaluate the Python code in the next message.
+
+Score each criterion 0-10: readability, maintainability, documentation,
+error handling, type hints.""",
+    human=CRITIC_CODE_PROMPT,
+)
+
+SECURITY_CRITIC_PROMPT = CachedPrompt(
+    system="""You are a security expert. Analyze the Python code in the next message for security issues.
+
+Check for:
+1. Injection vulnerabilities (SQL, Command, etc.)
+2. Hardcoded secrets/credentials
+3. Insecure data handling
+4. Input validation issues
+5. Authentication/Authorization flaws""",
+    human=CRITIC_CODE_PROMPT,
+)
+
+STYLE_CRITIC_PROMPT = CachedPrompt(
+    system="""You are a Python style expert (PEP 8). Review the code in the next message for style compliance.
+
+Check for:
+1. PEP 8 compliance (naming, spacing, line length)
+2. Import organization
+3. Code formatting consistency
+4. Pythonic idioms usage
+5. Clean code principles""",
+    human=CRITIC_CODE_PROMPT,
+)
+
+
+def format_findings(entry: dict) -> str:
+    """把上一轮的 Critic 结果渲染成增量评审提示词中的结论"""
+    lines = [entry["feedback"]]
+    if entry.get("risk_level"):
+        lines.append(f"Risk level: {entry['risk_level']}")
+    lines += [f"- {s}" for s in entry.get("suggestions", [])]
+    return "\n".join(lines)
+
+
+def critic_messages(critic: str, prompt: CachedPrompt, state: MultiCriticState) -> list:
+    """Critic 的输入消息：完整代码，或（diff_review 开启时）上一轮结论 + diff
+    
+    只有当 Critic 上一轮评审的正是 previous_code 时才发 diff；增量提示词不比
+    完整提示词短（小文件、大改动）时也发完整代码。
+    """
+    full = prompt.messages(code=state["code"])
+    settings = get_settings().multi_critic
+    if not settings.diff_review or not state.get("previous_code"):
+        return full
+    
+    previous = next((e for e in state["critic_scores"].values() if e["critic"] == critic), None)
+    if previous is None or previous.get("cancelled") or previous["iteration"] != state["iteration"] - 1:
+        return full
+    
+    incremental = CachedPrompt(system=prompt.system, human=CRITIC_DIFF_PROMPT).messages(
+        previous_iteration=previous["iteration"],
+        previous_score=previous["score"],
+        previous_findings=format_findings(previous),
+        diff=unified_diff(state["previous_code"], state["code"], settings.diff_context_lines),
+    )
+    full_tokens, diff_tokens = count_message_tokens(full), count_message_tokens(incremental)
+    if diff_tokens >= full_tokens:
+        return full
+    print(f"      📉 {critic}: diff review {diff_tokens} tokens (full {full_tokens})")
+    return incremental
+
+
+async def arun_critic(
+    messages: list,
+    schema: type[BaseModel],
+    iteration: Optional[int] = None
+) -> Optional[BaseModel]:
+    """以结构化输出调用 Critic，并按 schema 校验
+
+    提供商不支持结构化输出时，shared.llm_providers 会退回流式 JSON 提取。
+
+    Args:
+        iteration: 被评审代码的迭代轮次，记入用量账本
+
+    Returns:
+        校验通过的结果；输出无法解析时返回 None
+    """
+    try:
+        with usage_scope(iteration=iteration):
+            return await ainvoke_structured(get_llm(), messages, schema)
+    except JsonExtractionError as e:
+        print(f"      ⚠️  Unparseable critic response: {e}")
+        return None
+
+
+async def review(
+    critic: str,
+    prompt: CachedPrompt,
+    state: MultiCriticState,
+    schema: type[BaseModel]
+) -> tuple[Optional[BaseModel], bool]:
+    """执行一个 Critic；开启 early_exit 时，同轮出现否决即取消
+
+    Returns:
+        (结果, 是否被取消)
+    """
+    call = arun_critic(critic_messages(critic, prompt, state), schema, state["iteration"])
+    if not get_settings().multi_critic.early_exit:
+        return await call, False
+    
+    result, veto = await VETO_BOARD.run(state["round_id"], critic, call)
+    if veto is not None:
+        print(f"      ⏹️  {critic} cancelled: {veto.critic} vetoed ({veto.reason})")
+        return None, True
+    return result, False
+
+
+def critic_update(
+    state: MultiCriticState,
+    critic: str,
+    name: str,
+    score: Optional[float],
+    feedback: str,
+    suggestions: list[str],
+    risk_level: Optional[str] = None,
+    cancelled: bool = False
+) -> MultiCriticState:
+    """组装 Critic 节点的状态更新，命中否决规则时发出否决
+
+    同轮只有第一个否决写入 veto，避免并行节点同时写同一个字段。
+    """
+    entry = {
+        "critic_name": name,
+        "critic": critic,
+        "score": score,
+        "feedback": feedback,
+        "suggestions": suggestions,
+        "risk_level": risk_level,
+        "iteration": state["iteration"],
+        "cancelled": cancelled,
+        "passed": not cancelled and score >= 7.0,
+    }
+    update = {"critic_scores": [entry]}
+    if cancelled:
+        return update
+    
+    rule = get_settings().multi_critic.veto_rules.get(critic)
+    reason = check_veto(rule, score, risk_level)
+    if reason and VETO_BOARD.veto(state["round_id"], critic, reason):
+        print(f"      🛑 VETO from {name}: {reason}")
+        update["veto"] = f"{name}: {reason}"
+    return update
+
+
+async def code_quality_critic(state: MultiCriticState) -> MultiCriticState:
     """代码质量 Critic"""
     print("\n   🔍 Code Quality Critic evaluating...")
     
-    llm = get_llm()
-    
-    prompt = f"""You are a code quality expert. Evaluate this Python code.
-
-Code:
-```python
-{state['code']}
-```
-
-Evaluate on these criteria (score 0-10 for each):
-1. Readability (clear naming, structure)
-2. Maintainability (modularity, DRY)
-3. Documentation (docstrings, comments)
-4. Error Handling (exceptions, edge cases)
-5. Type Hints (completeness, correctness)
-
-Output JSON format:
-{{
-    "scores": {{"readability": X, "maintainability": X, "documentation": X, "error_handling": X, "type_hints": X}},
-    "average_score": X.X,
-    "feedback": "Overall assessment...",
-    "suggestions": ["suggestion1", "suggestion2", ...]
-}}"""
-
-    response = llm.invoke([HumanMessage(content=prompt)])
+    result, cancelled = await review("code_quality_critic", QUALITY_CRITIC_PROMPT, state, CodeQualityReview)
+    if cancelled:
+        return critic_update(state, "code_quality_critic", "Code Quality", None, "", [], cancelled=True)
     
-    try:
-        # 解析 JSON
-        content = response.content
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0]
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0]
-        
-        result = json.loads(content)
-        score = result.get("average_score", 5.0)
-        feedback = result.get("feedback", "No feedback")
-        suggestions = result.get("suggestions", [])
-    except:
+    if result is not None:
+        score = result.average_score
+        feedback = result.feedback
+        suggestions = result.suggestions
+    else:
         score = 5.0
-        feedback = response.content[:200]
+        feedback = "Code quality critic returned no parseable result"
         suggestions = []
     
     print(f"      Score: {score}/10")
     
-    return {
-        "critic_scores": [{
-            "critic_name": "Code Quality",
-            "score": score,
-            "feedback": feedback,
-            "suggestions": suggestions,
-            "passed": score >= 7.0
-        }]
-    }
+    return critic_update(state, "code_quality_critic", "Code Quality", score, feedback, suggestions)
 
 
-def security_critic(state: MultiCriticState) -> MultiCriticState:
+async def security_critic(state: MultiCriticState) -> MultiCriticState:
     """安全性 Critic"""
     print("   🔒 Security Critic evaluating...")
     
-    llm = get_llm()
+    result, cancelled = await review("security_critic", SECURITY_CRITIC_PROMPT, state, SecurityReview)
+    if cancelled:
+        return critic_update(state, "security_critic", "Security", None, "", [], cancelled=True)
     
-    prompt = f"""You are a security expert. Analyze this Python code for security issues.
-
-Code:
-```python
-{state['code']}
-```
-
-Check for:
-1. Injection vulnerabilities (SQL, Command, etc.)
-2. Hardcoded secrets/credentials
-3. Insecure data handling
-4. Input validation issues
-5. Authentication/Authorization flaws
-
-Output JSON format:
-{{
-    "security_score": X.X,
-    "vulnerabilities_found": ["vuln1", "vuln2"],
-    "risk_level": "low/medium/high/critical",
-    "feedback": "Security assessment...",
-    "suggestions": ["fix1", "fix2", ...]
-}}"""
-
-    response = llm.invoke([HumanMessage(content=prompt)])
-    
-    try:
-        content = response.content
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0]
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0]
-        
-        result = json.loads(content)
-        score = result.get("security_score", 5.0)
-        feedback = result.get("feedback", "No feedback")
-        suggestions = result.get("suggestions", [])
-        risk = result.get("risk_level", "unknown")
-    except:
+    if result is not None:
+        score = result.security_score
+        feedback = result.feedback
+        suggestions = result.suggestions
+        risk = result.risk_level
+    else:
         score = 5.0
-        feedback = response.content[:200]
+        feedback = "Security critic returned no parseable result"
         suggestions = []
         risk = "unknown"
     
     print(f"      Score: {score}/10 (Risk: {risk})")
     
-    return {
-        "critic_scores": [{
-            "critic_name": "Security",
-            "score": score,
-            "feedback": feedback,
-            "suggestions": suggestions,
-            "passed": score >= 7.0
-        }]
-    }
+    return critic_update(state, "security_critic", "Security", score, feedback, suggestions, risk_level=risk)
 
 
-def style_critic(state: MultiCriticState) -> MultiCriticState:
+async def style_critic(state: MultiCriticState) -> MultiCriticState:
     """代码风格 Critic"""
     print("   🎨 Style Critic evaluating...")
     
-    llm = get_llm()
+    result, cancelled = await review("style_critic", STYLE_CRITIC_PROMPT, state, StyleReview)
+    if cancelled:
+        return critic_update(state, "style_critic", "Style", None, "", [], cancelled=True)
+    
+    if result is not None:
+        score = result.style_score
+        feedback = result.feedback
+        suggestions = result.suggestions
+    else:
+        score = 5.0
+        feedback = "Style critic returned no parseable result"
+        suggestions = []
+    
+    print(f"      Score: {score}/10")
     
-    prompt = f"""You are a Python style expert (PEP 8). Review this code for style compliance.
+    return critic_update(state, "style_critic", "Style", score, feedback, suggestions)
 
-Code:
-```python
-{state['code']}
-```
 
-Check for:
-1. PEP 8 compliance (naming, spacing, line length)
-2. Import organization
-3. Code formatting consistency
-4. Pythonic idioms usage
-5. Clean code principles
+# Critic 节点 -> 关心的变化类型（shared.diff_analysis 的关注点）
+CRITIC_CONCERNS = {
+    "code_quality_critic": DEFAULT_CRITIC_CONCERNS["quality"],
+    "security_critic": DEFAULT_CRITIC_CONCERNS["security"],
+    "style_critic": DEFAULT_CRITIC_CONCERNS["style"],
+}
 
-Output JSON format:
-{{
-    "style_score": X.X,
-    "pep8_issues": ["issue1", "issue2"],
-    "feedback": "Style assessment...",
-    "suggestions": ["improvement1", "improvement2", ...]
-}}"""
 
-    response = llm.invoke([HumanMessage(content=prompt)])
+def route_critics(state: MultiCriticState) -> list[str]:
+    """Writer 之后的扇出：只重跑结论可能因本轮修订而改变的 Critic
     
-    try:
-        content = response.content
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0]
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0]
-        
-        result = json.loads(content)
-        score = result.get("style_score", 5.0)
-        feedback = result.get("feedback", "No feedback")
-        suggestions = result.get("suggestions", [])
-    except:
-        score = 5.0
-        feedback = response.content[:200]
-        suggestions = []
+    未重跑的 Critic 的上一轮结果留在 critic_scores 中（keyed_merge 按名字覆盖），
+    由 Aggregator 直接沿用。
+    """
+    if not get_settings().multi_critic.adaptive_critics or not state.get("previous_code"):
+        return list(CRITIC_CONCERNS)
     
-    print(f"      Score: {score}/10")
+    analysis = analyze_diff(state["previous_code"], state["code"])
+    previous = {entry["critic"]: entry for entry in state["critic_scores"].values()}
+    selected = select_critics(analysis, CRITIC_CONCERNS, previous)
     
-    return {
-        "critic_scores": [{
-            "critic_name": "Style",
-            "score": score,
-            "feedback": feedback,
-            "suggestions": suggestions,
-            "passed": score >= 7.0
-        }]
-    }
+    print(f"\n   🧭 Diff: {analysis.summary()}")
+    carried = [name for name in CRITIC_CONCERNS if name not in selected]
+    if carried:
+        print(f"   ↩️  Carrying forward: {', '.join(carried)}")
+    # 没有需要重跑的 Critic 时直接进入聚合
+    return selected or ["aggregator"]
 
 
 # ==========================================
@@ -399,46 +657,62 @@ def aggregator_node(state: MultiCriticState) -> MultiCriticState:
     print("📊 AGGREGATOR")
     print('='*60)
     
-    scores = state["critic_scores"]
-    
-    # 计算加权平均分
-    weights = {
-        "Code Quality": 0.4,
-        "Security": 0.35,
-        "Style": 0.25
-    }
+    VETO_BOARD.close(state["round_id"])
+    veto = state.get("veto")
+    
+    # 被否决取消的 Critic 没有结果，不参与计分
+    scores = [s for s in state["critic_scores"].values() if not s.get("cancelled")]
+    skipped = [s["critic_name"] for s in state["critic_scores"].values() if s.get("cancelled")]
+    
+    # 沿用的上一轮结果若是否决级，本轮依然否决
+    carried = {s["critic_name"] for s in scores if s["iteration"] < state["iteration"]}
+    if not veto:
+        rules = get_settings().multi_critic.veto_rules
+        for s in scores:
+            if s["critic_name"] in carried:
+                reason = check_veto(rules.get(s["critic"]), s["score"], s.get("risk_level"))
+                if reason:
+                    veto = f"{s['critic_name']}: {reason}"
+                    break
+    
+    # 加权平均分与冲突检测（与批量分析共用 shared.batch_aggregation 的规则）
+    settings = get_settings().multi_critic
+    critics = [s["critic_name"] for s in scores]
+    weights = critic_weights(critics, settings.critic_weights, settings.default_critic_weight)
+    decision = aggregate_batch(
+        score_matrix([{s["critic_name"]: s["score"] for s in scores}], critics),
+        weights,
+        pass_threshold=settings.pass_threshold,
+        human_review_threshold=settings.human_review_threshold,
+        require_human_review=settings.require_human_review,
+        conflict_range=settings.conflict_score_range,
+        conflict_std=settings.conflict_score_std,
+        vetoed=[bool(veto)],
+    )
+    final_score = float(decision.scores[0])
+    reason = decision.conflict_reason(0)
+    conflicts = [reason] if reason else []
     
-    total_weight = 0
-    weighted_sum = 0
     all_feedback = []
     all_suggestions = []
-    conflicts = []
     
     print("\n   📋 Critic Scores:")
-    for score_dict in scores:
+    for score_dict, weight in zip(scores, weights):
         name = score_dict["critic_name"]
-        score = score_dict["score"]
-        weight = weights.get(name, 0.33)
-        
-        weighted_sum += score * weight
-        total_weight += weight
-        
         status = "✅" if score_dict["passed"] else "❌"
-        print(f"      {status} {name}: {score}/10 (weight: {weight})")
+        note = f", carried from iteration {score_dict['iteration']}" if name in carried else ""
+        print(f"      {status} {name}: {score_dict['score']}/10 (weight: {weight:g}{note})")
         
         all_feedback.append(f"[{name}] {score_dict['feedback']}")
         all_suggestions.extend(score_dict.get("suggestions", []))
     
-    final_score = weighted_sum / total_weight if total_weight > 0 else 0
+    for name in skipped:
+        print(f"      ⏹️  {name}: cancelled")
     
-    # 检测冲突（不同 Critic 意见相差太大）
-    score_values = [s["score"] for s in scores]
-    if max(score_values) - min(score_values) > 3:
-        conflicts.append(f"Large score variance: {min(score_values)}-{max(score_values)}")
-    
-    # 聚合反馈
+    # 聚合反馈；否决时阻断意见放在最前面
+    blocking = f"BLOCKING ({veto}) - must be fixed before anything else:\n" if veto else ""
     aggregated = f"""
-Final Score: {final_score:.1f}/10
+{blocking}Final Score: {final_score:.1f}/10
 
 Feedback Summary:
 {chr(10).join(all_feedback)}
@@ -449,19 +723,29 @@ Top Suggestions:
     
     print(f"\n   🎯 Final Score: {final_score:.1f}/10")
     
-    config = CriticConfig()
-    needs_human = (
-        config.require_human_review or 
-        final_score < config.human_review_threshold or
-        len(conflicts) > 0
-    )
+    # 否决的结论是确定的，不需要人工裁决（aggregate_batch 已按 vetoed 处理）
+    needs_human = bool(decision.needs_human[0])
     
     return {
         "final_score": final_score,
+        "score_passed": bool(decision.passed[0]),
         "aggregated_feedback": aggregated,
         "conflicts": conflicts,
         "needs_human_review": needs_human,
-        "critic_scores": []  # 重置以避免累积
+        "veto": veto,
+        "review_rounds": [{
+            "iteration": state["iteration"],
+            "score": final_score,
+            "critics": [
+                {
+                    "critic_name": s["critic_name"],
+                    "score": s["score"],
+                    "feedback": s["feedback"],
+                    "suggestions": s.get("suggestions", [])
+                }
+                for s in scores
+            ]
+        }]
     }
 
 
@@ -475,17 +759,22 @@ def decision_node(state: MultiCriticState) -> MultiCriticState:
     print("⚖️  DECISION MAKER")
     print('='*60)
     
-    config = CriticConfig()
+    settings = get_settings().multi_critic
     
-    passed = state["final_score"] >= config.pass_threshold
+    # 通过判定由聚合器按 shared.batch_aggregation 的规则给出
+    passed = state["score_passed"]
     
-    if passed:
-        print(f"   ✅ APPROVED (Score: {state['final_score']:.1f} >= {config.pass_threshold})")
+    if state.get("veto"):
+        print(f"   🛑 BLOCKED by veto: {state['veto']}")
+        passed = False
+    elif passed:
+        print(f"   ✅ APPROVED (Score: {state['final_score']:.1f} >= {settings.pass_threshold})")
     else:
-        print(f"   ❌ REJECTED (Score: {state['final_score']:.1f} < {config.pass_threshold})")
-        if state["iteration"] >= config.max_iterations:
-            print(f"   ⚠️  Max iterations ({config.max_iterations}) reached")
-            passed = True  # 强制通过，避免无限循环
+        print(f"   ❌ REJECTED (Score: {state['final_score']:.1f} < {settings.pass_threshold})")
+    
+    if not passed and state["iteration"] >= settings.max_iterations:
+        print(f"   ⚠️  Max iterations ({settings.max_iterations}) reached")
+        passed = not state.get("veto")  # 强制通过，避免无限循环（否决的代码不放行）
     
     return {
         "approved": passed
@@ -527,15 +816,13 @@ def human_review_node(state: MultiCriticState) -> MultiCriticState:
 
 def route_after_decision(state: MultiCriticState) -> Literal["human_review", "end", "writer"]:
     """决策后的路由"""
-    config = CriticConfig()
-    
     if state["approved"]:
         return "end"
     
     if state["needs_human_review"]:
         return "human_review"
     
-    if state["iteration"] >= config.max_iterations:
+    if state["iteration"] >= get_settings().multi_critic.max_iterations:
         return "end"
     
     return "writer"
@@ -555,7 +842,8 @@ def route_after_human(state: MultiCriticState) -> Literal["end", "writer"]:
 def build_multi_critic_graph():
     """构建多 Critic 系统图"""
     
-    workflow = StateGraph(MultiCriticState)
+    # 每个节点与 LLM 调用都会产生 span（需先 configure_tracing）
+    workflow = TracedStateGraph(MultiCriticState, name="multi-critic")
     
     # 添加节点
     workflow.add_node("writer", writer_node)
@@ -570,10 +858,8 @@ def build_multi_critic_graph():
     workflow.set_entry_point("writer")
     
     # Writer → 并行 Critics
-    # 注意：LangGraph 的"并行"是通过扇出实现的
-    workflow.add_edge("writer", "code_quality_critic")
-    workflow.add_edge("writer", "security_critic")
-    workflow.add_edge("writer", "style_critic")
+    # 注意：LangGraph 的"并行"是通过扇出实现的；路由函数返回本轮要重跑的 Critic 列表
+    workflow.add_conditional_edges("writer", route_critics, [*CRITIC_CONCERNS, "aggregator"])
     
     # Critics → Aggregator
     workflow.add_edge("code_quality_critic", "aggregator")
@@ -604,7 +890,8 @@ def build_multi_critic_graph():
         }
     )
     
-    return workflow.compile()
+    # 并发上限与单个超步（例如一轮并行评审）的超时
+    return apply_graph_settings(workflow.compile(), get_settings().multi_critic)
 
 
 # ==========================================
@@ -625,6 +912,20 @@ def main():
     ╚══════════════════════════════════════════════════════════════╝
     """)
     
+    settings = get_settings()
+    observability = settings.observability
+    
+    # 链路追踪：TRACE_EXPORTER=console / file
+    tracing = configure_tracing(observability.trace_exporter, observability.trace_file)
+    
+    # 节点剖析：PROFILE_NODE=writer 等
+    if observability.profile_node:
+        enable_node_profiling(
+            observability.profile_node,
+            invocations=observability.profile_invocations,
+            backend=observability.profile_backend,
+        )
+    
     # 构建图
     app = build_multi_critic_graph()
     
@@ -644,19 +945,26 @@ def main():
     initial_state: MultiCriticState = {
         "task": task,
         "code": "",
-        "critic_scores": [],
+        "previous_code": "",
+        "round_id": "",
+        "critic_scores": {},
+        "veto": None,
         "final_score": 0.0,
+        "score_passed": False,
         "aggregated_feedback": "",
         "conflicts": [],
         "iteration": 0,
         "approved": False,
         "needs_human_review": False,
         "human_decision": None,
-        "revision_history": []
+        "revision_history": [],
+        "review_rounds": []
     }
     
-    # 运行
-    result = app.invoke(initial_state)
+    # 运行（记录每次 LLM 调用的 token、延迟与费用）
+    with track_usage("multi-critic") as ledger, trace_run("multi-critic"):
+        # Critic 节点是异步的：否决时可以取消仍在进行的调用
+        result = asyncio.run(app.ainvoke(initial_state))
     
     # 输出结果
     print("\n" + "="*60)
@@ -675,6 +983,27 @@ def main():
     print("\n📜 Revision History:")
     for entry in result["revision_history"]:
         print(f"   • {entry}")
+    
+    print("\n🚦 Rate Limiting:")
+    print_rate_limit_report()
+    
+    print("\n💰 Usage by node:")
+    print(ledger.format_summary(by="node"))
+    print("\n💰 Usage by iteration:")
+    print(ledger.format_summary(by="iteration"))
+    
+    print("\n⏱️ Node latency:")
+    print(metrics.report())
+    if observability.metrics_file:
+        metrics.dump(observability.metrics_file)
+    if observability.profile_node:
+        disable_node_profiling(observability.profile_node)
+    
+    if tracing and observability.trace_exporter == "file":
+        spans = load_spans(observability.trace_file)
+        latest = [s for s in spans if s["trace_id"] == spans[-1]["trace_id"]]
+        print(f"\n🧭 Critical path (spans in {observability.trace_file}):")
+        print(format_critical_path(critical_path(latest)))
 
 
 if __name__ == "__main__":
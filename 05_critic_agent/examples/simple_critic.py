@@ -10,12 +10,15 @@ import sys
 from typing import TypedDict, List, Literal
 from enum import Enum
 
-# 添加 src 到路径
+# 添加 src 与仓库根目录 (shared/) 到路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from langgraph.graph import StateGraph, END
 from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
+
+from shared.prompts import prompt_registry, render_rules
+from shared.usage import UsageCallbackHandler, track_usage
 
 # os.environ["OPENAI_API_KEY"] = "your-api-key"
 
@@ -43,9 +46,10 @@ class CriticState(TypedDict):
 class CoderAgent:
     """编码智能体"""
     
-    def __init__(self, llm: ChatOpenAI):
-        self.llm = llm
-        self.prompt = ChatPromptTemplate.from_messages([
+    # 模板在导入时编译一次，所有实例共享
+    prompt = prompt_registry.register(
+        "simple_critic.coder",
+        [
             ("system", """You are an expert Python developer.
 Write clean, efficient, and well-documented code.
 Follow PEP 8 style guidelines.
@@ -57,8 +61,14 @@ Requirements:
 
 {revision_instructions}
 
-Write the Python code:""")
-        ])
+Write the Python code:"""),
+        ],
+        variables={"task", "requirements", "revision_instructions"},
+    )
+    
+    def __init__(self, llm: ChatOpenAI):
+        self.llm = llm
+        self.chain = self.prompt | llm
     
     def generate(self, state: CriticState) -> str:
         revision = ""
@@ -71,10 +81,9 @@ Critic's feedback:
 
 Please address ALL issues mentioned above."""
         
-        chain = self.prompt | self.llm
-        response = chain.invoke({
+        response = self.chain.invoke({
             "task": state["task"],
-            "requirements": "\n".join(f"- {r}" for r in state["requirements"]),
+            "requirements": render_rules(state["requirements"]),
             "revision_instructions": revision
         })
         return response.content
@@ -92,30 +101,35 @@ class CriticAgent:
         "Code style - Does it follow PEP 8?",
     ]
     
-    def __init__(self, llm: ChatOpenAI):
-        self.llm = llm
-        self.prompt = ChatPromptTemplate.from_messages([
+    # 审查标准在注册时渲染进 system 前缀，每次调用只填入任务和代码
+    prompt = prompt_registry.register(
+        "simple_critic.critic",
+        [
             ("system", """You are an expert code reviewer.
 Review the code against these criteria:
 {criteria}
 
 Be specific and actionable in your feedback.
 If ALL criteria are met, respond with exactly: "APPROVED"
-Otherwise, list the specific issues that need to be fixed."""),
+Otherwise, list the specific issues that need to be fixed.
+Provide your detailed review."""),
             ("human", """Task: {task}
 
 Code to review:
 ```python
 {code}
-```
-
-Provide your detailed review:""")
-        ])
+```"""),
+        ],
+        variables={"task", "code"},
+        partials={"criteria": render_rules(REVIEW_CRITERIA)},
+    )
+    
+    def __init__(self, llm: ChatOpenAI):
+        self.llm = llm
+        self.chain = self.prompt | llm
     
     def review(self, state: CriticState) -> dict:
-        chain = self.prompt | self.llm
-        response = chain.invoke({
-            "criteria": "\n".join(f"- {c}" for c in self.REVIEW_CRITERIA),
+        response = self.chain.invoke({
             "task": state["task"],
             "code": state["code"]
         })
@@ -232,6 +246,10 @@ def main():
         "Include a docstring with examples",
     ]
     
+    print("\n📏 Prompt templates (static tokens):")
+    for name, tokens in prompt_registry.token_counts().items():
+        print(f"   - {name}: {tokens}")
+    
     print(f"\n📋 Task: {task}")
     print(f"📝 Requirements:")
     for r in requirements:
@@ -249,8 +267,9 @@ def main():
         "history": []
     }
     
-    # 运行
-    result = app.invoke(initial_state)
+    # 运行（通过调用配置挂上用量回调）
+    with track_usage("simple-critic") as ledger:
+        result = app.invoke(initial_state, config={"callbacks": [UsageCallbackHandler()]})
     
     # 输出结果
     print("\n" + "=" * 60)
@@ -261,6 +280,8 @@ def main():
     print(f"\nFinal code:\n{'-'*30}")
     print(result["code"])
     
+    print(f"\n💰 Usage:\n{ledger.format_summary(by='node')}")
+    
     return result
 
 
@@ -2,8 +2,16 @@
 Critic Agent Package
 """
 
-from .graph.state import CriticState, ReviewStatus, create_initial_state
-from .graph.workflow import create_workflow
+import os
+import sys
+
+# 共享工具位于仓库根目录的 shared/ 包
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from .graph.state import CriticState, ReviewStatus, create_initial_state  # noqa: E402
+from .graph.workflow import create_workflow  # noqa: E402
 
 __all__ = [
     "CriticState",
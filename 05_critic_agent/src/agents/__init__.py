@@ -1 +1,14 @@
 """Agents module"""
+from .chunked_critic import (
+    create_chunked_critic_node,
+    format_issues,
+    map_reduce_review,
+    reduce_issues,
+)
+
+__all__ = [
+    "create_chunked_critic_node",
+    "format_issues",
+    "map_reduce_review",
+    "reduce_issues",
+]
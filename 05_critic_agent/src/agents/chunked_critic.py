@@ -0,0 +1,235 @@
+"""
+Critic Agent - 分片 map-reduce 评审
+
+大文件整份放进一个提示词时，超出上下文或评审质量下降，且所有分析都串行在
+一次调用里。这里按 AST 边界把代码切成 token 有上限的片段（shared.code_chunks），
+并行评审各片段（map），再把各片段的问题合并成一个 Issue 列表（reduce），
+行号映射回文件行号。
+"""
+
+import asyncio
+from typing import Iterable, Literal, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+from shared.code_chunks import CodeChunk, chunk_code, module_context, source_lines
+from shared.json_stream import JsonExtractionError
+from shared.llm_providers import ainvoke_structured
+from shared.prompts import CRITIC_RULES_PROMPT, CachedPrompt
+from shared.settings import get_settings
+
+from ..graph.state import CriticState, Issue, ReviewStatus
+
+
+SEVERITY_ORDER = {"error": 0, "warning": 1, "info": 2}
+
+CHUNK_CRITIC_PROMPT = CachedPrompt(
+    system=f"""You are an expert code reviewer. You review one chunk of a larger source file;
+the other chunks are reviewed separately, so report only issues visible in this chunk.
+
+Report each issue with:
+- severity: "error" (must fix), "warning" (should fix) or "info"
+- category: correctness, security, style or performance
+- line: line number inside the chunk (the first line of the chunk is line 1), or null
+- message, and a concrete suggestion when you have one
+
+Return an empty issue list when the chunk meets all rules.
+
+{CRITIC_RULES_PROMPT}
+""",
+    human="""File: {path} (lines {start_line}-{end_line} of {total_lines}; {symbols})
+
+Imports of the file (context only, not part of the chunk):
+```{language}
+{imports}
+```
+
+Chunk:
+```{language}
+{code}
+```""",
+)
+
+
+class ChunkIssue(BaseModel):
+    """片段中的一个问题（行号相对片段）"""
+    severity: Literal["error", "warning", "info"] = "warning"
+    category: Literal["correctness", "security", "style", "performance"] = "correctness"
+    line: Optional[int] = Field(None, description="Line inside the chunk, 1 = first line of the chunk")
+    message: str
+    suggestion: Optional[str] = None
+
+    @field_validator("severity", "category", mode="before")
+    @classmethod
+    def _normalize(cls, value):
+        return str(value).strip().lower() if value else value
+
+
+class ChunkReview(BaseModel):
+    """片段评审输出"""
+    issues: list[ChunkIssue] = Field(default_factory=list)
+
+
+async def review_chunk(
+    llm,
+    chunk: CodeChunk,
+    *,
+    path: str,
+    total_lines: int,
+    imports: str,
+    language: str = "python",
+    prompt: CachedPrompt = CHUNK_CRITIC_PROMPT,
+    strict: bool = False,
+    **values
+) -> list[Issue]:
+    """评审一个片段，返回行号已映射为文件行号的问题
+
+    输出无法解析时返回一条 warning，而不是让整次评审失败。
+
+    Args:
+        prompt: 评审提示词，默认 CHUNK_CRITIC_PROMPT
+        strict: 为 True 时输出无法解析直接抛出 JsonExtractionError
+            （结果要缓存时使用，避免把不完整的评审当成结论保存）
+        **values: prompt 额外需要的模板字段
+    """
+    messages = prompt.messages(
+        path=path,
+        start_line=chunk.start_line,
+        end_line=chunk.end_line,
+        total_lines=total_lines,
+        symbols=", ".join(chunk.symbols) or "module-level code",
+        imports=imports or "# (none)",
+        language=language,
+        code=chunk.text,
+        **values,
+    )
+    try:
+        review = await ainvoke_structured(llm, messages, ChunkReview)
+    except JsonExtractionError as e:
+        if strict:
+            raise
+        return [Issue(
+            severity="warning",
+            category="correctness",
+            line=chunk.start_line,
+            message=f"Lines {chunk.start_line}-{chunk.end_line} could not be reviewed: {e}",
+            suggestion=None,
+        )]
+    return [
+        Issue(
+            severity=issue.severity,
+            category=issue.category,
+            line=chunk.to_file_line(issue.line),
+            message=issue.message,
+            suggestion=issue.suggestion,
+        )
+        for issue in review.issues
+    ]
+
+
+def reduce_issues(results: Iterable[list[Issue]]) -> list[Issue]:
+    """合并各片段的问题：去重，并按行号、严重程度排序"""
+    merged: dict[tuple, Issue] = {}
+    for issues in results:
+        for issue in issues:
+            key = (issue["category"], issue["line"], issue["message"].strip().lower())
+            merged.setdefault(key, issue)
+    return sorted(
+        merged.values(),
+        key=lambda i: (i["line"] is None, i["line"] or 0, SEVERITY_ORDER.get(i["severity"], 3)),
+    )
+
+
+async def map_reduce_review(
+    code: str,
+    llm,
+    *,
+    path: str = "<code>",
+    language: str = "python",
+    max_chunk_tokens: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    strict: bool = False
+) -> list[Issue]:
+    """分片并行评审整份代码
+
+    Args:
+        code: 源码
+        llm: LangChain Chat Model
+        path: 提示词中显示的文件名
+        max_chunk_tokens: 每个片段的 token 上限，默认 settings.critic_agent.chunk_max_tokens
+        max_concurrency: 同时评审的片段数，默认 settings.critic_agent.chunk_concurrency
+        strict: 任一片段输出无法解析时抛出异常，见 review_chunk
+
+    Returns:
+        合并后的问题列表（文件行号）
+    """
+    settings = get_settings().critic_agent
+    chunks = chunk_code(code, max_chunk_tokens or settings.chunk_max_tokens)
+    total_lines = len(source_lines(code))
+    imports = module_context(code)
+    semaphore = asyncio.Semaphore(max_concurrency or settings.chunk_concurrency)
+
+    async def run(chunk: CodeChunk) -> list[Issue]:
+        async with semaphore:
+            return await review_chunk(
+                llm, chunk, path=path, total_lines=total_lines, imports=imports,
+                language=language, strict=strict,
+            )
+
+    results = await asyncio.gather(*(run(chunk) for chunk in chunks))
+    return reduce_issues(results)
+
+
+def format_issues(issues: list[Issue]) -> str:
+    """把问题列表渲染成批评文本（给 Coder 看）"""
+    lines = []
+    for issue in issues:
+        where = f"L{issue['line']}" if issue["line"] else "general"
+        line = f"- {where} [{issue['severity']}/{issue['category']}] {issue['message']}"
+        if issue.get("suggestion"):
+            line += f" → {issue['suggestion']}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def create_chunked_critic_node(
+    llm,
+    *,
+    path: str = "<code>",
+    max_chunk_tokens: Optional[int] = None,
+    max_concurrency: Optional[int] = None
+):
+    """创建分片评审的 critic 节点（异步，需用 app.ainvoke 运行）
+
+    没有 error 级问题时通过审查。
+
+    Args:
+        llm: LangChain Chat Model
+        path: 提示词中显示的文件名
+        max_chunk_tokens / max_concurrency: 见 map_reduce_review
+    """
+    async def chunked_critic_node(state: CriticState) -> dict:
+        issues = await map_reduce_review(
+            state["code"],
+            llm,
+            path=path,
+            language=state["language"],
+            max_chunk_tokens=max_chunk_tokens,
+            max_concurrency=max_concurrency,
+        )
+        approved = not any(issue["severity"] == "error" for issue in issues)
+        status = ReviewStatus.APPROVED if approved else ReviewStatus.NEEDS_REVISION
+
+        print(f"🧩 Chunked review: {len(issues)} issues, status {status.value}")
+        return {
+            "issues": issues,
+            "critique": format_issues(issues) if issues else "APPROVED",
+            "review_status": status.value,
+            "history": [{
+                "iteration": state["iteration"],
+                "status": status.value,
+                "issues": len(issues),
+            }],
+        }
+
+    return chunked_critic_node
@@ -2,9 +2,16 @@
 Critic Agent - 状态定义
 """
 
-from typing import TypedDict, List, Optional
+from typing import Annotated, TypedDict, List, Optional, Sequence
 from enum import Enum
 
+from shared.reducers import bounded_append, keyed_merge
+from shared.settings import get_settings
+
+
+# 历史记录最多保留的迭代轮数
+HISTORY_LIMIT = 10
+
 
 class ReviewStatus(Enum):
     """审查状态"""
@@ -37,19 +44,24 @@ class CriticState(TypedDict):
     
     # === 代码状态 ===
     code: str                    # 当前代码
+    previous_code: str           # 上一轮代码（层级工作流按差异选择 Critic）
     language: str                # 编程语言
     
     # === 审查状态 ===
     critique: str                # 批评文本
     review_status: str           # ReviewStatus 值
     issues: List[Issue]          # 结构化问题列表
+    # 层级工作流中各专业 Critic 的结果，按 "critic" 字段合并；
+    # 未重跑的 Critic 保留上一轮结果
+    critic_results: Annotated[dict, keyed_merge("critic")]
     
     # === 迭代控制 ===
     iteration: int               # 当前迭代次数
     max_iterations: int          # 最大迭代次数
     
     # === 历史记录 ===
-    history: List[dict]          # 每轮迭代的记录
+    # 每轮迭代的记录（环形缓冲，只保留最近 HISTORY_LIMIT 轮）
+    history: Annotated[Sequence[dict], bounded_append(HISTORY_LIMIT)]
     
     # === 元数据 ===
     metadata: Optional[dict]     # 额外信息
@@ -58,19 +70,27 @@ class CriticState(TypedDict):
 def create_initial_state(
     task: str,
     requirements: List[str],
-    max_iterations: int = 3,
+    max_iterations: Optional[int] = None,
     language: str = "python"
 ) -> CriticState:
-    """创建初始状态的工厂函数"""
+    """创建初始状态的工厂函数
+    
+    Args:
+        max_iterations: 最大迭代次数，默认取 get_settings().critic_agent.max_iterations
+    """
+    if max_iterations is None:
+        max_iterations = get_settings().critic_agent.max_iterations
     return CriticState(
         task=task,
         requirements=requirements,
         context=None,
         code="",
+        previous_code="",
         language=language,
         critique="",
         review_status=ReviewStatus.PENDING.value,
         issues=[],
+        critic_results={},
         iteration=0,
         max_iterations=max_iterations,
         history=[],
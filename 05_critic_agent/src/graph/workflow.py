@@ -2,10 +2,16 @@
 Critic Agent - 工作流定义
 """
 
-from typing import Literal
-from langgraph.graph import StateGraph, END
+import functools
+import inspect
+from typing import Callable, Iterable, Literal, Optional
+from langgraph.graph import END
 from langgraph.checkpoint.sqlite import SqliteSaver
 
+from shared.diff_analysis import DEFAULT_CRITIC_CONCERNS, analyze_diff, select_critics
+from shared.settings import apply_graph_settings, get_settings
+from shared.tracing import TracedStateGraph
+
 from .state import CriticState, ReviewStatus
 
 
@@ -43,8 +49,8 @@ def create_workflow(
     Returns:
         编译后的工作流
     """
-    # 创建状态图
-    workflow = StateGraph(CriticState)
+    # 创建状态图（节点自动带 OpenTelemetry span）
+    workflow = TracedStateGraph(CriticState, name="critic-loop")
     
     # 添加节点
     workflow.add_node("coder", coder_node)
@@ -71,26 +77,88 @@ def create_workflow(
     if with_memory:
         # 使用 SQLite 持久化（支持时间旅行）
         memory = SqliteSaver.from_conn_string(":memory:")
-        return workflow.compile(checkpointer=memory)
+        app = workflow.compile(checkpointer=memory)
     else:
-        return workflow.compile()
+        app = workflow.compile()
+    
+    # 并发上限与超步超时（CRITIC_AGENT__* 或 settings.toml）
+    return apply_graph_settings(app, get_settings().critic_agent)
+
+
+def record_previous_code(coder_node: Callable) -> Callable:
+    """包装编码节点：在更新中记下修改前的代码（previous_code）"""
+    if inspect.iscoroutinefunction(coder_node):
+        @functools.wraps(coder_node)
+        async def async_wrapper(state: CriticState):
+            previous = state.get("code", "")
+            update = dict(await coder_node(state) or {})
+            update["previous_code"] = previous
+            return update
+        return async_wrapper
+    
+    @functools.wraps(coder_node)
+    def wrapper(state: CriticState):
+        previous = state.get("code", "")
+        update = dict(coder_node(state) or {})
+        update["previous_code"] = previous
+        return update
+    return wrapper
+
+
+def route_critics(
+    critics: Iterable[str],
+    critic_concerns: Optional[dict] = None
+) -> Callable[[CriticState], list[str]]:
+    """创建 Coder 之后的扇出路由：只重跑结论可能因本轮修订而改变的 Critic
+    
+    Args:
+        critics: 专业 Critic 名（节点名为 critic_<名>）
+        critic_concerns: Critic 名 -> 关心的变化类型，默认取
+            shared.diff_analysis.DEFAULT_CRITIC_CONCERNS，未知的 Critic 任何变化都重跑
+    """
+    critic_concerns = critic_concerns or {}
+    concerns = {
+        name: critic_concerns.get(name, DEFAULT_CRITIC_CONCERNS.get(name))
+        for name in critics
+    }
+    
+    def route(state: CriticState) -> list[str]:
+        names = list(concerns)
+        if get_settings().critic_agent.adaptive_critics and state.get("previous_code"):
+            analysis = analyze_diff(state["previous_code"], state["code"])
+            names = select_critics(analysis, concerns, state.get("critic_results") or {})
+        # 没有需要重跑的 Critic 时直接交给元批评家
+        return [f"critic_{name}" for name in names] or ["meta_critic"]
+    
+    return route
 
 
 def create_hierarchical_workflow(
     coder_node,
     critics: dict,  # {"security": func, "style": func, "logic": func}
     meta_critic_node,
-    with_memory: bool = False
+    with_memory: bool = False,
+    critic_concerns: Optional[dict] = None
 ):
     """创建层级批评家工作流
     
     架构:
         Coder -> [Security, Style, Logic Critics] -> Meta Critic -> ...
+    
+    第二轮起按代码差异只重跑受影响的 Critic（settings.critic_agent.adaptive_critics）。
+    Critic 节点把结果写入 critic_results 才能被沿用：
+    
+        return {"critic_results": [{"critic": "security", "score": 8, ...}]}
+    
+    没有上一轮结果的 Critic 总是重跑，元批评家从 critic_results 读取所有结果。
+    
+    Args:
+        critic_concerns: Critic 名 -> 关心的变化类型（见 shared.diff_analysis）
     """
-    workflow = StateGraph(CriticState)
+    workflow = TracedStateGraph(CriticState, name="hierarchical-critic")
     
     # 添加编码节点
-    workflow.add_node("coder", coder_node)
+    workflow.add_node("coder", record_previous_code(coder_node))
     
     # 添加各专业批评家
     for name, critic_func in critics.items():
@@ -102,10 +170,13 @@ def create_hierarchical_workflow(
     # 设置入口
     workflow.set_entry_point("coder")
     
-    # Coder -> 所有批评家（并行）
+    # Coder -> 受本轮修订影响的批评家（并行）
     critic_names = [f"critic_{name}" for name in critics.keys()]
-    for name in critic_names:
-        workflow.add_edge("coder", name)
+    workflow.add_conditional_edges(
+        "coder",
+        route_critics(critics, critic_concerns),
+        critic_names + ["meta_critic"]
+    )
     
     # 所有批评家 -> 元批评家
     for name in critic_names:
@@ -120,6 +191,8 @@ def create_hierarchical_workflow(
     
     if with_memory:
         memory = SqliteSaver.from_conn_string(":memory:")
-        return workflow.compile(checkpointer=memory)
+        app = workflow.compile(checkpointer=memory)
+    else:
+        app = workflow.compile()
     
-    return workflow.compile()
+    return apply_graph_settings(app, get_settings().critic_agent)
@@ -0,0 +1,37 @@
+"""Pipeline module"""
+from .diff_review import (
+    DiffReviewReport,
+    ReviewWindow,
+    changed_hunks,
+    format_diff_report,
+    parse_unified_diff,
+    review_diff,
+    review_windows,
+)
+from .index import IndexEntry, ReviewIndex
+from .repo_review import (
+    RepoReviewReport,
+    format_report,
+    iter_source_files,
+    llm_reviewer,
+    review_repository,
+    ruleset_version,
+)
+
+__all__ = [
+    "DiffReviewReport",
+    "IndexEntry",
+    "RepoReviewReport",
+    "ReviewIndex",
+    "ReviewWindow",
+    "changed_hunks",
+    "format_diff_report",
+    "format_report",
+    "iter_source_files",
+    "llm_reviewer",
+    "parse_unified_diff",
+    "review_diff",
+    "review_repository",
+    "review_windows",
+    "ruleset_version",
+]
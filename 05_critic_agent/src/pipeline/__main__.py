@@ -0,0 +1,76 @@
+"""
+仓库评审入口
+
+用法（在 05_critic_agent 目录下）：
+    python -m src.pipeline /path/to/repo
+    python -m src.pipeline /path/to/repo --force --fail-on-error
+    python -m src.pipeline /path/to/repo --base origin/main --head HEAD   # 只评审改动
+"""
+
+import argparse
+import asyncio
+import sys
+
+from shared.llm_providers import get_llm
+from shared.settings import get_settings
+
+from .diff_review import format_diff_report, review_diff
+from .repo_review import format_report, llm_reviewer, review_repository, ruleset_version
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Review changed files of a repository")
+    parser.add_argument("root", help="仓库根目录")
+    parser.add_argument("--provider", default="openai")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--index", default=None, help="索引数据库路径")
+    parser.add_argument("--concurrency", type=int, default=None, help="同时评审的文件数（--base 模式下为窗口数）")
+    parser.add_argument("--ext", action="append", default=None, help="文件后缀，可重复，默认 .py")
+    parser.add_argument("--force", action="store_true", help="忽略索引，全部重新评审")
+    parser.add_argument("--base", default=None, help="只评审 base..head 之间的改动（PR 评审）")
+    parser.add_argument("--head", default="HEAD", help="与 --base 一起使用，默认 HEAD")
+    parser.add_argument("--context", type=int, default=None, help="--base 模式下改动前后的上下文行数")
+    parser.add_argument("--fail-on-error", action="store_true", help="有 error 级问题或评审失败的文件时退出码为 1")
+    args = parser.parse_args()
+
+    llm = get_llm(args.provider, args.model, rate_limit=True)
+    extensions = args.ext or (".py",)
+
+    if args.base:
+        print(f"🚀 Reviewing {args.base}..{args.head} in {args.root}")
+        report = asyncio.run(review_diff(
+            args.root, llm, args.base, args.head,
+            extensions=extensions,
+            context=args.context,
+            max_concurrency=args.concurrency,
+        ))
+        print(format_diff_report(report))
+        return _exit_code(report.issues, report.failed, args.fail_on_error)
+
+    # 模型和片段大小影响评审结果，变化后需要重新评审
+    ruleset = ruleset_version(
+        args.provider, args.model or "", str(get_settings().critic_agent.chunk_max_tokens)
+    )
+
+    print(f"🚀 Reviewing {args.root}")
+    report = asyncio.run(review_repository(
+        args.root,
+        llm_reviewer(llm),
+        index_path=args.index,
+        ruleset=ruleset,
+        extensions=extensions,
+        max_concurrency=args.concurrency,
+        force=args.force,
+    ))
+    print(format_report(report))
+    return _exit_code(report.issues, report.failed, args.fail_on_error)
+
+
+def _exit_code(issues: dict, failed: dict, fail_on_error: bool) -> int:
+    """有 error 级问题或评审失败（提供商故障、密钥错误等）时，CI 不能当作通过"""
+    has_errors = any(issue["severity"] == "error" for found in issues.values() for issue in found)
+    return 1 if (fail_on_error and (has_errors or failed)) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
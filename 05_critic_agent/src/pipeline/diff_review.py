@@ -0,0 +1,327 @@
+"""
+Critic Agent - git diff 增量评审
+
+PR 评审只需要看改动，而不是整个仓库。给定 base / head 两个提交：
+
+1. git diff 列出改动的文件和 head 侧的改动行（hunk）
+2. 每处改动扩展出评审窗口：能放进一个片段的最内层函数 / 类整体作为窗口，
+   否则取改动前后各 N 行；重叠或相邻的窗口合并，仍超过片段上限的窗口
+   （新文件、大段改动）按 chunk_code 的片段边界切开
+3. 窗口作为片段并发送入分片评审（agents.chunked_critic.review_chunk），
+   提示词标出窗口内哪些行是改动，只报告改动引入的问题
+4. 问题行号映射为 head 版本的文件行号
+
+评审量随改动大小增长，与仓库大小无关。
+"""
+
+import ast
+import asyncio
+import re
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from shared.code_chunks import CodeChunk, chunk_code, module_context, source_lines
+from shared.prompts import CachedPrompt
+from shared.settings import get_settings
+from shared.tokens import count_tokens
+
+from ..agents.chunked_critic import CHUNK_CRITIC_PROMPT, reduce_issues, review_chunk
+from ..graph.state import Issue
+
+
+HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+# 与 CHUNK_CRITIC_PROMPT 共用 system 前缀（可命中提示词缓存）
+HUNK_CRITIC_PROMPT = CachedPrompt(
+    system=CHUNK_CRITIC_PROMPT.system,
+    human="""This chunk is part of a code change. Review the change only: report issues on the
+changed lines or caused by them, not pre-existing problems in the surrounding context.
+
+File: {path} (lines {start_line}-{end_line} of {total_lines}; {symbols})
+Changed lines (chunk numbering): {changed_lines}
+
+Imports of the file (context only, not part of the chunk):
+```{language}
+{imports}
+```
+
+Chunk:
+```{language}
+{code}
+```""",
+)
+
+
+@dataclass
+class ReviewWindow:
+    """送去评审的一段 head 代码及其中的改动行（文件行号，含首尾）"""
+    start_line: int
+    end_line: int
+    hunks: list[tuple[int, int]] = field(default_factory=list)
+
+    def to_chunk(self, lines: list[str]) -> CodeChunk:
+        text = "\n".join(lines[self.start_line - 1:self.end_line])
+        return CodeChunk(self.start_line, self.end_line, text, (), count_tokens(text))
+
+    def changed_lines(self) -> str:
+        """改动行（片段内行号），如 "3-5, 9" """
+        parts = []
+        for start, end in self.hunks:
+            start, end = start - self.start_line + 1, end - self.start_line + 1
+            parts.append(str(start) if start == end else f"{start}-{end}")
+        return ", ".join(parts)
+
+
+@dataclass
+class DiffReviewReport:
+    """一次 diff 评审的结果"""
+    base: str
+    head: str
+    issues: dict[str, list[Issue]] = field(default_factory=dict)   # 路径 -> 问题（head 文件行号）
+    failed: dict[str, str] = field(default_factory=dict)           # 路径 -> 错误
+    hunks: int = 0
+    windows: int = 0
+    reviewed_lines: int = 0
+    seconds: float = 0.0
+
+    @property
+    def issue_count(self) -> int:
+        return sum(len(issues) for issues in self.issues.values())
+
+
+# ==========================================
+# git
+# ==========================================
+
+def _git(root: str, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-c", "core.quotePath=false", *args],
+        cwd=root, capture_output=True, check=True,
+    ).stdout.decode("utf-8", errors="replace")
+
+
+def parse_unified_diff(diff: str) -> dict[str, list[tuple[int, int]]]:
+    """解析 git diff 输出，返回 head 路径 -> head 侧改动行范围（含首尾）
+
+    纯删除的 hunk 记为删除位置所在的一行，删除也可能引入问题。
+    删除的文件（+++ /dev/null）不出现在结果中。
+    """
+    hunks: dict[str, list[tuple[int, int]]] = {}
+    path = None
+    for line in diff.split("\n"):
+        if line.startswith("+++ "):
+            target = line[4:].strip()
+            path = target[2:] if target.startswith("b/") else None
+            if path is not None:
+                hunks.setdefault(path, [])
+            continue
+        match = HUNK_HEADER.match(line)
+        if match and path is not None:
+            start = int(match.group(1))
+            count = 1 if match.group(2) is None else int(match.group(2))
+            if count == 0:
+                hunks[path].append((max(start, 1), max(start, 1)))
+            else:
+                hunks[path].append((start, start + count - 1))
+    return hunks
+
+
+def changed_hunks(
+    root: str,
+    base: str,
+    head: str = "HEAD",
+    extensions: Iterable[str] = (".py",)
+) -> dict[str, list[tuple[int, int]]]:
+    """base 与 head 之间改动的文件及 head 侧改动行"""
+    diff = _git(
+        # 显式指定前缀：用户配置了 diff.noprefix / diff.mnemonicPrefix 时路径仍以 b/ 开头
+        root, "diff", "--no-color", "--no-ext-diff", "--unified=0", "--find-renames",
+        "--src-prefix=a/", "--dst-prefix=b/",
+        "--diff-filter=d", base, head, "--", *(f"*{ext}" for ext in extensions),
+    )
+    return {path: hunks for path, hunks in parse_unified_diff(diff).items() if hunks}
+
+
+# ==========================================
+# 评审窗口
+# ==========================================
+
+def _definitions(code: str) -> list[tuple[int, int]]:
+    """所有函数 / 类的行范围（含装饰器）；无法解析时为空"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    return [
+        (min([node.lineno] + [d.lineno for d in node.decorator_list]), node.end_lineno)
+        for node in ast.walk(tree)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+    ]
+
+
+def review_windows(
+    code: str,
+    hunks: list[tuple[int, int]],
+    context: int,
+    max_tokens: int
+) -> list[ReviewWindow]:
+    """把改动行扩展为评审窗口
+
+    Args:
+        code: head 版本的文件内容
+        hunks: 改动行范围（文件行号）
+        context: 不在定义内（或定义太大）时，改动前后附带的行数
+        max_tokens: 完整放入窗口的定义的 token 上限
+
+    Returns:
+        按行号排序、互不重叠的窗口；每个窗口不超过 max_tokens（单行超限除外）
+    """
+    lines = source_lines(code)
+    if not lines:
+        return []
+    definitions = _definitions(code)
+
+    windows = []
+    for start, end in sorted(hunks):
+        start, end = min(start, len(lines)), min(end, len(lines))
+        enclosing = sorted(
+            (d for d in definitions if d[0] <= start and end <= d[1]),
+            key=lambda d: d[1] - d[0],
+        )
+        window = None
+        for d_start, d_end in enclosing:
+            if count_tokens("\n".join(lines[d_start - 1:d_end])) <= max_tokens:
+                window = ReviewWindow(d_start, d_end, [(start, end)])
+                break
+        if window is None:
+            window = ReviewWindow(max(1, start - context), min(len(lines), end + context), [(start, end)])
+        windows.append(window)
+
+    windows.sort(key=lambda w: w.start_line)
+    merged: list[ReviewWindow] = []
+    for window in windows:
+        if merged and window.start_line <= merged[-1].end_line + 1:
+            merged[-1].end_line = max(merged[-1].end_line, window.end_line)
+            merged[-1].hunks.extend(window.hunks)
+        else:
+            merged.append(window)
+
+    result: list[ReviewWindow] = []
+    chunks = None
+    for window in merged:
+        if count_tokens("\n".join(lines[window.start_line - 1:window.end_line])) <= max_tokens:
+            result.append(window)
+            continue
+        chunks = chunks or chunk_code(code, max_tokens)
+        result.extend(_split_window(window, chunks))
+    return result
+
+
+def _split_window(window: ReviewWindow, chunks: list[CodeChunk]) -> list[ReviewWindow]:
+    """按片段边界切开超限的窗口，只保留含改动的部分"""
+    pieces = []
+    for chunk in chunks:
+        start, end = max(chunk.start_line, window.start_line), min(chunk.end_line, window.end_line)
+        if start > end:
+            continue
+        hunks = [
+            (max(h_start, start), min(h_end, end))
+            for h_start, h_end in window.hunks
+            if h_start <= end and h_end >= start
+        ]
+        if hunks:
+            pieces.append(ReviewWindow(start, end, hunks))
+    return pieces
+
+
+# ==========================================
+# 评审
+# ==========================================
+
+async def review_diff(
+    root: str,
+    llm,
+    base: str,
+    head: str = "HEAD",
+    *,
+    extensions: Iterable[str] = (".py",),
+    context: Optional[int] = None,
+    max_chunk_tokens: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    language: str = "python"
+) -> DiffReviewReport:
+    """评审 base..head 之间的改动
+
+    Args:
+        root: git 仓库目录
+        llm: LangChain Chat Model
+        base / head: 比较的两个提交（任意 git revision）
+        extensions: 参与评审的文件后缀
+        context: 改动前后附带的上下文行数，默认 settings.critic_agent.diff_context_lines
+        max_chunk_tokens: 完整放入窗口的定义的 token 上限，默认 settings.critic_agent.chunk_max_tokens
+        max_concurrency: 同时评审的窗口数，默认 settings.critic_agent.chunk_concurrency
+
+    Returns:
+        DiffReviewReport，问题行号为 head 版本的文件行号
+    """
+    settings = get_settings().critic_agent
+    context = settings.diff_context_lines if context is None else context
+    max_chunk_tokens = max_chunk_tokens or settings.chunk_max_tokens
+    semaphore = asyncio.Semaphore(max_concurrency or settings.chunk_concurrency)
+    report = DiffReviewReport(base=base, head=head)
+    started = time.perf_counter()
+
+    async def review_file(path: str, hunks: list[tuple[int, int]]) -> None:
+        try:
+            code = _git(root, "show", f"{head}:{path}")
+        except subprocess.CalledProcessError as e:
+            report.failed[path] = e.stderr.decode("utf-8", errors="replace").strip()
+            return
+        lines = source_lines(code)
+        windows = review_windows(code, hunks, context, max_chunk_tokens)
+        imports = module_context(code)
+        report.hunks += len(hunks)
+        report.windows += len(windows)
+        report.reviewed_lines += sum(w.end_line - w.start_line + 1 for w in windows)
+
+        async def run(window: ReviewWindow) -> list[Issue]:
+            async with semaphore:
+                return await review_chunk(
+                    llm, window.to_chunk(lines),
+                    path=path, total_lines=len(lines), imports=imports, language=language,
+                    prompt=HUNK_CRITIC_PROMPT, changed_lines=window.changed_lines(),
+                    # 无法解析的输出让文件进入 report.failed，--fail-on-error 才能拦住
+                    strict=True,
+                )
+
+        try:
+            results = await asyncio.gather(*(run(window) for window in windows))
+        except Exception as e:   # 单个文件失败不影响其他文件
+            report.failed[path] = f"{type(e).__name__}: {e}"
+            return
+        report.issues[path] = reduce_issues(results)
+        print(f"   🔍 {path}: {len(hunks)} hunks, {len(report.issues[path])} issues")
+
+    files = changed_hunks(root, base, head, extensions)
+    await asyncio.gather(*(review_file(path, hunks) for path, hunks in sorted(files.items())))
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def format_diff_report(report: DiffReviewReport) -> str:
+    """评审结果摘要，问题按 path:line 列出"""
+    lines = [
+        f"🔀 {report.base}..{report.head}: {len(report.issues)} files, {report.hunks} hunks, "
+        f"{report.windows} windows ({report.reviewed_lines} lines) in {report.seconds:.1f}s",
+        f"🐛 {report.issue_count} issues",
+    ]
+    for path, error in sorted(report.failed.items()):
+        lines.append(f"   ⚠️  {path}: {error}")
+    for path in sorted(report.issues):
+        for issue in report.issues[path]:
+            where = f"{path}:{issue['line']}" if issue["line"] else path
+            lines.append(f"   [{issue['severity']}/{issue['category']}] {where} {issue['message']}")
+    return "\n".join(lines)
@@ -0,0 +1,94 @@
+"""
+Critic Agent - 仓库评审索引
+
+把每个文件上一次的评审结果存进本地 SQLite：路径、大小、修改时间、内容哈希、
+规则集版本和问题列表。再次运行时，内容哈希与规则集版本都没变的文件直接复用
+结果；大小和修改时间也没变时连哈希都不用重新计算。
+"""
+
+import json
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from ..graph.state import Issue
+
+
+@dataclass
+class IndexEntry:
+    """一个文件的评审记录"""
+    path: str                    # 相对仓库根目录，使用 / 分隔
+    size: int
+    mtime_ns: int
+    content_hash: str
+    ruleset: str
+    issues: list[Issue] = field(default_factory=list)
+    reviewed_at: float = 0.0
+
+
+class ReviewIndex:
+    """基于 SQLite 的评审结果索引
+
+    Args:
+        path: 数据库文件；":memory:" 用于测试
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS reviews (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                ruleset TEXT NOT NULL,
+                issues TEXT NOT NULL,
+                reviewed_at REAL NOT NULL
+            )"""
+        )
+
+    def get(self, path: str) -> Optional[IndexEntry]:
+        row = self._conn.execute(
+            "SELECT path, size, mtime_ns, content_hash, ruleset, issues, reviewed_at "
+            "FROM reviews WHERE path = ?",
+            (path,),
+        ).fetchone()
+        if row is None:
+            return None
+        return IndexEntry(*row[:5], issues=json.loads(row[5]), reviewed_at=row[6])
+
+    def put(self, entry: IndexEntry) -> None:
+        """写入一条记录并立即提交（中途中断的运行也保留已完成的文件）"""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO reviews VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                entry.path, entry.size, entry.mtime_ns, entry.content_hash, entry.ruleset,
+                json.dumps(entry.issues), entry.reviewed_at or time.time(),
+            ),
+        )
+        self._conn.commit()
+
+    def touch(self, path: str, size: int, mtime_ns: int) -> None:
+        """内容没变、只有修改时间变了时更新 stat 信息，下次可以跳过哈希"""
+        self._conn.execute(
+            "UPDATE reviews SET size = ?, mtime_ns = ? WHERE path = ?", (size, mtime_ns, path)
+        )
+        self._conn.commit()
+
+    def paths(self) -> set[str]:
+        return {row[0] for row in self._conn.execute("SELECT path FROM reviews")}
+
+    def remove(self, paths: Iterable[str]) -> None:
+        self._conn.executemany("DELETE FROM reviews WHERE path = ?", [(p,) for p in paths])
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "ReviewIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,195 @@
+"""
+Critic Agent - 仓库级评审流水线
+
+遍历整个仓库，只把内容或规则集有变化的文件送去评审：
+
+1. 列出源文件（git 仓库用 git ls-files，尊重 .gitignore；否则遍历目录）
+2. 与索引比较：大小和修改时间没变 → 直接复用；否则计算内容哈希，
+   哈希和规则集版本都没变 → 复用（并更新 stat 信息）
+3. 其余文件并发送入分片评审（agents.chunked_critic.map_reduce_review），
+   每完成一个文件立即写入索引
+4. 已删除的文件从索引中移除
+
+大部分文件未变的仓库重复运行只需要 stat 一遍文件，几秒内完成。
+"""
+
+import asyncio
+import hashlib
+import os
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterable, Optional
+
+from shared.settings import get_settings
+
+from ..agents.chunked_critic import CHUNK_CRITIC_PROMPT, map_reduce_review
+from ..graph.state import Issue
+from .index import IndexEntry, ReviewIndex
+
+
+# 评审函数：(相对路径, 源码) -> 问题列表
+Reviewer = Callable[[str, str], Awaitable[list[Issue]]]
+
+# 不使用 git 时跳过的目录
+SKIP_DIRS = {".git", ".hg", ".svn", "__pycache__", ".venv", "venv", "node_modules", ".tox", "build", "dist"}
+
+
+@dataclass
+class RepoReviewReport:
+    """一次仓库评审的结果"""
+    reviewed: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)     # 路径 -> 错误
+    issues: dict[str, list[Issue]] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    @property
+    def issue_count(self) -> int:
+        return sum(len(issues) for issues in self.issues.values())
+
+
+def ruleset_version(*parts: str) -> str:
+    """规则集版本：评审提示词（含全部规则）与额外标识（模型名、片段上限等）的哈希"""
+    digest = hashlib.sha256(CHUNK_CRITIC_PROMPT.system.encode("utf-8"))
+    for part in parts:
+        digest.update(b"\0" + part.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def file_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def iter_source_files(root: str, extensions: Iterable[str] = (".py",)) -> list[str]:
+    """仓库中的源文件（相对路径，/ 分隔，已排序）"""
+    extensions = tuple(extensions)
+    try:
+        output = subprocess.run(
+            ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+            cwd=root, capture_output=True, check=True,
+        ).stdout.decode("utf-8")
+        paths = [p for p in output.split("\0") if p]
+    except (OSError, subprocess.CalledProcessError):
+        paths = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
+            rel = os.path.relpath(dirpath, root)
+            paths.extend(
+                name if rel == "." else f"{rel}/{name}".replace(os.sep, "/")
+                for name in filenames
+            )
+    return sorted(
+        p for p in paths
+        if p.endswith(extensions) and os.path.isfile(os.path.join(root, p))
+    )
+
+
+def llm_reviewer(llm) -> Reviewer:
+    """用分片 map-reduce 评审作为评审函数
+
+    任一片段输出无法解析时抛出异常：文件记为失败、不写入索引，下次运行重试。
+    """
+    async def review(path: str, code: str) -> list[Issue]:
+        return await map_reduce_review(code, llm, path=path, strict=True)
+    return review
+
+
+async def review_repository(
+    root: str,
+    reviewer: Reviewer,
+    *,
+    index_path: Optional[str] = None,
+    ruleset: Optional[str] = None,
+    extensions: Iterable[str] = (".py",),
+    max_concurrency: Optional[int] = None,
+    max_file_bytes: Optional[int] = None,
+    force: bool = False
+) -> RepoReviewReport:
+    """评审仓库中有变化的文件
+
+    Args:
+        root: 仓库根目录
+        reviewer: 评审函数，见 llm_reviewer
+        index_path: 索引数据库，默认 settings.critic_agent.repo_index_file（相对 root）
+        ruleset: 规则集版本，默认 ruleset_version()；变化后所有文件重新评审
+        extensions: 参与评审的文件后缀
+        max_concurrency: 同时评审的文件数，默认 settings.critic_agent.repo_file_concurrency
+        max_file_bytes: 超过此大小的文件跳过评审，默认 settings.critic_agent.repo_max_file_bytes
+        force: 忽略索引，全部重新评审
+
+    Returns:
+        RepoReviewReport，issues 包含所有文件（复用的结果也在内）
+    """
+    settings = get_settings().critic_agent
+    ruleset = ruleset or ruleset_version()
+    index_path = index_path or os.path.join(root, settings.repo_index_file)
+    max_file_bytes = max_file_bytes or settings.repo_max_file_bytes
+    semaphore = asyncio.Semaphore(max_concurrency or settings.repo_file_concurrency)
+    report = RepoReviewReport()
+    started = time.perf_counter()
+
+    with ReviewIndex(index_path) as index:
+        files = iter_source_files(root, extensions)
+        pending: list[tuple[str, os.stat_result, bytes, str]] = []
+
+        for path in files:
+            full = os.path.join(root, path)
+            stat = os.stat(full)
+            entry = index.get(path)
+            if not force and entry is not None and entry.ruleset == ruleset \
+                    and (entry.size, entry.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                report.skipped.append(path)
+                report.issues[path] = entry.issues
+                continue
+            if stat.st_size > max_file_bytes:
+                report.failed[path] = f"larger than {max_file_bytes} bytes"
+                continue
+
+            with open(full, "rb") as f:
+                data = f.read()
+            digest = file_hash(data)
+            if not force and entry is not None and entry.ruleset == ruleset and entry.content_hash == digest:
+                index.touch(path, stat.st_size, stat.st_mtime_ns)
+                report.skipped.append(path)
+                report.issues[path] = entry.issues
+                continue
+            pending.append((path, stat, data, digest))
+
+        async def review(path: str, stat: os.stat_result, data: bytes, digest: str) -> None:
+            async with semaphore:
+                try:
+                    issues = await reviewer(path, data.decode("utf-8", errors="replace"))
+                except Exception as e:   # 单个文件失败不影响其他文件，下次运行重试
+                    report.failed[path] = f"{type(e).__name__}: {e}"
+                    return
+            index.put(IndexEntry(path, stat.st_size, stat.st_mtime_ns, digest, ruleset, issues, time.time()))
+            report.reviewed.append(path)
+            report.issues[path] = issues
+            print(f"   🔍 {path}: {len(issues)} issues")
+
+        await asyncio.gather(*(review(*item) for item in pending))
+
+        report.removed = sorted(index.paths() - set(files))
+        index.remove(report.removed)
+
+    report.reviewed.sort()
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def format_report(report: RepoReviewReport) -> str:
+    """评审结果摘要"""
+    lines = [
+        f"📁 {len(report.reviewed)} reviewed, {len(report.skipped)} unchanged, "
+        f"{len(report.removed)} removed, {len(report.failed)} failed in {report.seconds:.1f}s",
+        f"🐛 {report.issue_count} issues",
+    ]
+    for path, error in sorted(report.failed.items()):
+        lines.append(f"   ⚠️  {path}: {error}")
+    for path in sorted(report.issues):
+        errors = sum(1 for issue in report.issues[path] if issue["severity"] == "error")
+        if errors:
+            lines.append(f"   ❌ {path}: {errors} errors")
+    return "\n".join(lines)
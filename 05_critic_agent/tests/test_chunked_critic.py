@@ -0,0 +1,73 @@
+"""
+分片 map-reduce 评审测试
+"""
+
+import asyncio
+
+from src.agents.chunked_critic import (
+    ChunkIssue,
+    ChunkReview,
+    create_chunked_critic_node,
+    map_reduce_review,
+)
+from src.graph.state import ReviewStatus, create_initial_state
+
+from shared.code_chunks import chunk_code  # 导入 src 时已把仓库根目录加入 sys.path
+
+
+def make_source(functions: int) -> str:
+    parts = ["import os\n"]
+    for i in range(functions):
+        body = "\n".join(f"    value_{j} = os.getenv('KEY_{i}_{j}')" for j in range(20))
+        parts.append(f"\ndef handler_{i}():\n{body}\n    return value_0\n")
+    return "".join(parts)
+
+
+class FakeStructured:
+    """每个片段报告第 2 行一个问题，并记录并发数"""
+
+    def __init__(self, owner):
+        self.owner = owner
+
+    async def ainvoke(self, messages):
+        owner = self.owner
+        owner.active += 1
+        owner.peak = max(owner.peak, owner.active)
+        await asyncio.sleep(0.01)
+        owner.active -= 1
+        owner.calls += 1
+        severity = "error" if "handler_3" in messages[-1].content else "info"
+        issue = ChunkIssue(severity=severity, line=2, message="Missing docstring")
+        return {"parsed": ChunkReview(issues=[issue])}
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = self.active = self.peak = 0
+
+    def with_structured_output(self, schema, **kwargs):
+        return FakeStructured(self)
+
+
+class TestMapReduceReview:
+    """测试分片、并发与行号映射"""
+
+    def test_remaps_lines_and_limits_concurrency(self):
+        code = make_source(8)
+        llm = FakeLLM()
+        issues = asyncio.run(map_reduce_review(code, llm, max_chunk_tokens=250, max_concurrency=3))
+
+        chunks = chunk_code(code, 250)
+        assert llm.calls == len(chunks) > 3
+        assert llm.peak == 3
+        # 每个问题报告在所在片段的第 2 行，映射回文件行号
+        assert [issue["line"] for issue in issues] == [chunk.start_line + 1 for chunk in chunks]
+
+    def test_node_requests_revision_on_errors(self):
+        node = create_chunked_critic_node(FakeLLM(), max_chunk_tokens=250)
+        state = create_initial_state("review", [])
+        state["code"] = make_source(6)
+
+        update = asyncio.run(node(state))
+        assert update["review_status"] == ReviewStatus.NEEDS_REVISION.value
+        assert "[error/correctness]" in update["critique"]
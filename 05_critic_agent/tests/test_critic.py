@@ -62,6 +62,67 @@ class TestWorkflow:
         state["review_status"] = ReviewStatus.NEEDS_REVISION.value
         
         assert should_continue(state) == "coder"
+    
+    def test_history_is_bounded(self):
+        """测试历史记录只保留最近 HISTORY_LIMIT 轮"""
+        from src.graph.state import HISTORY_LIMIT
+        from src.graph.workflow import create_workflow
+        
+        # 节点只返回更新的键；history 只返回新增的条目，不原地修改状态里的 deque
+        def coder_node(state):
+            return {"iteration": state["iteration"] + 1}
+        
+        def critic_node(state):
+            return {
+                "review_status": ReviewStatus.NEEDS_REVISION.value,
+                "history": [{"iteration": state["iteration"]}],
+            }
+        
+        app = create_workflow(coder_node, critic_node)
+        max_iterations = HISTORY_LIMIT + 5
+        result = app.invoke(
+            create_initial_state("test", [], max_iterations=max_iterations),
+            {"recursion_limit": 100}
+        )
+        
+        iterations = [entry["iteration"] for entry in result["history"]]
+        assert iterations == list(range(6, max_iterations + 1))
+
+    
+    def test_hierarchical_reruns_only_affected_critics(self):
+        """测试层级工作流按代码差异只重跑受影响的 Critic"""
+        from src.graph.workflow import create_hierarchical_workflow
+        
+        versions = [
+            'def f(a):\n    return a\n',
+            'def f(a):\n    """Return a."""\n    return a\n',   # 只改文档
+            'def f(a):\n    """Return a."""\n    return a + 1\n',  # 改逻辑
+        ]
+        calls = []
+        
+        def coder_node(state):
+            return {"code": versions[state["iteration"]], "iteration": state["iteration"] + 1}
+        
+        def make_critic(name):
+            def critic(state):
+                calls.append((state["iteration"], name))
+                return {"critic_results": [{"critic": name, "iteration": state["iteration"]}]}
+            return critic
+        
+        def meta_critic(state):
+            return {"review_status": ReviewStatus.NEEDS_REVISION.value}
+        
+        critics = {name: make_critic(name) for name in ("security", "style", "logic")}
+        app = create_hierarchical_workflow(coder_node, critics, meta_critic)
+        result = app.invoke(create_initial_state("test", [], max_iterations=3))
+        
+        assert sorted(calls) == [
+            (1, "logic"), (1, "security"), (1, "style"),
+            (2, "style"),
+            (3, "logic"), (3, "security"), (3, "style"),
+        ]
+        assert result["critic_results"]["security"]["iteration"] == 3
+        assert result["previous_code"] == versions[1]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+"""
+git diff 增量评审测试
+"""
+
+import asyncio
+import subprocess
+
+import pytest
+from langchain_core.messages import AIMessage
+from src.agents.chunked_critic import ChunkIssue, ChunkReview
+from src.pipeline import changed_hunks, parse_unified_diff, review_diff, review_windows
+
+from shared.tokens import count_tokens
+
+BASE_CODE = '''import os
+
+
+def load(path):
+    with open(path) as f:
+        return f.read()
+
+
+def unrelated():
+    return 1
+''' + "".join(f"\nCONSTANT_{i} = {i}\n" for i in range(40))
+
+
+def git(root, *args):
+    return subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=root, capture_output=True, check=True, text=True,
+    ).stdout.strip()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git(tmp_path, "init", "-q")
+    (tmp_path / "app.py").write_text(BASE_CODE)
+    (tmp_path / "gone.py").write_text("X = 1\n")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "base")
+    base = git(tmp_path, "rev-parse", "HEAD")
+
+    # 函数内改一行，文件末尾的模块级代码追加一行，删除另一个文件
+    head_code = BASE_CODE.replace("        return f.read()", "        data = f.read()\n        return eval(data)")
+    head_code += "DEBUG = True\n"
+    (tmp_path / "app.py").write_text(head_code)
+    (tmp_path / "gone.py").unlink()
+    git(tmp_path, "add", "-A")
+    git(tmp_path, "commit", "-q", "-m", "head")
+    return tmp_path, base, head_code
+
+
+class FakeStructured:
+    """记录提示词，在每个窗口的第一处改动行报告一个问题"""
+
+    def __init__(self, owner):
+        self.owner = owner
+
+    async def ainvoke(self, messages):
+        prompt = messages[-1].content
+        self.owner.prompts.append(prompt)
+        changed = prompt.split("Changed lines (chunk numbering): ")[1].splitlines()[0]
+        line = int(changed.split(",")[0].split("-")[0])
+        return {"parsed": ChunkReview(issues=[ChunkIssue(severity="error", line=line, message="Changed here")])}
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def with_structured_output(self, schema, **kwargs):
+        return FakeStructured(self)
+
+
+class UnparseableLLM:
+    """结构化输出和正文都不是 JSON"""
+
+    def with_structured_output(self, schema, **kwargs):
+        return self
+
+    async def ainvoke(self, messages):
+        return {"parsed": None, "raw": AIMessage(content="I could not produce JSON")}
+
+
+class TestHunks:
+    """测试 diff 解析与窗口扩展"""
+
+    def test_parses_head_side_ranges(self):
+        diff = (
+            "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n"
+            "@@ -3 +3,2 @@\n-x\n+y\n+z\n"
+            "@@ -10,2 +11,0 @@\n-gone\n-gone\n"
+            "diff --git a/b.py b/b.py\n--- a/b.py\n+++ /dev/null\n@@ -1 +0,0 @@\n-B = 1\n"
+        )
+        assert parse_unified_diff(diff) == {"a.py": [(3, 4), (11, 11)]}
+
+    def test_window_covers_enclosing_function(self):
+        code = BASE_CODE
+        [window] = review_windows(code, [(6, 6)], context=2, max_tokens=1500)
+        assert (window.start_line, window.end_line) == (4, 6)
+        assert window.changed_lines() == "3"
+
+    def test_oversized_window_is_split_into_chunks(self):
+        code = "".join(f"def handler_{i}():\n" + "".join(
+            f"    value_{j} = compute('{i}-{j}')\n" for j in range(20)
+        ) + "\n\n" for i in range(30))
+        total = len(code.splitlines())
+        # 新文件：整个文件都是改动
+        windows = review_windows(code, [(1, total)], context=10, max_tokens=300)
+        assert len(windows) > 1
+        assert windows[0].start_line == 1 and windows[-1].end_line == total
+        lines = code.splitlines()
+        for window in windows:
+            assert count_tokens("\n".join(lines[window.start_line - 1:window.end_line])) <= 300
+            assert window.hunks == [(window.start_line, window.end_line)]
+
+    def test_module_level_change_uses_context_and_merges(self):
+        code = BASE_CODE
+        windows = review_windows(code, [(20, 20), (23, 23), (40, 40)], context=2, max_tokens=1500)
+        assert [(w.start_line, w.end_line) for w in windows] == [(18, 25), (38, 42)]
+        assert windows[0].changed_lines() == "3, 6"
+
+
+class TestReviewDiff:
+    """测试端到端评审：只评审改动，问题挂在 head 行号上"""
+
+    def test_reviews_only_changed_hunks(self, repo):
+        root, base, head_code = repo
+        llm = FakeLLM()
+        report = asyncio.run(review_diff(str(root), llm, base, "HEAD", context=2))
+
+        head_lines = head_code.splitlines()
+        assert list(report.issues) == ["app.py"]
+        assert report.hunks == 2 and report.windows == 2
+        assert report.reviewed_lines < len(head_lines) // 2
+
+        lines = [issue["line"] for issue in report.issues["app.py"]]
+        assert head_lines[lines[0] - 1] == "        data = f.read()"
+        assert head_lines[lines[1] - 1] == "DEBUG = True"
+        # 未改动的函数不在任何窗口中
+        assert not any("def unrelated" in prompt for prompt in llm.prompts)
+
+    def test_ignores_user_diff_prefix_config(self, repo):
+        root, base, _ = repo
+        git(root, "config", "diff.noprefix", "true")
+        assert list(changed_hunks(str(root), base, "HEAD")) == ["app.py"]
+
+    def test_unparseable_review_fails_the_file(self, repo):
+        root, base, _ = repo
+        report = asyncio.run(review_diff(str(root), UnparseableLLM(), base, "HEAD", context=2))
+        assert list(report.failed) == ["app.py"]
+        assert "JsonExtractionError" in report.failed["app.py"]
+        assert report.issues == {}
@@ -0,0 +1,114 @@
+"""
+仓库级评审流水线测试
+"""
+
+import asyncio
+import os
+
+import pytest
+from langchain_core.messages import AIMessage
+from src.pipeline import ReviewIndex, iter_source_files, llm_reviewer, review_repository
+from src.pipeline.__main__ import _exit_code
+
+
+class CountingReviewer:
+    """记录被评审的文件，每个文件返回一个问题"""
+
+    def __init__(self, fail: tuple = ()):
+        self.seen = []
+        self.fail = fail
+
+    async def __call__(self, path, code):
+        self.seen.append(path)
+        if path in self.fail:
+            raise RuntimeError("provider error")
+        return [{"severity": "info", "category": "style", "line": 1, "message": f"{len(code)} chars", "suggestion": None}]
+
+
+class UnparseableLLM:
+    """结构化输出总是无法解析"""
+
+    def with_structured_output(self, schema, **kwargs):
+        return self
+
+    async def ainvoke(self, messages):
+        return {"parsed": None, "raw": AIMessage(content="I could not produce JSON")}
+
+
+@pytest.fixture
+def repo(tmp_path):
+    root = tmp_path / "repo"
+    (root / "pkg").mkdir(parents=True)
+    (root / "__pycache__").mkdir()
+    (root / "a.py").write_text("A = 1\n")
+    (root / "pkg" / "b.py").write_text("B = 2\n")
+    (root / "pkg" / "notes.txt").write_text("not python\n")
+    (root / "__pycache__" / "c.py").write_text("C = 3\n")
+    return root
+
+
+def run(root, reviewer, **kwargs):
+    return asyncio.run(review_repository(str(root), reviewer, index_path=str(root.parent / "index.db"), **kwargs))
+
+
+class TestRepoReview:
+    """测试增量评审"""
+
+    def test_walks_source_files(self, repo):
+        assert iter_source_files(str(repo)) == ["a.py", "pkg/b.py"]
+
+    def test_second_run_skips_unchanged(self, repo):
+        first = CountingReviewer()
+        report = run(repo, first)
+        assert sorted(first.seen) == ["a.py", "pkg/b.py"]
+        assert report.issue_count == 2
+
+        second = CountingReviewer()
+        report = run(repo, second)
+        assert second.seen == []
+        assert report.skipped == ["a.py", "pkg/b.py"]
+        assert report.issues["a.py"][0]["message"] == "6 chars"
+
+    def test_only_changed_files_are_reviewed(self, repo):
+        run(repo, CountingReviewer())
+        (repo / "a.py").write_text("A = 10\n")
+        # 内容不变、只更新了修改时间的文件按哈希跳过
+        stat = os.stat(repo / "pkg" / "b.py")
+        os.utime(repo / "pkg" / "b.py", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        reviewer = CountingReviewer()
+        report = run(repo, reviewer)
+        assert reviewer.seen == ["a.py"]
+        assert report.skipped == ["pkg/b.py"]
+
+    def test_ruleset_change_and_removed_files(self, repo):
+        run(repo, CountingReviewer(), ruleset="v1")
+        (repo / "pkg" / "b.py").unlink()
+
+        reviewer = CountingReviewer()
+        report = run(repo, reviewer, ruleset="v2")
+        assert reviewer.seen == ["a.py"]
+        assert report.removed == ["pkg/b.py"]
+        with ReviewIndex(str(repo.parent / "index.db")) as index:
+            assert index.paths() == {"a.py"}
+
+    def test_failed_files_are_retried(self, repo):
+        report = run(repo, CountingReviewer(fail=("a.py",)))
+        assert list(report.failed) == ["a.py"]
+
+        reviewer = CountingReviewer()
+        run(repo, reviewer)
+        assert reviewer.seen == ["a.py"]
+
+    def test_unparseable_review_is_not_indexed(self, repo):
+        report = run(repo, llm_reviewer(UnparseableLLM()))
+        assert sorted(report.failed) == ["a.py", "pkg/b.py"]
+        with ReviewIndex(str(repo.parent / "index.db")) as index:
+            assert index.paths() == set()
+
+    def test_exit_code_counts_failures(self):
+        error = {"severity": "error", "category": "correctness", "line": 1, "message": "x", "suggestion": None}
+        assert _exit_code({"a.py": []}, {}, fail_on_error=True) == 0
+        assert _exit_code({"a.py": [error]}, {}, fail_on_error=True) == 1
+        assert _exit_code({}, {"a.py": "RateLimitError"}, fail_on_error=True) == 1
+        assert _exit_code({}, {"a.py": "RateLimitError"}, fail_on_error=False) == 0
@@ -0,0 +1,106 @@
+"""
+Batch Aggregation - 逐条循环 vs 向量化聚合
+==========================================
+
+随机生成一批评审（每条 3 个 Critic 分数，部分 Critic 被取消），比较：
+1. loop:       原聚合器的算法，逐条评审、逐个 Critic 计算加权分、极差冲突和人工复核
+2. vectorized: shared.batch_aggregation.aggregate_batch，一次处理整个分数矩阵
+
+两者的加权分与判定结果必须一致。另外单独报告从 dict 列表构建矩阵
+（score_matrix）的耗时：分数本来就以数组存储时（如离线重放），只需付出向量化那一行。
+
+运行：
+    python benchmarks/batch_aggregation.py --reviews 100000 --repeat 3
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from shared.batch_aggregation import aggregate_batch, critic_weights, score_matrix
+
+
+CRITICS = ["Code Quality", "Security", "Style"]
+WEIGHTS = {"Code Quality": 0.4, "Security": 0.35, "Style": 0.25}
+
+
+def make_reviews(count: int, seed: int = 0) -> list[dict[str, float]]:
+    rng = np.random.default_rng(seed)
+    scores = rng.uniform(0, 10, size=(count, len(CRITICS))).round(1)
+    cancelled = rng.random((count, len(CRITICS))) < 0.1
+    return [
+        {name: float(score) for name, score, skip in zip(CRITICS, row, skips) if not skip}
+        for row, skips in zip(scores, cancelled)
+    ]
+
+
+def loop_aggregate(reviews: list[dict[str, float]]) -> tuple[list[float], list[bool], list[bool]]:
+    """逐条循环（multi_critic_system 原 aggregator_node 的算法）"""
+    finals, passed, needs_human = [], [], []
+    for review in reviews:
+        total = weight_sum = 0.0
+        for name, score in review.items():
+            weight = WEIGHTS.get(name, 0.33)
+            total += score * weight
+            weight_sum += weight
+        final = total / weight_sum if weight_sum > 0 else 0
+        values = list(review.values())
+        conflict = bool(values) and max(values) - min(values) > 3
+        finals.append(final)
+        passed.append(final >= 7.0)
+        needs_human.append(final < 6.0 or conflict)
+    return finals, passed, needs_human
+
+
+def vectorized_aggregate(matrix: np.ndarray):
+    return aggregate_batch(
+        matrix, critic_weights(CRITICS, WEIGHTS, 0.33),
+        pass_threshold=7.0, human_review_threshold=6.0, conflict_range=3.0,
+    )
+
+
+def best_of(repeat: int, fn, *args) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reviews", type=int, default=100_000, help="评审条数")
+    parser.add_argument("--repeat", type=int, default=3, help="每种方式运行次数（取最快）")
+    args = parser.parse_args()
+
+    reviews = make_reviews(args.reviews)
+
+    print("=" * 60)
+    print(f"📊 Batch Aggregation ({args.reviews} reviews × {len(CRITICS)} critics)")
+    print("=" * 60)
+
+    loop_time, (finals, passed, needs_human) = best_of(args.repeat, loop_aggregate, reviews)
+    build_time, matrix = best_of(args.repeat, score_matrix, reviews, CRITICS)
+    vector_time, decision = best_of(args.repeat, vectorized_aggregate, matrix)
+
+    np.testing.assert_allclose(decision.scores, finals)
+    assert decision.passed.tolist() == passed
+    assert decision.needs_human.tolist() == needs_human
+
+    print(f"   {'loop':<22} {loop_time * 1000:>9.1f} ms   1.00x")
+    print(f"   {'vectorized':<22} {vector_time * 1000:>9.1f} ms   {loop_time / vector_time:.2f}x")
+    print(f"   {'matrix + vectorized':<22} {(build_time + vector_time) * 1000:>9.1f} ms   "
+          f"{loop_time / (build_time + vector_time):.2f}x")
+    print(f"\n   ✅ identical results: {int(decision.passed.sum())} passed, "
+          f"{int(decision.needs_human.sum())} need human review")
+
+
+if __name__ == "__main__":
+    main()
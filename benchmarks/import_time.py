@@ -0,0 +1,101 @@
+"""
+Import Time - 共享包导入耗时基准
+================================
+
+用 python -X importtime 在全新的解释器中执行各条语句（导入模块，或导入后
+读取属性触发的延迟导入，如 Config.OPENAI_MODEL），报告：
+- total: 语句触发的所有导入的累计耗时（多次取中位数）
+- heaviest: 耗时最多的顶层依赖包
+- 不应加载的重型模块（LLM 提供商 SDK、pydantic-settings 等）是否被加载
+
+任一语句加载了禁止的依赖时以非零状态退出，可以放进 CI 防止回退。
+
+运行：
+    python benchmarks/import_time.py --repeat 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROVIDER_SDKS = ["langchain_openai", "langchain_anthropic", "openai", "anthropic"]
+
+# 只用 Config 的脚本不应为 settings 付出 pydantic-settings 的导入时间
+LIGHT = PROVIDER_SDKS + ["langgraph", "langchain_core", "pydantic_settings"]
+
+# 语句 -> 执行它时不应加载的模块
+TARGETS = {
+    "import shared": LIGHT,
+    "import shared.config": LIGHT,
+    "from shared.config import Config; Config.OPENAI_MODEL": LIGHT,
+    "import shared.metrics": LIGHT,
+    "import shared.prompts": PROVIDER_SDKS + ["langgraph"],
+    "import shared.llm_providers": PROVIDER_SDKS + ["langgraph"],
+}
+
+
+def import_profile(code: str = "pass") -> tuple[dict[str, int], dict[str, int]]:
+    """在子进程中执行语句，返回 ({模块名: 累计微秒}, 其中的顶层导入)；默认只测解释器启动"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times, top_level = {}, {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+        # 顶层导入的名称前只有一个空格，嵌套导入按深度缩进
+        if not name[1:].startswith(" "):
+            top_level[name.strip()] = int(cumulative)
+    return times, top_level
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5, help="每个模块的导入次数（取中位数）")
+    parser.add_argument("--top", type=int, default=3, help="显示最重的顶层依赖数")
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print("📦 Import time (fresh interpreter per run)")
+    print("=" * 72)
+
+    # 解释器启动时（site 等）已导入的模块不计入
+    startup = set(import_profile()[0])
+
+    violations = []
+    for code, forbidden in TARGETS.items():
+        runs = [import_profile(code) for _ in range(args.repeat)]
+        total = statistics.median(
+            sum(us for name, us in top_level.items() if name not in startup)
+            for _, top_level in runs
+        ) / 1000
+        last = runs[-1][0]
+        heaviest = sorted(
+            ((name, us) for name, us in last.items()
+             if "." not in name and name != "shared" and name not in startup),
+            key=lambda item: item[1], reverse=True,
+        )[:args.top]
+        loaded = [name for name in forbidden if name in last]
+
+        status = "❌" if loaded else "✅"
+        print(f"{status} {code:<54} {total:8.1f}ms   "
+              + ", ".join(f"{name} {us / 1000:.0f}ms" for name, us in heaviest))
+        if loaded:
+            violations.append((code, loaded))
+
+    if violations:
+        print()
+        for code, loaded in violations:
+            print(f"⚠️  {code} loads {', '.join(loaded)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Process Pool Scaling - 进程池节点扩展性基准
+============================================
+
+模拟并发执行几十个审查时的 CPU 密集型节点（AST 分析），对比：
+1. thread:  节点在图的线程池中运行（受 GIL 限制）
+2. process: 节点通过 shared.process_pool.run_in_process 在进程池中运行
+
+对不同的进程池大小分别计时，观察吞吐随核数的扩展情况。
+
+运行：
+    python benchmarks/process_pool_scaling.py --reviews 32 --repeat 40
+"""
+
+import argparse
+import ast
+import os
+import sys
+import time
+from operator import add
+from typing import Annotated, TypedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langgraph.graph import StateGraph, END
+from langgraph.types import Send
+
+from shared.process_pool import run_in_process, shutdown_process_pool, get_process_pool
+
+
+SAMPLE_CODE = '''
+def get_user(user_id: int, conn) -> dict | None:
+    """Fetch a user by id."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id, name, email FROM users WHERE id = %s", (user_id,))
+        row = cursor.fetchone()
+    except Exception as exc:
+        raise RuntimeError(f"query failed: {exc}") from exc
+    finally:
+        cursor.close()
+    if row is None:
+        return None
+    return {"id": row[0], "name": row[1], "email": row[2]}
+''' * 20
+
+
+class BenchState(TypedDict):
+    reviews: int
+    repeat: int
+    findings: Annotated[list[int], add]
+
+
+class ReviewInput(TypedDict):
+    code: str
+    repeat: int
+
+
+def analyze_code(state: ReviewInput) -> dict:
+    """CPU 密集型节点：反复解析并遍历 AST"""
+    count = 0
+    for _ in range(state["repeat"]):
+        tree = ast.parse(state["code"])
+        count += sum(1 for _ in ast.walk(tree))
+    return {"findings": [count]}
+
+
+analyze_code_in_process = run_in_process(reads=["code", "repeat"])(analyze_code)
+
+
+def build_graph(node):
+    def fan_out(state: BenchState):
+        return [
+            Send("analyze", {"code": SAMPLE_CODE, "repeat": state["repeat"]})
+            for _ in range(state["reviews"])
+        ]
+
+    workflow = StateGraph(BenchState)
+    workflow.add_node("start", lambda state: {})
+    workflow.add_node("analyze", node)
+    workflow.set_entry_point("start")
+    workflow.add_conditional_edges("start", fan_out, ["analyze"])
+    workflow.add_edge("analyze", END)
+    return workflow.compile()
+
+
+def run(app, reviews: int, repeat: int) -> float:
+    start = time.perf_counter()
+    result = app.invoke({"reviews": reviews, "repeat": repeat, "findings": []})
+    elapsed = time.perf_counter() - start
+    assert len(result["findings"]) == reviews
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reviews", type=int, default=32, help="并发审查数")
+    parser.add_argument("--repeat", type=int, default=40, help="每个节点的 AST 解析次数")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    pool_sizes = sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+
+    print("=" * 60)
+    print(f"⏱️  Process Pool Scaling ({args.reviews} reviews, {cores} cores)")
+    print("=" * 60)
+
+    baseline = run(build_graph(analyze_code), args.reviews, args.repeat)
+    print(f"   {'thread':<14} {baseline:>7.2f}s   1.00x")
+
+    app = build_graph(analyze_code_in_process)
+    for size in pool_sizes:
+        shutdown_process_pool()
+        get_process_pool(size)
+        run(app, min(args.reviews, size), 1)  # 预热子进程
+        elapsed = run(app, args.reviews, args.repeat)
+        print(f"   {f'process x{size}':<14} {elapsed:>7.2f}s   {baseline / elapsed:.2f}x")
+
+    shutdown_process_pool()
+
+
+if __name__ == "__main__":
+    main()
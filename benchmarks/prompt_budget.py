@@ -0,0 +1,164 @@
+"""
+Prompt Budget - Writer 提示词 token 对比
+========================================
+
+模拟多轮修订循环，逐轮对比 writer 提示词的 token 数：
+1. full history: 最新代码 + 所有历史评审原文（历史随轮数线性增长）
+2. compacted:    shared.history.HistoryCompactor（最新代码 + 最新评审原文 + 有界摘要）
+
+运行：
+    python benchmarks/prompt_budget.py --iterations 8 --budget 4000
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from shared.history import HistoryCompactor
+from shared.tokens import count_tokens
+
+
+def load_writer_template() -> tuple[str, str]:
+    """从 multi_critic_system.py 读取 writer 修订的 (system 前缀, human 模板)"""
+    path = os.path.join(ROOT, "01_langgraph", "03_advanced", "multi_critic_system.py")
+    spec = importlib.util.spec_from_file_location("multi_critic_system", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.WRITER_REVISION_SYSTEM_PROMPT, module.WRITER_REVISION_PROMPT
+
+
+SAMPLE_CODE = '''
+import os
+import logging
+from typing import Optional
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+
+def get_user(user_id: int) -> Optional[dict]:
+    """Fetch a user record by id.
+
+    Args:
+        user_id: Primary key of the user.
+
+    Returns:
+        The user as a dict, or None if not found.
+    """
+    if user_id <= 0:
+        raise ValueError("user_id must be positive")
+    conn = psycopg2.connect(
+        host=os.environ["DB_HOST"],
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASSWORD"],
+        dbname=os.environ.get("DB_NAME", "users"),
+    )
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id, name, email FROM users WHERE id = %s", (user_id,))
+            row = cursor.fetchone()
+    except psycopg2.Error:
+        logger.exception("query failed for user %s", user_id)
+        raise
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return {"id": row[0], "name": row[1], "email": row[2]}
+'''
+
+CRITICS = {
+    "Code Quality": [
+        "Extract connection handling into a context manager",
+        "Add retries for transient connection errors",
+        "Return a TypedDict instead of a plain dict",
+    ],
+    "Security": [
+        "Do not log user identifiers at error level",
+        "Validate DB_HOST against an allow-list",
+        "Use a connection pool with TLS enforced",
+    ],
+    "Style": [
+        "Group imports per PEP 8",
+        "Keep line length under 88 characters",
+        "Document raised exceptions in the docstring",
+    ],
+}
+
+
+def make_round(iteration: int) -> dict:
+    """构造一轮合成评审（部分建议会在多轮中反复出现）"""
+    critics = []
+    for offset, (name, suggestions) in enumerate(CRITICS.items()):
+        feedback = (
+            f"Round {iteration} {name.lower()} review. The function is mostly correct but "
+            f"several concerns remain around {suggestions[iteration % 3].lower()}. "
+            + "Details: " + " ".join(f"observation {i} about line {10 + i * offset}." for i in range(12))
+        )
+        critics.append({
+            "critic_name": name,
+            "score": 5.0 + 0.4 * iteration + offset * 0.3,
+            "feedback": feedback,
+            "suggestions": suggestions[: 1 + iteration % 3],
+        })
+    return {
+        "iteration": iteration,
+        "score": sum(c["score"] for c in critics) / len(critics),
+        "critics": critics,
+    }
+
+
+def render_feedback(round_: dict) -> str:
+    lines = [f"Final Score: {round_['score']:.1f}/10", "", "Feedback Summary:"]
+    lines += [f"[{c['critic_name']}] {c['feedback']}" for c in round_["critics"]]
+    lines += ["", "Top Suggestions:"]
+    lines += [f"- {s}" for c in round_["critics"] for s in c["suggestions"]]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=8)
+    parser.add_argument("--budget", type=int, default=4000)
+    args = parser.parse_args()
+
+    system, template = load_writer_template()
+    system_tokens = count_tokens(system)
+    compactor = HistoryCompactor(token_budget=args.budget - system_tokens)
+    rounds: list[dict] = []
+
+    print("=" * 60)
+    print(f"🔢 Writer Prompt Tokens (budget {args.budget})")
+    print("=" * 60)
+    print(f"   {'iter':>4}  {'full history':>12}  {'compacted':>9}  {'saved':>6}")
+
+    for iteration in range(1, args.iterations + 1):
+        rounds.append(make_round(iteration))
+        latest = render_feedback(rounds[-1])
+
+        full = template.format(
+            task="Fetch a user by id from PostgreSQL",
+            code=SAMPLE_CODE,
+            feedback=latest,
+            history="\n\n".join(render_feedback(r) for r in rounds[:-1]) or "(none)",
+        )
+        compacted = compactor.build_prompt(
+            template,
+            task="Fetch a user by id from PostgreSQL",
+            code=SAMPLE_CODE,
+            latest_feedback=latest,
+            earlier_rounds=rounds[:-1],
+        )
+
+        before = system_tokens + count_tokens(full)
+        after = system_tokens + count_tokens(compacted)
+        print(f"   {iteration:>4}  {before:>12}  {after:>9}  {1 - after / before:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
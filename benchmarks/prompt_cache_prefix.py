@@ -0,0 +1,65 @@
+"""
+Prompt Cache Prefix - 提示词可缓存前缀检查
+==========================================
+
+对每个提示词用两组不同的可变内容渲染，测量两次调用逐字相同的前缀长度：
+- prefix: 可以命中提供商前缀缓存的 token 数
+- static: 提示词中全部静态文本的 token 数
+- static after variables: 被可变内容挡在后面、无法缓存的静态文本（应为 0）
+
+运行：
+    python benchmarks/prompt_cache_prefix.py
+"""
+
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from shared.prompts import CRITIC_PROMPT, CachedPrompt, format_prefix_report, measure_cached_prompt, measure_prefix
+
+
+def load_multi_critic():
+    path = os.path.join(ROOT, "01_langgraph", "03_advanced", "multi_critic_system.py")
+    spec = importlib.util.spec_from_file_location("multi_critic_system", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    module = load_multi_critic()
+
+    reports = [
+        measure_cached_prompt("shared CRITIC_PROMPT", CRITIC_PROMPT),
+        measure_cached_prompt("writer (initial)", module.WRITER_PROMPT),
+        measure_prefix(
+            "writer (revision)",
+            lambda value: [
+                SystemMessage(content=module.WRITER_REVISION_SYSTEM_PROMPT),
+                HumanMessage(content=module.WRITER_REVISION_PROMPT.format(
+                    task=value, history=value, feedback=value, code=value
+                )),
+            ],
+        ),
+        measure_cached_prompt("quality critic", module.QUALITY_CRITIC_PROMPT),
+        measure_cached_prompt("security critic", module.SECURITY_CRITIC_PROMPT),
+        measure_cached_prompt("style critic", module.STYLE_CRITIC_PROMPT),
+        measure_cached_prompt(
+            "quality critic (diff)",
+            CachedPrompt(system=module.QUALITY_CRITIC_PROMPT.system, human=module.CRITIC_DIFF_PROMPT),
+        ),
+    ]
+
+    print("=" * 60)
+    print("🗄️  Cacheable Prompt Prefixes")
+    print("=" * 60)
+    print(format_prefix_report(reports))
+
+
+if __name__ == "__main__":
+    main()
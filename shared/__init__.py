@@ -1,7 +1,19 @@
-"""Shared utilities package"""
+"""Shared utilities package
 
+子模块按需加载：import shared 不会导入任何 LLM 提供商的 SDK，
+访问 shared.get_llm 等属性时才导入对应模块。
+"""
+
+import importlib
+
+# config 很轻，仍然直接导入（同时保证 shared.config 指向配置实例而非子模块）
 from .config import config, Config
-from .llm_providers import get_llm, get_default_llm
+
+# 属性名 -> 所在子模块
+_LAZY_ATTRS = {
+    "get_llm": ".llm_providers",
+    "get_default_llm": ".llm_providers",
+}
 
 __all__ = [
     "config",
@@ -9,3 +21,16 @@ __all__ = [
     "get_llm",
     "get_default_llm",
 ]
+
+
+def __getattr__(name):
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
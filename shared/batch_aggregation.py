@@ -0,0 +1,157 @@
+"""
+批量评分聚合
+============
+
+多 Critic 系统的聚合器逐条评审、逐个 Critic 地在 Python 循环里算加权平均，
+权重写死在各自的字典里。离线重放历史评审、调权重或阈值做对比时，要聚合
+成千上万条评审，逐条循环很慢。
+
+这里把一批评审表示成分数矩阵（评审数 × Critic 数，缺失的分数为 NaN，
+例如被否决取消的 Critic），一次性向量化计算：
+
+- 加权平均分：只在有分数的 Critic 上归一化权重
+- 通过判定：加权分 >= pass_threshold，且未被否决
+- 冲突检测：Critic 分数的极差或标准差超过阈值
+- 人工复核：要求复核、加权分低于复核阈值或有冲突（被否决的评审不需要）
+
+单条评审就是一行的矩阵，聚合器节点与批量分析共用同一套规则：
+
+    critics = ["Code Quality", "Security", "Style"]
+    matrix = score_matrix(reviews, critics)
+    decisions = aggregate_batch(matrix, critic_weights(critics, {"Security": 0.5}))
+    decisions.passed     # (n,) bool
+"""
+
+from dataclasses import dataclass
+from typing import Mapping, Optional, Sequence
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class BatchDecision:
+    """一批评审的聚合结果，每个字段都是长度为评审数的数组"""
+    scores: np.ndarray          # 加权平均分；没有任何分数的评审为 0
+    low: np.ndarray             # 最低分（没有分数时为 NaN）
+    high: np.ndarray            # 最高分（没有分数时为 NaN）
+    std: np.ndarray             # 分数的总体标准差（没有分数时为 0）
+    passed: np.ndarray
+    conflicts: np.ndarray
+    needs_human: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def conflict_reason(self, index: int) -> Optional[str]:
+        """第 index 条评审的冲突说明；没有冲突时返回 None"""
+        if not self.conflicts[index]:
+            return None
+        return (
+            f"Large score variance: {self.low[index]:g}-{self.high[index]:g} "
+            f"(std {self.std[index]:.1f})"
+        )
+
+
+def critic_weights(
+    critics: Sequence[str],
+    weights: Mapping[str, float],
+    default: float = 1.0
+) -> np.ndarray:
+    """按 Critic 顺序排列的权重向量；未配置的 Critic 使用 default"""
+    return np.array([weights.get(name, default) for name in critics], dtype=float)
+
+
+def score_matrix(reviews: Sequence[Mapping[str, float]], critics: Sequence[str]) -> np.ndarray:
+    """把评审列表（Critic 名 -> 分数）排成矩阵，缺失的分数为 NaN
+
+    Args:
+        reviews: 每条评审的 Critic 分数
+        critics: 列顺序
+
+    Returns:
+        形状为 (len(reviews), len(critics)) 的 float 数组
+    """
+    matrix = np.full((len(reviews), len(critics)), np.nan)
+    columns = {name: j for j, name in enumerate(critics)}
+    for i, review in enumerate(reviews):
+        for name, score in review.items():
+            j = columns.get(name)
+            if j is not None and score is not None:
+                matrix[i, j] = score
+    return matrix
+
+
+def aggregate_batch(
+    scores: np.ndarray,
+    weights: np.ndarray,
+    *,
+    pass_threshold: float = 7.0,
+    human_review_threshold: Optional[float] = None,
+    require_human_review: bool = False,
+    conflict_range: Optional[float] = 3.0,
+    conflict_std: Optional[float] = None,
+    vetoed: Optional[np.ndarray] = None
+) -> BatchDecision:
+    """向量化聚合一批评审
+
+    Args:
+        scores: (评审数, Critic 数) 分数矩阵，NaN 表示该 Critic 没有分数
+        weights: (Critic 数,) 权重向量，见 critic_weights
+        pass_threshold: 加权分不低于此值时通过
+        human_review_threshold: 加权分低于此值时需要人工复核，None 表示不按分数判断
+        require_human_review: 所有（未被否决的）评审都需要人工复核
+        conflict_range: 最高分与最低分之差超过此值视为冲突，None 表示不检查
+        conflict_std: 分数标准差超过此值视为冲突，None 表示不检查
+        vetoed: (评审数,) bool，被否决的评审不通过、也不需要人工复核
+
+    Returns:
+        BatchDecision
+    """
+    scores = np.atleast_2d(np.asarray(scores, dtype=float))
+    weights = np.asarray(weights, dtype=float)
+    if scores.shape[1] != weights.shape[0]:
+        raise ValueError(f"{scores.shape[1]} critics in scores but {weights.shape[0]} weights")
+
+    # Critic 数通常很小：转成 (Critic 数, 评审数) 的连续布局，沿长轴做归约
+    columns = np.ascontiguousarray(scores.T)
+    present = ~np.isnan(columns)
+    filled = np.where(present, columns, 0.0)
+    count = present.sum(axis=0)
+    has_scores = count > 0
+
+    # 只在有分数的 Critic 上归一化权重；按 Critic 顺序累加，与逐条循环的结果逐位一致
+    weight_sum = (weights[:, None] * present).sum(axis=0)
+    final = np.divide(
+        (weights[:, None] * filled).sum(axis=0), weight_sum,
+        out=np.zeros(len(scores)), where=weight_sum > 0,
+    )
+
+    low = np.fmin.reduce(columns, axis=0)    # fmin / fmax 忽略 NaN，全为 NaN 时结果为 NaN
+    high = np.fmax.reduce(columns, axis=0)
+    mean = np.divide(filled.sum(axis=0), count, out=np.zeros(len(scores)), where=has_scores)
+    variance = np.divide(
+        (np.where(present, columns - mean, 0.0) ** 2).sum(axis=0), count,
+        out=np.zeros(len(scores)), where=has_scores,
+    )
+    std = np.sqrt(variance)
+
+    conflicts = np.zeros(len(scores), dtype=bool)
+    if conflict_range is not None:
+        conflicts |= has_scores & (high - low > conflict_range)
+    if conflict_std is not None:
+        conflicts |= std > conflict_std
+
+    vetoed = np.zeros(len(scores), dtype=bool) if vetoed is None else np.asarray(vetoed, dtype=bool)
+    needs_human = conflicts | require_human_review
+    if human_review_threshold is not None:
+        needs_human |= final < human_review_threshold
+
+    return BatchDecision(
+        scores=final,
+        low=low,
+        high=high,
+        std=std,
+        passed=(final >= pass_threshold) & ~vetoed,
+        conflicts=conflicts,
+        needs_human=needs_human & ~vetoed,
+    )
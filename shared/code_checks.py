@@ -0,0 +1,150 @@
+"""
+代码静态检查
+============
+
+在把代码交给 LLM Critic 之前，先用语法解析和 AST 规则做一次几乎零成本的打分，
+用于在多个候选中挑出最值得评审的一个。规则与三个 Critic 的关注点对应：
+
+- 正确性：能否解析、是否定义了函数/类、是否只有占位实现
+- 安全：SQL 字符串拼接、eval/exec、shell=True、硬编码密钥
+- 质量/风格：裸 except、缺少文档字符串、缺少类型注解
+
+分数只用于候选之间的相对排序，不替代 Critic 的评审。
+"""
+
+import ast
+from dataclasses import dataclass, field
+from typing import Iterable
+
+
+MAX_SCORE = 10.0
+
+# 规则 -> 扣分
+PENALTIES = {
+    "syntax_error": MAX_SCORE,
+    "no_definitions": 3.0,
+    "sql_string_building": 3.0,
+    "dangerous_call": 2.0,
+    "hardcoded_secret": 2.0,
+    "bare_except": 1.5,
+    "stub_body": 1.0,
+    "missing_docstring": 1.0,
+    "missing_type_hints": 2.0,     # 按缺失比例计
+}
+
+DANGEROUS_CALLS = {"eval", "exec", "os.system", "pickle.loads", "marshal.loads", "yaml.load"}
+SECRET_NAMES = ("password", "passwd", "secret", "api_key", "apikey", "token")
+
+
+@dataclass
+class StaticReport:
+    """一段代码的静态检查结果"""
+    score: float
+    syntax_ok: bool
+    issues: list[str] = field(default_factory=list)
+
+    def summary(self, limit: int = 3) -> str:
+        if not self.issues:
+            return "no static issues"
+        more = f" (+{len(self.issues) - limit} more)" if len(self.issues) > limit else ""
+        return "; ".join(self.issues[:limit]) + more
+
+
+def _call_name(node: ast.Call) -> str:
+    func = node.func
+    if isinstance(func, ast.Name):
+        return func.id
+    if isinstance(func, ast.Attribute):
+        base = func.value.id if isinstance(func.value, ast.Name) else ""
+        return f"{base}.{func.attr}" if base else func.attr
+    return ""
+
+
+def _is_built_string(node: ast.AST) -> bool:
+    """f-string、% 格式化、+ 拼接或 .format() 构造的字符串"""
+    if isinstance(node, ast.JoinedStr):
+        return any(isinstance(v, ast.FormattedValue) for v in node.values)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Mod, ast.Add)):
+        return True
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "format"
+
+
+def _is_stub(fn: ast.AST) -> bool:
+    """函数体只有文档字符串、pass、... 或 raise NotImplementedError"""
+    for stmt in fn.body:
+        if isinstance(stmt, ast.Pass) or (isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant)):
+            continue
+        if isinstance(stmt, ast.Raise) and stmt.exc is not None and "NotImplementedError" in ast.unparse(stmt.exc):
+            continue
+        return False
+    return True
+
+
+def static_check(code: str) -> StaticReport:
+    """解析代码并按 PENALTIES 扣分
+
+    Args:
+        code: Python 源码
+
+    Returns:
+        StaticReport，无法解析时 score 为 0
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return StaticReport(score=0.0, syntax_ok=False, issues=[f"syntax error line {e.lineno}: {e.msg}"])
+
+    penalty = 0.0
+    issues = []
+
+    def flag(rule: str, message: str, weight: float = 1.0) -> None:
+        nonlocal penalty
+        penalty += PENALTIES[rule] * weight
+        issues.append(message)
+
+    functions = [n for n in ast.walk(tree) if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    classes = [n for n in ast.walk(tree) if isinstance(n, ast.ClassDef)]
+    if not functions and not classes:
+        flag("no_definitions", "no function or class defined")
+
+    annotated = total = 0
+    for fn in functions:
+        if ast.get_docstring(fn) is None:
+            flag("missing_docstring", f"{fn.name}: missing docstring", 1 / max(1, len(functions)))
+        if _is_stub(fn):
+            flag("stub_body", f"{fn.name}: placeholder body")
+        args = [a for a in fn.args.args + fn.args.kwonlyargs if a.arg not in ("self", "cls")]
+        total += len(args) + 1
+        annotated += sum(a.annotation is not None for a in args) + (fn.returns is not None)
+    if total and annotated < total:
+        flag("missing_type_hints", f"type hints on {annotated}/{total} parameters/returns", 1 - annotated / total)
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ExceptHandler) and node.type is None:
+            flag("bare_except", f"line {node.lineno}: bare except")
+        elif isinstance(node, ast.Call):
+            name = _call_name(node)
+            if name in DANGEROUS_CALLS:
+                flag("dangerous_call", f"line {node.lineno}: {name}()")
+            elif any(k.arg == "shell" and isinstance(k.value, ast.Constant) and k.value.value is True
+                     for k in node.keywords):
+                flag("dangerous_call", f"line {node.lineno}: {name}(shell=True)")
+            elif name.endswith(("execute", "executemany")) and node.args and _is_built_string(node.args[0]):
+                flag("sql_string_building", f"line {node.lineno}: SQL built from a formatted string")
+        elif isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant) \
+                and isinstance(node.value.value, str) and node.value.value:
+            for target in node.targets:
+                if isinstance(target, ast.Name) and any(s in target.id.lower() for s in SECRET_NAMES):
+                    flag("hardcoded_secret", f"line {node.lineno}: hard-coded {target.id}")
+
+    return StaticReport(score=round(max(0.0, MAX_SCORE - penalty), 2), syntax_ok=True, issues=issues)
+
+
+def rank_candidates(candidates: Iterable[str]) -> list[tuple[int, str, StaticReport]]:
+    """按静态分数从高到低排列候选，分数相同时保持原顺序
+
+    Returns:
+        [(原序号, 代码, 报告), ...]
+    """
+    scored = [(i, code, static_check(code)) for i, code in enumerate(candidates)]
+    return sorted(scored, key=lambda item: (-item[2].score, item[0]))
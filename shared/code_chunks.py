@@ -0,0 +1,181 @@
+"""
+按 AST 边界切分源码
+===================
+
+把整份文件塞进一次 Critic 调用，文件到几千行时要么超出上下文，要么评审质量
+明显下降，而且所有分析串行在一次调用里。chunk_code 按顶层定义（函数 / 类）
+把代码切成 token 有上限的片段，供并行评审：
+
+- 定义之间的注释、空行归入下一个定义，装饰器与定义在一起
+- 超过上限的类按方法继续切分，函数按函数体语句切分，单条语句仍超限时按行切分
+- 相邻的小定义合并进同一片段，直到接近上限
+
+片段覆盖全部行、互不重叠；CodeChunk.to_file_line 把片段内的行号映射回文件行号。
+无法解析的代码按行切分。
+"""
+
+import ast
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from .tokens import count_tokens
+
+
+DEFAULT_CHUNK_TOKENS = 1500
+
+# ast 的行号只按 \n、\r\n、\r 计数；str.splitlines 还会在 \x0c、\x1c、\u2028 等处断行
+_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+
+@dataclass(frozen=True)
+class CodeChunk:
+    """一段连续的源码（行号从 1 开始，含首尾）"""
+    start_line: int
+    end_line: int
+    text: str
+    symbols: tuple[str, ...]
+    tokens: int
+
+    def to_file_line(self, line: Optional[int]) -> Optional[int]:
+        """片段内行号（从 1 开始）-> 文件行号；超出片段范围时返回 None"""
+        if line is None or not 1 <= line <= self.end_line - self.start_line + 1:
+            return None
+        return self.start_line + line - 1
+
+
+def source_lines(code: str) -> list[str]:
+    """按 ast 的规则把源码切成行，行号与 ast 节点的 lineno 一致"""
+    lines = _LINE_BREAK.split(code)
+    if lines and lines[-1] == "":
+        lines.pop()
+    return lines
+
+
+@dataclass
+class _Unit:
+    start: int
+    end: int
+    symbol: str
+    node: Optional[ast.AST] = None
+
+
+def _definition_start(node: ast.AST) -> int:
+    decorators = getattr(node, "decorator_list", [])
+    return min([node.lineno] + [d.lineno for d in decorators])
+
+
+def _units(body: list[ast.stmt], start: int, end: int, prefix: str = "") -> list[_Unit]:
+    """把语句列表变成覆盖 [start, end] 的单元，语句前的注释 / 空行归入该语句"""
+    units: list[_Unit] = []
+    previous_end = start - 1
+    for stmt in body:
+        is_def = isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        symbol = f"{prefix}{stmt.name}" if is_def else ""
+        if units and _definition_start(stmt) <= previous_end:
+            # 与上一条语句在同一行（a = 1; b = 2），并入上一单元
+            previous_end = max(previous_end, stmt.end_lineno)
+            continue
+        # 单元从上一条语句结束后的第一行开始，中间的注释 / 空行属于本语句
+        unit_start = previous_end + 1
+        if units:
+            units[-1].end = unit_start - 1
+        units.append(_Unit(unit_start, end, symbol, stmt))
+        previous_end = stmt.end_lineno
+    if not units and start <= end:
+        units.append(_Unit(start, end, ""))
+    return units
+
+
+def _split(unit: _Unit, lines: list[str], max_tokens: int) -> list[_Unit]:
+    """把超过上限的单元按子语句切开，子语句仍超限时继续递归或按行切分"""
+    text = "\n".join(lines[unit.start - 1:unit.end])
+    if count_tokens(text) <= max_tokens:
+        return [unit]
+
+    body = getattr(unit.node, "body", None)
+    if isinstance(body, list) and body and body[0].lineno > unit.start:
+        prefix = f"{unit.symbol}." if isinstance(unit.node, ast.ClassDef) else ""
+        children = _units(body, body[0].lineno, unit.end, prefix)
+        # 定义头（装饰器、签名、前置注释）并入第一个子单元
+        children[0].start = unit.start
+        if not isinstance(unit.node, ast.ClassDef):
+            for child in children:
+                child.symbol = unit.symbol
+        split = []
+        for child in children:
+            split.extend(_split(child, lines, max_tokens))
+        return split
+
+    # 单条语句超限：按行切分
+    split, start, used = [], unit.start, 0
+    for number in range(unit.start, unit.end + 1):
+        cost = count_tokens(lines[number - 1] + "\n")
+        if used and used + cost > max_tokens:
+            split.append(_Unit(start, number - 1, unit.symbol))
+            start, used = number, 0
+        used += cost
+    split.append(_Unit(start, unit.end, unit.symbol))
+    return split
+
+
+def chunk_code(code: str, max_tokens: int = DEFAULT_CHUNK_TOKENS) -> list[CodeChunk]:
+    """按 AST 边界把代码切成 token 有上限的片段
+
+    Args:
+        code: Python 源码
+        max_tokens: 每个片段的 token 上限（单行超过上限时该行独占一个片段）
+
+    Returns:
+        按行号排序、覆盖全部行的片段列表；空代码返回 []
+    """
+    if max_tokens <= 0:
+        raise ValueError("max_tokens must be positive")
+    lines = source_lines(code)
+    if not lines:
+        return []
+
+    try:
+        tree = ast.parse(code)
+        units = _units(tree.body, 1, len(lines))
+    except SyntaxError:
+        units = [_Unit(1, len(lines), "")]
+
+    pieces = []
+    for unit in units:
+        pieces.extend(_split(unit, lines, max_tokens))
+
+    # 相邻的小单元合并，直到接近上限
+    chunks, group, used = [], [], 0
+    for piece in pieces:
+        cost = count_tokens("\n".join(lines[piece.start - 1:piece.end]) + "\n")
+        if group and used + cost > max_tokens:
+            chunks.append(_make_chunk(group, lines))
+            group, used = [], 0
+        group.append(piece)
+        used += cost
+    if group:
+        chunks.append(_make_chunk(group, lines))
+    return chunks
+
+
+def _make_chunk(group: list[_Unit], lines: list[str]) -> CodeChunk:
+    start, end = group[0].start, group[-1].end
+    text = "\n".join(lines[start - 1:end])
+    symbols = tuple(dict.fromkeys(u.symbol for u in group if u.symbol))
+    return CodeChunk(start, end, text, symbols, count_tokens(text))
+
+
+def module_context(code: str, max_lines: int = 40) -> str:
+    """文件的 import 语句，作为各片段评审的共同上下文"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return ""
+    lines = source_lines(code)
+    imports = [
+        "\n".join(lines[node.lineno - 1:node.end_lineno])
+        for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+    ]
+    return "\n".join(imports[:max_lines])
@@ -1,40 +1,69 @@
 """
 共享配置模块
+
+兼容层：配置已迁移到 shared.settings（类型校验、分节、可热加载），新代码直接使用
+get_settings()。
+
+Config 的属性名保持不变（config.OPENAI_MODEL 等）：
+- 原有的键（LEGACY_DEFAULTS）每次读取时直接取环境变量，默认值与含义不变，
+  不导入 pydantic-settings，只用 Config 的脚本不必为此付出启动时间
+- 之后新增的键（LLM_REQUESTS_PER_MINUTE、TRACE_EXPORTER 等，见 settings.LEGACY_ENV）
+  取自 get_settings() 的当前值，第一次读取时才导入 settings
+
+TIMEOUT_SECONDS 仍是单次请求的超时；图的单个超步超时是另一项配置
+（MULTI_CRITIC__STEP_TIMEOUT_SECONDS / CRITIC_AGENT__STEP_TIMEOUT_SECONDS）。
 """
 
 import os
-from typing import Optional
+from typing import Any, Callable
+
 from dotenv import load_dotenv
 
 # 加载 .env 文件
 load_dotenv()
 
 
-class Config:
-    """全局配置"""
-    
+# 原有的键 -> (类型, 默认值)
+LEGACY_DEFAULTS: dict[str, tuple[Callable[[str], Any], str]] = {
     # LLM 配置
-    OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
-    OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4")
-    OPENAI_TEMPERATURE: float = float(os.getenv("OPENAI_TEMPERATURE", "0"))
-    
+    "OPENAI_API_KEY": (str, ""),
+    "OPENAI_MODEL": (str, "gpt-4"),
+    "OPENAI_TEMPERATURE": (float, "0"),
     # Anthropic 配置 (可选)
-    ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
-    
+    "ANTHROPIC_API_KEY": (str, ""),
     # Azure OpenAI 配置 (可选)
-    AZURE_OPENAI_API_KEY: str = os.getenv("AZURE_OPENAI_API_KEY", "")
-    AZURE_OPENAI_ENDPOINT: str = os.getenv("AZURE_OPENAI_ENDPOINT", "")
-    AZURE_OPENAI_DEPLOYMENT: str = os.getenv("AZURE_OPENAI_DEPLOYMENT", "")
-    
+    "AZURE_OPENAI_API_KEY": (str, ""),
+    "AZURE_OPENAI_ENDPOINT": (str, ""),
+    "AZURE_OPENAI_DEPLOYMENT": (str, ""),
     # LangSmith 配置 (可观测性)
-    LANGCHAIN_TRACING_V2: str = os.getenv("LANGCHAIN_TRACING_V2", "false")
-    LANGCHAIN_API_KEY: str = os.getenv("LANGCHAIN_API_KEY", "")
-    LANGCHAIN_PROJECT: str = os.getenv("LANGCHAIN_PROJECT", "multiagent-tutorial")
-    
+    "LANGCHAIN_TRACING_V2": (str, "false"),
+    "LANGCHAIN_API_KEY": (str, ""),
+    "LANGCHAIN_PROJECT": (str, "multiagent-tutorial"),
     # 智能体配置
-    MAX_ITERATIONS: int = int(os.getenv("MAX_ITERATIONS", "5"))
-    TIMEOUT_SECONDS: int = int(os.getenv("TIMEOUT_SECONDS", "300"))
-    
+    "MAX_ITERATIONS": (int, "5"),
+    "TIMEOUT_SECONDS": (int, "300"),
+}
+
+
+class _ConfigMeta(type):
+    """类属性转发：原有的键读环境变量，新增的键读当前配置"""
+
+    def __getattr__(cls, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in LEGACY_DEFAULTS:
+            cast, default = LEGACY_DEFAULTS[name]
+            return cast(os.getenv(name, default))
+        from .settings import get_settings
+        return get_settings().legacy_value(name)
+
+
+class Config(metaclass=_ConfigMeta):
+    """全局配置（兼容旧的类属性写法）"""
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(type(self), name)
+
     @classmethod
     def validate(cls) -> bool:
         """验证必需的配置"""
@@ -42,7 +71,7 @@ class Config:
             print("⚠️ Warning: OPENAI_API_KEY not set")
             return False
         return True
-    
+
     @classmethod
     def get_llm_config(cls, provider: str = "openai") -> dict:
         """获取 LLM 配置"""
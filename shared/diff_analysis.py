@@ -0,0 +1,289 @@
+"""
+代码修订差异分析
+================
+
+Writer 每轮修订后让所有 Critic 重新评审，但很多修订只动了一部分：
+只补了文档字符串，安全 Critic 的结论不可能变；只调了缩进和换行，
+只有风格 Critic 需要重看。
+
+analyze_diff 比较前后两版代码，按顶层定义（函数 / 类，其余语句归入 <module>）
+找出变化的区域，并把每处变化归类为 Critic 关注点：
+
+- code:        语句 / 表达式变化（逻辑、常量、调用）
+- imports:     import 语句
+- annotations: 类型注解
+- docs:        文档字符串
+- comments:    注释
+- format:      只有空白 / 换行 / 引号等排版变化（AST 相同）
+
+select_critics 再按各 Critic 关心的关注点决定本轮需要重跑哪些 Critic，
+其余 Critic 沿用上一轮的结论：
+
+    analysis = analyze_diff(previous_code, code)
+    rerun = select_critics(analysis, {"security": SECURITY_CONCERNS, ...}, previous_results)
+
+任何一版无法解析时，视为所有关注点都变了。
+
+unified_diff 生成增量评审用的差异文本：第二轮起 Critic 只需看到改动和
+周围几行上下文，而不是整份代码。
+"""
+
+import ast
+import copy
+import difflib
+import io
+import tokenize
+from dataclasses import dataclass, field
+from typing import Iterable, Mapping, Optional
+
+from .code_chunks import source_lines
+
+
+ALL_CONCERNS = frozenset({"code", "imports", "annotations", "docs", "comments", "format"})
+
+# 常见 Critic 关注的变化类型（按 Critic 的评审重点命名）
+DEFAULT_CRITIC_CONCERNS: dict[str, frozenset] = {
+    "quality": frozenset({"code", "annotations", "docs", "comments"}),
+    "security": frozenset({"code", "imports"}),
+    "style": ALL_CONCERNS,
+    "logic": frozenset({"code"}),
+    "performance": frozenset({"code", "imports"}),
+}
+
+MODULE_REGION = "<module>"
+
+
+@dataclass
+class DiffAnalysis:
+    """两版代码之间的差异"""
+    regions: dict[str, frozenset] = field(default_factory=dict)   # 区域 -> 关注点
+    changed_lines: int = 0
+    parsed: bool = True
+
+    @property
+    def concerns(self) -> frozenset:
+        """所有区域关注点的并集"""
+        if not self.parsed:
+            return ALL_CONCERNS
+        return frozenset().union(*self.regions.values())
+
+    def summary(self) -> str:
+        if not self.parsed:
+            return f"unparseable revision ({self.changed_lines} lines changed)"
+        if not self.regions:
+            return "no changes"
+        parts = [f"{name} ({', '.join(sorted(concerns))})" for name, concerns in self.regions.items()]
+        return f"{self.changed_lines} lines changed: " + "; ".join(parts)
+
+
+# ==========================================
+# 分项提取
+# ==========================================
+
+class _Normalizer(ast.NodeTransformer):
+    """去掉文档字符串、类型注解和 import，只留下影响行为的部分"""
+
+    def _strip_docstring(self, node):
+        if ast.get_docstring(node, clean=False) is not None:
+            node.body = node.body[1:] or [ast.Pass()]
+        return node
+
+    def visit_Module(self, node):
+        self._strip_docstring(node)
+        self.generic_visit(node)
+        return node
+
+    def visit_FunctionDef(self, node):
+        self._strip_docstring(node)
+        node.returns = None
+        self.generic_visit(node)
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        self._strip_docstring(node)
+        self.generic_visit(node)
+        return node
+
+    def visit_arg(self, node):
+        node.annotation = None
+        return node
+
+    def visit_AnnAssign(self, node):
+        node.annotation = ast.Constant(value=None)
+        self.generic_visit(node)
+        return node
+
+    def visit_Import(self, node):
+        return None
+
+    visit_ImportFrom = visit_Import
+
+
+def _docstrings(node: ast.AST) -> list:
+    return [
+        ast.get_docstring(n, clean=False)
+        for n in ast.walk(node)
+        if isinstance(n, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+    ]
+
+
+def _annotations(node: ast.AST) -> list[str]:
+    found = []
+    for n in ast.walk(node):
+        if isinstance(n, ast.arg) and n.annotation is not None:
+            found.append(ast.dump(n.annotation))
+        elif isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef)) and n.returns is not None:
+            found.append(ast.dump(n.returns))
+        elif isinstance(n, ast.AnnAssign):
+            found.append(ast.dump(n.annotation))
+    return found
+
+
+def _imports(node: ast.AST) -> list[str]:
+    return [ast.dump(n) for n in ast.walk(node) if isinstance(n, (ast.Import, ast.ImportFrom))]
+
+
+def _comments(source: str) -> dict[int, str]:
+    """行号 -> 注释"""
+    comments = {}
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(source).readline):
+            if tok.type == tokenize.COMMENT:
+                comments[tok.start[0]] = tok.string
+    except (tokenize.TokenError, IndentationError):
+        pass
+    return comments
+
+
+@dataclass
+class _Region:
+    node: ast.AST
+    source: str
+    comments: list[str]
+
+    def aspects(self) -> dict[str, object]:
+        return {
+            "code": ast.dump(_Normalizer().visit(copy.deepcopy(self.node))),
+            "imports": _imports(self.node),
+            "annotations": _annotations(self.node),
+            "docs": _docstrings(self.node),
+            "comments": self.comments,
+        }
+
+
+def _regions(source: str, tree: ast.Module) -> dict[str, _Region]:
+    """顶层函数 / 类各为一个区域，其余语句合成 <module>"""
+    lines = source_lines(source)
+    comments = _comments(source)
+    regions: dict[str, _Region] = {}
+    module_body, claimed = [], set()
+
+    for stmt in tree.body:
+        if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            start = min([stmt.lineno] + [d.lineno for d in stmt.decorator_list])
+            span = range(start, stmt.end_lineno + 1)
+            claimed.update(span)
+            regions[stmt.name] = _Region(
+                node=stmt,
+                source="\n".join(lines[start - 1:stmt.end_lineno]),
+                comments=[comments[i] for i in span if i in comments],
+            )
+        else:
+            module_body.append(stmt)
+
+    module = ast.Module(body=module_body, type_ignores=[])
+    regions[MODULE_REGION] = _Region(
+        node=module,
+        source="\n".join(line for i, line in enumerate(lines, 1) if i not in claimed),
+        comments=[text for i, text in sorted(comments.items()) if i not in claimed],
+    )
+    return regions
+
+
+# ==========================================
+# 分析与选择
+# ==========================================
+
+def analyze_diff(old: str, new: str) -> DiffAnalysis:
+    """比较两版代码，找出变化区域及其关注点
+
+    Args:
+        old: 上一版代码
+        new: 本轮代码
+
+    Returns:
+        DiffAnalysis；任何一版无法解析时 parsed 为 False
+    """
+    changed = sum(
+        1 for line in difflib.unified_diff(old.splitlines(), new.splitlines(), lineterm="", n=0)
+        if line[:1] in "+-" and not line.startswith(("+++", "---"))
+    )
+    try:
+        old_regions = _regions(old, ast.parse(old))
+        new_regions = _regions(new, ast.parse(new))
+    except SyntaxError:
+        return DiffAnalysis(changed_lines=changed, parsed=False)
+
+    regions = {}
+    for name in list(old_regions) + [n for n in new_regions if n not in old_regions]:
+        before, after = old_regions.get(name), new_regions.get(name)
+        if before is None or after is None:
+            regions[name] = ALL_CONCERNS - {"format"}   # 新增 / 删除的定义
+            continue
+        if before.source == after.source:
+            continue
+        old_aspects, new_aspects = before.aspects(), after.aspects()
+        concerns = frozenset(k for k in old_aspects if old_aspects[k] != new_aspects[k])
+        regions[name] = concerns or frozenset({"format"})
+
+    return DiffAnalysis(regions=regions, changed_lines=changed)
+
+
+def unified_diff(old: str, new: str, context: int = 3, name: str = "code.py") -> str:
+    """两版代码的 unified diff
+
+    Args:
+        context: 每处改动前后保留的上下文行数
+        name: diff 头部显示的文件名
+
+    Returns:
+        diff 文本；没有变化时为空字符串
+    """
+    return "\n".join(difflib.unified_diff(
+        old.splitlines(), new.splitlines(),
+        fromfile=f"a/{name}", tofile=f"b/{name}", n=context, lineterm="",
+    ))
+
+
+def select_critics(
+    analysis: Optional[DiffAnalysis],
+    critic_concerns: Mapping[str, Optional[Iterable[str]]],
+    previous: Optional[Mapping[str, dict]] = None
+) -> list[str]:
+    """选出本轮需要重跑的 Critic
+
+    Args:
+        analysis: analyze_diff 的结果；None（首轮）表示全部重跑
+        critic_concerns: Critic 名 -> 关心的关注点，None 表示任何变化都重跑
+        previous: Critic 名 -> 上一轮结果；没有结果或结果被取消（cancelled）的
+            Critic 总是重跑。为 None 时不检查
+
+    Returns:
+        需要重跑的 Critic 名（保持 critic_concerns 的顺序）
+    """
+    if analysis is None:
+        return list(critic_concerns)
+
+    selected = []
+    for name, concerns in critic_concerns.items():
+        if previous is not None:
+            result = previous.get(name)
+            if result is None or result.get("cancelled"):
+                selected.append(name)
+                continue
+        wanted = ALL_CONCERNS if concerns is None else frozenset(concerns)
+        if analysis.concerns & wanted:
+            selected.append(name)
+    return selected
@@ -0,0 +1,138 @@
+"""
+并行 Critic 的提前退出
+======================
+
+并行评审时，一个 Critic 给出否决级结果（例如安全 Critic 判定 critical），
+这一轮的结论已经确定：代码必须回到 Writer 修改，其余 Critic 的结果不会改变
+决策，继续等待只会浪费延迟和 token。
+
+VetoBoard 按评审轮次（round_id）记录否决：
+
+    result, veto = await board.run(round_id, "style_critic", call_llm())
+    if veto is not None:
+        ...   # 被其他 Critic 的否决取消，call_llm() 已经停止
+
+    reason = check_veto(rule, score, risk_level)
+    if reason and board.veto(round_id, "security_critic", reason):
+        ...   # 本 Critic 发出否决，同轮其余进行中的调用随之取消
+
+取消的是 asyncio 任务：ainvoke / astream 在 await 处收到 CancelledError，
+底层 HTTP 请求随之中断，不会再计入后续 token。
+"""
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Hashable, Optional
+
+
+@dataclass(frozen=True)
+class Veto:
+    """一次否决"""
+    critic: str
+    reason: str
+
+
+class _Round:
+    __slots__ = ("event", "veto")
+
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.veto: Optional[Veto] = None
+
+
+class VetoBoard:
+    """按评审轮次记录否决，并取消同轮仍在进行的 Critic 调用
+
+    Args:
+        max_rounds: 最多保留的轮次数，超出后丢弃最早的（未 close 的轮次不会无限堆积）
+    """
+
+    def __init__(self, max_rounds: int = 256):
+        self.max_rounds = max_rounds
+        self._rounds: OrderedDict[Hashable, _Round] = OrderedDict()
+
+    def _round(self, key: Hashable) -> _Round:
+        round_ = self._rounds.get(key)
+        if round_ is None:
+            round_ = self._rounds[key] = _Round()
+            while len(self._rounds) > self.max_rounds:
+                self._rounds.popitem(last=False)
+        return round_
+
+    def veto(self, key: Hashable, critic: str, reason: str) -> bool:
+        """发出否决
+
+        Returns:
+            是否是本轮的第一个否决（之后的否决只保留第一个）
+        """
+        round_ = self._round(key)
+        if round_.veto is not None:
+            return False
+        round_.veto = Veto(critic, reason)
+        round_.event.set()
+        return True
+
+    def vetoed(self, key: Hashable) -> Optional[Veto]:
+        """本轮的否决，没有时为 None"""
+        round_ = self._rounds.get(key)
+        return round_.veto if round_ else None
+
+    def close(self, key: Hashable) -> None:
+        """本轮结束，释放记录"""
+        self._rounds.pop(key, None)
+
+    async def run(self, key: Hashable, critic: str, aw: Awaitable) -> tuple[Any, Optional[Veto]]:
+        """执行一次 Critic 调用，本轮出现否决时取消它
+
+        Args:
+            key: 评审轮次
+            critic: 调用方 Critic 名（用于日志）
+            aw: Critic 调用（协程）
+
+        Returns:
+            (结果, None)；被否决取消时为 (None, 否决)
+        """
+        round_ = self._round(key)
+        if round_.veto is not None:
+            if asyncio.iscoroutine(aw):
+                aw.close()
+            return None, round_.veto
+
+        task = asyncio.ensure_future(aw)
+        waiter = asyncio.ensure_future(round_.event.wait())
+        try:
+            await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # 节点自身被取消（例如超步超时）时两者都要停掉
+            waiter.cancel()
+            if not task.done():
+                task.cancel()
+
+        if not task.cancelled() and task.done():
+            return task.result(), None
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return None, round_.veto
+
+
+def check_veto(rule, score: float, risk_level: Optional[str] = None) -> Optional[str]:
+    """按否决规则判断一个 Critic 结果
+
+    Args:
+        rule: 含 max_score / risk_levels 的规则（settings.VetoRule），None 表示该 Critic 不能否决
+        score: Critic 分数
+        risk_level: Critic 给出的风险等级（没有时为 None）
+
+    Returns:
+        否决原因；不否决时为 None
+    """
+    if rule is None:
+        return None
+    if risk_level and risk_level in rule.risk_levels:
+        return f"risk level {risk_level}"
+    if rule.max_score is not None and score <= rule.max_score:
+        return f"score {score} <= {rule.max_score}"
+    return None
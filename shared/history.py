@@ -0,0 +1,127 @@
+"""
+迭代历史压缩
+============
+
+修订循环每一轮都会把代码和评审意见塞进 writer 提示词，轮数越多提示词越长。
+HistoryCompactor 把提示词控制在固定的 token 预算内：
+
+1. 最新代码：始终原文保留
+2. 最新一轮评审：原文保留，超出预算时截断
+3. 更早的评审：压缩成有界的结构化摘要（每轮一行 + 反复出现的建议），
+   预算不足时从最旧的轮次开始丢弃
+
+评审轮次是普通 dict，支持以下字段（都可缺省）：
+    iteration, score, feedback / critique, suggestions,
+    critics: [{critic_name, score, feedback, suggestions}]
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from .tokens import count_tokens, truncate_to_tokens
+
+
+def _first_sentence(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    for sep in (". ", "。", "\n"):
+        if sep in text:
+            text = text.split(sep)[0]
+            break
+    return text if len(text) <= max_chars else text[:max_chars - 3] + "..."
+
+
+def _round_suggestions(round_: dict) -> list[str]:
+    suggestions = list(round_.get("suggestions") or [])
+    for critic in round_.get("critics") or []:
+        suggestions.extend(critic.get("suggestions") or [])
+    return suggestions
+
+
+@dataclass
+class HistoryCompactor:
+    """评审历史压缩器
+
+    Attributes:
+        token_budget: 单次调用的提示词 token 上限
+        max_rounds: 摘要中最多列出的历史轮次
+        max_suggestions: 摘要中最多列出的反复出现的建议
+        line_chars: 摘要中每行的最大字符数
+        model: 用于 token 计数的模型名
+    """
+    token_budget: int = 4000
+    max_rounds: int = 5
+    max_suggestions: int = 5
+    line_chars: int = 160
+    model: Optional[str] = None
+
+    def _round_line(self, round_: dict) -> str:
+        label = f"Iteration {round_.get('iteration', '?')}"
+        if round_.get("score") is not None:
+            label += f" (score {round_['score']:.1f}/10)"
+
+        critics = round_.get("critics") or []
+        if critics:
+            parts = [
+                f"{c['critic_name']} {c['score']:.1f}: {_first_sentence(c.get('feedback', ''), 60)}"
+                for c in critics
+            ]
+            detail = "; ".join(parts)
+        else:
+            detail = _first_sentence(round_.get("feedback") or round_.get("critique") or "", self.line_chars)
+        return f"- {label}: {detail}"[:self.line_chars]
+
+    def digest_lines(self, rounds: list[dict]) -> list[str]:
+        """生成摘要行：最近的轮次在前，然后是反复出现的建议"""
+        recent = list(rounds)[-self.max_rounds:]
+        lines = [self._round_line(r) for r in reversed(recent)]
+
+        counts = Counter(
+            s.strip() for r in rounds for s in _round_suggestions(r) if s.strip()
+        )
+        recurring = [(s, n) for s, n in counts.most_common(self.max_suggestions) if n > 1]
+        if recurring:
+            lines.append("Recurring suggestions (still unresolved?):")
+            lines.extend(f"- (x{n}) {s}"[:self.line_chars] for s, n in recurring)
+        return lines
+
+    def digest(self, rounds: list[dict], max_tokens: Optional[int] = None) -> str:
+        """把历史轮次压缩成不超过 max_tokens 的摘要"""
+        if not rounds:
+            return ""
+        lines = self.digest_lines(rounds)
+        if max_tokens is None:
+            return "\n".join(lines)
+
+        kept: list[str] = []
+        used = 0
+        for line in lines:
+            cost = count_tokens(line, self.model) + 1
+            if used + cost > max_tokens:
+                break
+            kept.append(line)
+            used += cost
+        return "\n".join(kept)
+
+    def build_prompt(
+        self,
+        template: str,
+        *,
+        code: str,
+        latest_feedback: str,
+        earlier_rounds: list[dict],
+        **fields
+    ) -> str:
+        """渲染修订提示词并强制执行 token 预算
+
+        template 需要包含 {code}、{feedback}、{history} 占位符，
+        其余占位符通过 fields 传入。
+        """
+        skeleton = template.format(code=code, feedback="", history="", **fields)
+        remaining = self.token_budget - count_tokens(skeleton, self.model)
+
+        feedback = truncate_to_tokens(latest_feedback, max(remaining, 0), self.model)
+        remaining -= count_tokens(feedback, self.model)
+
+        history = self.digest(earlier_rounds, max_tokens=max(remaining, 0)) or "(none)"
+        return template.format(code=code, feedback=feedback, history=history, **fields)
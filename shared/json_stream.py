@@ -0,0 +1,219 @@
+"""
+流式 JSON 提取
+==============
+
+Critic 的回复通常是"说明文字 + ```json 代码块```"，用 ``` 切分再 json.loads
+很脆弱：多一个代码块、少一个围栏、JSON 后面跟一句话都会解析失败。
+
+JsonObjectExtractor 逐块扫描模型输出，找到第一个括号平衡且能被解析的
+JSON 对象就停止；配合 llm.stream() 使用时，对象闭合后即可停止接收
+后续 token（stream_json / astream_json），省掉模型在 JSON 之后的啰嗦输出。
+"""
+
+import json
+import re
+from typing import Any, Iterable, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+
+class JsonExtractionError(ValueError):
+    """回复中没有可用的 JSON 对象，或对象不符合 schema"""
+
+
+# LLM 常见的小错误：对象 / 数组末尾多一个逗号
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def _loads_lenient(text: str) -> Optional[dict]:
+    for candidate in (text, _TRAILING_COMMA.sub(r"\1", text)):
+        try:
+            value = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict):
+            return value
+    return None
+
+
+class JsonObjectExtractor:
+    """增量提取第一个完整的 JSON 对象
+
+    用法：
+        extractor = JsonObjectExtractor()
+        for chunk in chunks:
+            if extractor.feed(chunk) is not None:
+                break
+        else:
+            extractor.finish()
+        data = extractor.result
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0            # 下一个待扫描的字符位置
+        self._start = None       # 当前候选对象的起始位置
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.result: Optional[dict] = None
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    @property
+    def text(self) -> str:
+        """目前为止收到的全部文本"""
+        return self._buffer
+
+    def feed(self, chunk: str) -> Optional[dict]:
+        """送入一段输出，对象闭合时返回解析结果，否则返回 None"""
+        if self.done:
+            return self.result
+        self._buffer += chunk
+        buffer = self._buffer
+
+        while self._pos < len(buffer):
+            ch = buffer[self._pos]
+            self._pos += 1
+
+            if self._start is None:
+                if ch == "{":
+                    self._start, self._depth = self._pos - 1, 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    value = _loads_lenient(buffer[self._start:self._pos])
+                    if value is not None:
+                        self.result = value
+                        return value
+                    # 不是合法 JSON（例如说明文字里的 {placeholder}），继续找下一个
+                    self._restart()
+        return None
+
+    def finish(self) -> Optional[dict]:
+        """输出已结束：仍未闭合的候选不会再闭合了（例如说明文字里孤立的 "{"），
+        从它后面一个字符重新扫描，直到找到对象或没有候选
+
+        Returns:
+            解析结果，没有找到时返回 None
+        """
+        while not self.done and self._start is not None:
+            self._restart()
+            self.feed("")
+        return self.result
+
+    def _restart(self) -> None:
+        """放弃当前候选，从其起始位置的下一个字符继续扫描"""
+        self._pos = self._start + 1
+        self._start = None
+        self._depth = 0
+        self._in_string = self._escape = False
+
+
+def extract_json(text: str) -> dict:
+    """从完整文本中提取第一个 JSON 对象"""
+    extractor = JsonObjectExtractor()
+    value = extractor.feed(text) or extractor.finish()
+    if value is None:
+        raise JsonExtractionError("no JSON object found in response")
+    return value
+
+
+def validate_json(data: dict, schema: Type[BaseModel]) -> BaseModel:
+    """按 Pydantic schema 校验提取出的对象"""
+    try:
+        return schema.model_validate(data)
+    except ValidationError as e:
+        raise JsonExtractionError(f"response does not match {schema.__name__}: {e}") from e
+
+
+def _chunk_text(chunk: Any) -> str:
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    # Anthropic 等提供商的内容块列表
+    return "".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in content or ()
+    )
+
+
+def stream_json(
+    llm,
+    messages: Iterable,
+    schema: Optional[Type[BaseModel]] = None,
+    **kwargs
+) -> tuple[Any, str]:
+    """流式调用 LLM，JSON 对象闭合后立即停止接收
+
+    Args:
+        llm: LangChain Chat Model（需支持 .stream）
+        messages: 输入消息
+        schema: 可选的 Pydantic 模型，用于校验
+        **kwargs: 透传给 llm.stream
+
+    Returns:
+        (解析结果, 收到的原始文本)。有 schema 时解析结果为模型实例。
+
+    Raises:
+        JsonExtractionError: 输出结束仍没有合法对象，或对象不符合 schema
+    """
+    extractor = JsonObjectExtractor()
+    stream = llm.stream(messages, **kwargs)
+    try:
+        for chunk in stream:
+            if extractor.feed(_chunk_text(chunk)) is not None:
+                break
+        else:
+            extractor.finish()
+    finally:
+        # 提前退出时关闭底层流，停止生成
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+    if not extractor.done:
+        raise JsonExtractionError("no JSON object found in response")
+    data = extractor.result
+    return (validate_json(data, schema) if schema else data), extractor.text
+
+
+async def astream_json(
+    llm,
+    messages: Iterable,
+    schema: Optional[Type[BaseModel]] = None,
+    **kwargs
+) -> tuple[Any, str]:
+    """stream_json 的异步版本（llm.astream），任务被取消时同样关闭底层流"""
+    extractor = JsonObjectExtractor()
+    stream = llm.astream(messages, **kwargs)
+    try:
+        async for chunk in stream:
+            if extractor.feed(_chunk_text(chunk)) is not None:
+                break
+        else:
+            extractor.finish()
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    if not extractor.done:
+        raise JsonExtractionError("no JSON object found in response")
+    data = extractor.result
+    return (validate_json(data, schema) if schema else data), extractor.text
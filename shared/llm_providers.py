@@ -1,18 +1,31 @@
 """
 LLM 提供商工厂
+
+langchain_openai / langchain_anthropic 导入耗时较长，只在第一次创建该提供商的
+模型时才导入，只用 config 或提示词的脚本不必为此付出启动时间。
 """
 
-from typing import Optional
-from langchain_openai import ChatOpenAI, AzureChatOpenAI
-from langchain_anthropic import ChatAnthropic
+import json
+import threading
+from typing import Iterable, Optional, Sequence, Type, Union
+from langchain_core.messages import HumanMessage
+from pydantic import BaseModel
 
-from .config import config
+from .settings import get_settings
+from .json_stream import astream_json, extract_json, stream_json, validate_json
+from .rate_limit import RateLimitCallbackHandler, get_rate_limiter
+from .routing import HedgedLLM
+from .singleflight import CoalescingLLM, SingleFlight
+from .usage import UsageCallbackHandler
 
 
 def get_llm(
     provider: str = "openai",
     model: Optional[str] = None,
     temperature: float = 0,
+    rate_limit: bool = False,
+    fallbacks: Optional[Sequence[Union[str, tuple[str, str]]]] = None,
+    coalesce: bool = False,
     **kwargs
 ):
     """获取 LLM 实例
@@ -21,34 +34,79 @@ def get_llm(
         provider: "openai", "azure", "anthropic"
         model: 模型名称 (可选，使用默认)
         temperature: 温度参数
-        **kwargs: 额外参数
+        rate_limit: 是否接入进程级限流器 (按 provider + 模型/部署共享配额)
+        fallbacks: 备用提供商，"anthropic" 或 ("anthropic", "模型名")；
+            设置后返回 HedgedLLM，主提供商慢或报 429/5xx 时转到备用提供商。
+            相同配置（且没有额外参数）返回同一个 HedgedLLM，延迟统计跨调用累积
+        coalesce: 是否合并进程内相同输入的并发调用 (共享一次请求的结果)
+        **kwargs: 额外参数 (只传给主提供商)
     
     Returns:
         LangChain Chat Model 实例
     """
     
+    if coalesce:
+        llm = get_llm(provider, model, temperature, rate_limit, fallbacks, **kwargs)
+        return CoalescingLLM(llm, _SINGLE_FLIGHT)
+    
+    if fallbacks:
+        runtime = get_settings().runtime
+        specs = [(spec, None) if isinstance(spec, str) else tuple(spec) for spec in fallbacks]
+        key = (
+            provider, model, temperature, rate_limit, tuple(specs),
+            runtime.hedge_percentile, runtime.hedge_default_delay, runtime.hedge_min_delay,
+        )
+        with _ROUTERS_LOCK:
+            router = _ROUTERS.get(key) if not kwargs else None
+            if router is None:
+                router = _build_router(provider, model, temperature, rate_limit, specs, kwargs)
+                if not kwargs:
+                    _ROUTERS[key] = router
+        return router
+    
+    llm_settings = get_settings().llm
+    
+    if rate_limit:
+        limiter = get_rate_limiter(
+            f"{provider}:{model or _default_model(provider)}",
+            requests_per_minute=llm_settings.requests_per_minute or None,
+            tokens_per_minute=llm_settings.tokens_per_minute or None,
+            burst_seconds=get_settings().runtime.rate_limit_burst_seconds,
+        )
+        kwargs["callbacks"] = list(kwargs.get("callbacks") or []) + [
+            RateLimitCallbackHandler(limiter, model=model)
+        ]
+    
+    # 用量记账 / 链路追踪：分别只在 track_usage() 内、configure_tracing() 后生效；
+    # 排在限流之后，延迟不含排队时间
+    kwargs["callbacks"] = list(kwargs.get("callbacks") or []) + [_USAGE_HANDLER, _tracing_handler()]
+    
     if provider == "openai":
+        from langchain_openai import ChatOpenAI
         return ChatOpenAI(
-            model=model or config.OPENAI_MODEL,
+            model=model or llm_settings.openai_model,
             temperature=temperature,
-            api_key=config.OPENAI_API_KEY,
+            api_key=llm_settings.openai_api_key,
             **kwargs
         )
     
     elif provider == "azure":
+        from langchain_openai import AzureChatOpenAI
+        kwargs.setdefault("api_version", llm_settings.azure_api_version)
         return AzureChatOpenAI(
-            deployment_name=model or config.AZURE_OPENAI_DEPLOYMENT,
+            deployment_name=model or llm_settings.azure_deployment,
             temperature=temperature,
-            api_key=config.AZURE_OPENAI_API_KEY,
-            azure_endpoint=config.AZURE_OPENAI_ENDPOINT,
+            api_key=llm_settings.azure_api_key,
+            azure_endpoint=llm_settings.azure_endpoint,
             **kwargs
         )
     
     elif provider == "anthropic":
+        from langchain_anthropic import ChatAnthropic
         return ChatAnthropic(
             model=model or "claude-3-sonnet-20240229",
             temperature=temperature,
-            api_key=config.ANTHROPIC_API_KEY,
+            api_key=llm_settings.anthropic_api_key,
             **kwargs
         )
     
@@ -56,6 +114,164 @@ def get_llm(
         raise ValueError(f"Unknown provider: {provider}")
 
 
+# 进程内共享，不同 get_llm 调用创建的同参数模型也能合并
+_SINGLE_FLIGHT = SingleFlight()
+
+# 路由配置 -> HedgedLLM；对冲截止时间依赖累积的延迟样本，每次新建就永远用默认值
+_ROUTERS: dict[tuple, HedgedLLM] = {}
+_ROUTERS_LOCK = threading.Lock()
+
+
+def _build_router(
+    provider: str,
+    model: Optional[str],
+    temperature: float,
+    rate_limit: bool,
+    specs: list[tuple[str, Optional[str]]],
+    kwargs: dict
+) -> HedgedLLM:
+    """创建 HedgedLLM
+
+    可以转移的路线关闭 SDK 自带的重试（max_retries=0），429 / 5xx 立即交给
+    路由转到下一个提供商，而不是先在客户端里退避重试；最后一条路线没有
+    后备，保留 SDK 重试。
+    """
+    routes = [(provider, model, dict(kwargs))] + [(name, m, {}) for name, m in specs]
+    models = []
+    for i, (name, route_model, route_kwargs) in enumerate(routes):
+        if i < len(routes) - 1:
+            route_kwargs.setdefault("max_retries", 0)
+        models.append(get_llm(name, route_model, temperature, rate_limit, **route_kwargs))
+    runtime = get_settings().runtime
+    return HedgedLLM(
+        models,
+        names=[name for name, _, _ in routes],
+        hedge_percentile=runtime.hedge_percentile,
+        default_delay=runtime.hedge_default_delay,
+        min_delay=runtime.hedge_min_delay,
+    )
+
+_USAGE_HANDLER = UsageCallbackHandler()
+_TRACING_HANDLER = None
+
+
+def _tracing_handler():
+    """共享的 TracingCallbackHandler（tracing 依赖 langgraph，首次使用时才导入）"""
+    global _TRACING_HANDLER
+    if _TRACING_HANDLER is None:
+        from .tracing import TracingCallbackHandler
+        _TRACING_HANDLER = TracingCallbackHandler()
+    return _TRACING_HANDLER
+
+
+def _default_model(provider: str) -> str:
+    """限流器的部署键使用的默认模型名"""
+    llm_settings = get_settings().llm
+    return {
+        "openai": llm_settings.openai_model,
+        "azure": llm_settings.azure_deployment,
+        "anthropic": "claude-3-sonnet-20240229",
+    }.get(provider, "default")
+
+
 def get_default_llm(**kwargs):
     """获取默认 LLM (OpenAI GPT-4)"""
     return get_llm(provider="openai", **kwargs)
+
+
+# ==========================================
+# 结构化输出
+# ==========================================
+
+def get_structured_output_method(llm) -> Optional[str]:
+    """按提供商选择 with_structured_output 的实现方式
+
+    Azure 的旧 api_version 不支持 json_schema，统一走 function calling；
+    返回 None 表示使用 LangChain 的默认方式。
+    """
+    name = type(llm).__name__
+    if name == "AzureChatOpenAI":
+        return "function_calling"
+    if name == "ChatOpenAI":
+        return "json_schema"
+    return None
+
+
+def json_format_instructions(schema: Type[BaseModel]) -> str:
+    """不支持结构化输出时附加到提示词末尾的格式说明"""
+    return (
+        "Respond with a single JSON object matching this JSON schema, and nothing else:\n"
+        + json.dumps(schema.model_json_schema(), separators=(",", ":"))
+    )
+
+
+def invoke_structured(
+    llm,
+    messages: Iterable,
+    schema: Type[BaseModel],
+    method: Optional[str] = None
+) -> BaseModel:
+    """以 Pydantic schema 获取结构化结果
+
+    优先使用提供商的结构化输出（工具调用 / JSON schema），提示词里无需再
+    描述 JSON 格式；提供商不支持时，附加格式说明并流式提取 JSON。
+
+    Args:
+        llm: LangChain Chat Model
+        messages: 输入消息
+        schema: 期望的输出模型
+        method: 覆盖 get_structured_output_method 的选择
+
+    Returns:
+        schema 实例
+
+    Raises:
+        JsonExtractionError: 输出无法解析或不符合 schema
+    """
+    messages = list(messages)
+    structured = _structured_runnable(llm, schema, method)
+    if structured is None:
+        parsed, _ = stream_json(
+            llm, messages + [HumanMessage(content=json_format_instructions(schema))], schema
+        )
+        return parsed
+    return _parse_structured(structured.invoke(messages), schema)
+
+
+async def ainvoke_structured(
+    llm,
+    messages: Iterable,
+    schema: Type[BaseModel],
+    method: Optional[str] = None
+) -> BaseModel:
+    """invoke_structured 的异步版本；所在任务被取消时，进行中的请求随之取消"""
+    messages = list(messages)
+    structured = _structured_runnable(llm, schema, method)
+    if structured is None:
+        parsed, _ = await astream_json(
+            llm, messages + [HumanMessage(content=json_format_instructions(schema))], schema
+        )
+        return parsed
+    return _parse_structured(await structured.ainvoke(messages), schema)
+
+
+def _structured_runnable(llm, schema: Type[BaseModel], method: Optional[str]):
+    """with_structured_output(include_raw=True)，不支持时返回 None"""
+    method = method or get_structured_output_method(llm)
+    try:
+        kwargs = {"method": method} if method else {}
+        return llm.with_structured_output(schema, include_raw=True, **kwargs)
+    except NotImplementedError:
+        return None
+
+
+def _parse_structured(result: dict, schema: Type[BaseModel]) -> BaseModel:
+    if result.get("parsed") is not None:
+        return result["parsed"]
+
+    # 工具参数不合法时，模型有时会把 JSON 写在正文里
+    raw = result.get("raw")
+    content = getattr(raw, "content", "") or ""
+    if not isinstance(content, str):
+        content = json.dumps(content)
+    return validate_json(extract_json(content), schema)
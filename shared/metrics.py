@@ -0,0 +1,218 @@
+"""
+节点延迟指标
+============
+
+链路追踪看单次运行，这里看聚合：每个 (图, 节点) 一个 HDR 风格的延迟直方图，
+压测时可以直接读出各节点的 p50 / p99。
+
+直方图按 2 的幂分段，每段再线性分成 32 个子桶（log-linear），记录和查询
+都是 O(1)，内存只与出现过的桶数有关，分位数的相对误差不超过 1/32（约 3%）。
+
+TracedStateGraph 添加的节点会自动记录到全局的 metrics 注册表：
+
+    workflow = TracedStateGraph(MyState, name="review")
+    ...
+    print(metrics.report())
+    metrics.dump("metrics.json")
+"""
+
+import atexit
+import functools
+import inspect
+import json
+import threading
+import time
+from typing import Callable, Optional
+
+
+# 每个 2 的幂区间内的线性子桶数 = 2 ** SUB_BUCKET_BITS
+SUB_BUCKET_BITS = 5
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+
+def _bucket_index(value: int) -> int:
+    """值（微秒）所在的桶；小于 2 * _SUB_BUCKETS 的值精确记录"""
+    if value < 2 * _SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - (SUB_BUCKET_BITS + 1)
+    return (shift + 1) * _SUB_BUCKETS + ((value >> shift) - _SUB_BUCKETS)
+
+
+def _bucket_value(index: int) -> float:
+    """桶的代表值（区间中点，微秒）"""
+    if index < 2 * _SUB_BUCKETS:
+        return float(index)
+    shift = index // _SUB_BUCKETS - 1
+    top = index % _SUB_BUCKETS + _SUB_BUCKETS
+    lower = top << shift
+    return lower + ((1 << shift) - 1) / 2
+
+
+class LatencyHistogram:
+    """log-linear 延迟直方图，单位为秒（内部按微秒分桶）"""
+
+    def __init__(self):
+        self.counts: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def record(self, seconds: float) -> None:
+        index = _bucket_index(max(0, int(seconds * 1_000_000)))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, n in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """q 分位数（q 取 0-100），单位秒"""
+        if not self.count:
+            return 0.0
+        rank = max(1, round(q / 100 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                value = _bucket_value(index) / 1_000_000
+                # 桶中点可能越过实际的最小 / 最大值
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "min": self.min or 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max or 0.0,
+        }
+
+
+# ==========================================
+# 注册表
+# ==========================================
+
+class MetricsRegistry:
+    """按 (图, 节点) 保存延迟直方图与错误数，线程安全"""
+
+    def __init__(self):
+        self._histograms: dict[tuple[str, str], LatencyHistogram] = {}
+        self._errors: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, graph: str, node: str, seconds: float, error: bool = False) -> None:
+        key = (graph, node)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.record(seconds)
+            if error:
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+    def histogram(self, graph: str, node: str) -> Optional[LatencyHistogram]:
+        return self._histograms.get((graph, node))
+
+    def snapshot(self) -> dict[str, dict[str, dict]]:
+        """{图: {节点: {count, mean, p50, p90, p99, ...}}}"""
+        with self._lock:
+            items = list(self._histograms.items())
+            errors = dict(self._errors)
+        result: dict[str, dict[str, dict]] = {}
+        for (graph, node), histogram in items:
+            stats = histogram.to_dict()
+            stats["errors"] = errors.get((graph, node), 0)
+            result.setdefault(graph, {})[node] = stats
+        return result
+
+    def report(self) -> str:
+        """按图输出各节点的分位数表，p99 高的在前"""
+        lines = []
+        for graph, nodes in self.snapshot().items():
+            lines.append(f"📈 {graph}")
+            lines.append(
+                f"   {'node':<24} {'count':>6} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9} {'errors':>6}"
+            )
+            for node, s in sorted(nodes.items(), key=lambda item: item[1]["p99"], reverse=True):
+                lines.append(
+                    f"   {node:<24} {s['count']:>6} {s['p50'] * 1000:>7.1f}ms {s['p90'] * 1000:>7.1f}ms "
+                    f"{s['p99'] * 1000:>7.1f}ms {s['max'] * 1000:>7.1f}ms {s['errors']:>6}"
+                )
+        return "\n".join(lines) if lines else "(no node metrics recorded)"
+
+    def dump(self, path: str) -> None:
+        """把快照写成 JSON"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._errors.clear()
+
+
+# 进程内共享的注册表
+metrics = MetricsRegistry()
+
+
+def dump_metrics_at_exit(path: Optional[str] = None) -> None:
+    """进程退出时打印报表，给出 path 时同时写出 JSON"""
+    def _dump():
+        print(metrics.report())
+        if path:
+            metrics.dump(path)
+    atexit.register(_dump)
+
+
+# ==========================================
+# 节点包装
+# ==========================================
+
+def timed_node(graph: str, name: str, fn: Callable, registry: Optional[MetricsRegistry] = None) -> Callable:
+    """记录节点每次执行的耗时（同步或异步），签名保持不变"""
+    registry = registry or metrics
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = False
+            try:
+                return await fn(*args, **kwargs)
+            except BaseException:
+                error = True
+                raise
+            finally:
+                registry.record(graph, name, time.perf_counter() - start, error)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        error = False
+        try:
+            return fn(*args, **kwargs)
+        except BaseException:
+            error = True
+            raise
+        finally:
+            registry.record(graph, name, time.perf_counter() - start, error)
+    return wrapper
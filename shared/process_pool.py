@@ -0,0 +1,136 @@
+"""
+进程池节点执行器
+================
+
+CPU 密集型节点（聚合、AST 规则检查、综合）默认在图的线程中运行，
+并发执行几十个审查时会互相争抢 GIL。`run_in_process` 把节点函数
+放到常驻的 ProcessPoolExecutor 中执行：
+
+    @run_in_process(reads=["critic_scores"])
+    def aggregator_node(state): ...
+
+- 状态切片：只把节点读取的键（reads）序列化发送给子进程
+- 部分更新：子进程返回的更新中，与输入切片相同的键会被丢弃
+- 常驻进程池：首次使用时创建，进程内复用，解释器退出时关闭
+
+限制：被装饰的节点必须定义在模块顶层（子进程按模块名 + 限定名重新定位它），
+状态切片和返回值必须可以 pickle。
+
+内置的图没有使用它：多 Critic 的聚合器只对一行分数做 NumPy 聚合
+（shared.batch_aggregation），Planner-Worker 的综合器只拼接字符串，每次只要
+几十微秒，远小于一次进程间往返与序列化；聚合器还依赖进程内的否决看板
+（VETO_BOARD），搬到子进程后状态不再共享。需要时给自定义的重计算节点
+（大量 AST 分析、批量重放评审等）按需加上，收益见 benchmarks/process_pool_scaling.py。
+"""
+
+import atexit
+import functools
+import importlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Optional
+
+from .settings import get_settings
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """获取进程内共享的进程池（首次调用时创建）
+
+    Args:
+        max_workers: 进程数，默认取 runtime.process_pool_workers，未配置时为 CPU 核数；
+            进程池已存在时忽略
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            max_workers = max_workers or get_settings().runtime.process_pool_workers or os.cpu_count()
+            _pool = ProcessPoolExecutor(max_workers=max_workers)
+        return _pool
+
+
+def shutdown_process_pool(wait: bool = True) -> None:
+    """关闭共享进程池，下次使用时会重新创建"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait)
+
+
+atexit.register(shutdown_process_pool)
+
+
+def _resolve_node(module: str, qualname: str) -> Callable:
+    """在子进程中按模块名 + 限定名找回原始节点函数"""
+    target = importlib.import_module(module)
+    for part in qualname.split("."):
+        target = getattr(target, part)
+    # 模块属性指向的是包装器，剥掉所有进程池包装
+    while getattr(target, "__process_node__", False):
+        target = target.__wrapped__
+    return target
+
+
+def _invoke_node(module: str, qualname: str, state_slice: dict) -> dict:
+    """子进程入口"""
+    return _resolve_node(module, qualname)(state_slice)
+
+
+def merge_partial_update(state_slice: dict, update: Optional[dict]) -> dict:
+    """只保留相对输入切片发生变化的键
+
+    兼容"修改 state 后整体返回"的节点写法，避免未变化的键被重复写回。
+    注意：带追加型 reducer 的键如果被整体返回，仍然会被重复追加，
+    这类节点应只返回新增部分。
+    """
+    if not update:
+        return {}
+    return {
+        key: value for key, value in update.items()
+        if key not in state_slice or state_slice[key] != value
+    }
+
+
+def run_in_process(
+    reads: Optional[Iterable[str]] = None,
+    max_workers: Optional[int] = None
+):
+    """装饰器：在共享进程池中运行节点函数
+
+    Args:
+        reads: 节点读取的状态键；None 表示发送整个状态
+        max_workers: 进程池大小（仅在进程池首次创建时生效）
+
+    Returns:
+        与原节点签名相同的同步节点函数
+    """
+    keys = tuple(reads) if reads is not None else None
+
+    def decorator(fn: Callable) -> Callable:
+        if "<locals>" in fn.__qualname__:
+            raise ValueError(
+                f"{fn.__qualname__} must be defined at module level to run in a process pool"
+            )
+        module, qualname = fn.__module__, fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(state: dict) -> dict:
+            if keys is None:
+                state_slice = dict(state)
+            else:
+                state_slice = {k: state[k] for k in keys if k in state}
+
+            future = get_process_pool(max_workers).submit(
+                _invoke_node, module, qualname, state_slice
+            )
+            return merge_partial_update(state_slice, future.result())
+
+        wrapper.__process_node__ = True
+        return wrapper
+
+    return decorator
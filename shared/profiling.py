@@ -0,0 +1,241 @@
+"""
+节点级性能剖析
+==============
+
+延迟直方图只告诉我们哪个节点慢，剖析器告诉我们慢在哪里。按需开启，
+只剖析指定的一个节点，累计 N 次调用后写出报告并自动关闭：
+
+    profiler = enable_node_profiling("writer", invocations=20)
+    for task in tasks:
+        app.invoke(...)
+    print(profiler.report_path)    # profiles/writer.txt
+
+后端：
+- "cprofile"（默认）：标准库，写出 .prof（可用 snakeviz 等查看）和按累计时间排序的 .txt
+- "pyinstrument"：采样剖析，需要 pip install pyinstrument，写出 .txt 和 .html
+
+cProfile 同一时刻只能剖析一个线程，并行执行的同名节点只剖析其中一个，
+其余照常运行。异步节点只在协程自身执行的片段上开启 cProfile，await
+期间事件循环调度的其他协程不会计入；pyinstrument 以 async 模式剖析，
+等待时间单独显示为 [await]。
+"""
+
+import cProfile
+import functools
+import inspect
+import io
+import os
+import pstats
+import threading
+from typing import Callable, Optional
+
+
+BACKENDS = ("cprofile", "pyinstrument")
+
+
+class NodeProfiler:
+    """累计剖析一个节点的 N 次调用
+
+    Attributes:
+        node: 节点名
+        graph: 只剖析该图中的节点，None 表示任意图
+        invocations: 需要剖析的调用次数
+        profiled: 已剖析的调用次数
+        report_path: 报告写出后的文本报告路径
+    """
+
+    def __init__(
+        self,
+        node: str,
+        invocations: int = 20,
+        backend: str = "cprofile",
+        output_dir: str = "profiles",
+        graph: Optional[str] = None,
+        top: int = 30,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown profiler backend: {backend}")
+        if invocations < 1:
+            raise ValueError("invocations must be >= 1")
+        self.node = node
+        self.graph = graph
+        self.invocations = invocations
+        self.backend = backend
+        self.output_dir = output_dir
+        self.top = top
+        self.profiled = 0
+        self.report_path: Optional[str] = None
+        self._busy = threading.Lock()
+        if backend == "pyinstrument":
+            from pyinstrument import Profiler  # 缺少依赖时在开启时就报错
+            self._profiler = Profiler(async_mode="enabled")
+        else:
+            self._profiler = cProfile.Profile()
+
+    @property
+    def done(self) -> bool:
+        return self.profiled >= self.invocations
+
+    def _start(self) -> None:
+        if self.backend == "pyinstrument":
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def _stop(self) -> None:
+        if self.backend == "pyinstrument":
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+        self._finish()
+
+    def _finish(self) -> None:
+        self.profiled += 1
+        if self.done:
+            self.write_report()
+            # 剖析期间可能已经为同一节点开启了新的剖析，不能把它移除
+            if _profilers.get(self.node) is self:
+                del _profilers[self.node]
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """在剖析下执行一次同步调用；已有调用在剖析中时直接执行"""
+        if self.done or not self._busy.acquire(blocking=False):
+            return fn(*args, **kwargs)
+        try:
+            self._start()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._stop()
+        finally:
+            self._busy.release()
+
+    async def acall(self, fn: Callable, *args, **kwargs):
+        """异步版本：cProfile 只剖析协程自身执行的片段，不含 await 期间的其他协程"""
+        if self.done or not self._busy.acquire(blocking=False):
+            return await fn(*args, **kwargs)
+        try:
+            if self.backend == "pyinstrument":
+                # async 模式按协程上下文采样，await 期间的其他协程不计入
+                self._start()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self._stop()
+            try:
+                return await _ProfiledSteps(fn(*args, **kwargs), self._profiler)
+            finally:
+                self._finish()
+        finally:
+            self._busy.release()
+
+    def write_report(self) -> str:
+        """写出报告，返回文本报告路径"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"{self.graph}.{self.node}" if self.graph else self.node)
+        if self.backend == "pyinstrument":
+            text = self._profiler.output_text(unicode=True)
+            with open(base + ".html", "w", encoding="utf-8") as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.dump_stats(base + ".prof")
+            buffer = io.StringIO()
+            stats = pstats.Stats(self._profiler, stream=buffer)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+            text = buffer.getvalue()
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(f"# node={self.node} graph={self.graph} invocations={self.profiled}\n")
+            f.write(text)
+        self.report_path = base + ".txt"
+        print(f"🔬 Profile of node '{self.node}' ({self.profiled} calls) written to {self.report_path}")
+        return self.report_path
+
+
+class _ProfiledSteps:
+    """逐段驱动协程：每次恢复执行时开启 cProfile，挂起交还事件循环前关闭"""
+
+    def __init__(self, coro, profiler: cProfile.Profile):
+        self._coro = coro
+        self._profiler = profiler
+
+    def __await__(self):
+        resume, value = self._coro.send, None
+        while True:
+            self._profiler.enable()
+            try:
+                pending = resume(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self._profiler.disable()
+            try:
+                value, resume = (yield pending), self._coro.send
+            except BaseException as error:
+                # 取消等异常原样抛回协程内部
+                value, resume = error, self._coro.throw
+
+
+# 节点名 -> 正在进行的剖析
+_profilers: dict[str, NodeProfiler] = {}
+
+
+def enable_node_profiling(
+    node: str,
+    invocations: int = 20,
+    backend: str = "cprofile",
+    output_dir: str = "profiles",
+    graph: Optional[str] = None,
+) -> NodeProfiler:
+    """开启对一个节点的剖析，N 次调用后自动写出报告并关闭
+
+    Args:
+        node: 节点名
+        invocations: 剖析的调用次数
+        backend: "cprofile" 或 "pyinstrument"
+        output_dir: 报告目录
+        graph: 只剖析该图中的同名节点
+
+    Returns:
+        NodeProfiler，report_path 在完成后可用
+
+    Raises:
+        ImportError: backend="pyinstrument" 但未安装 pyinstrument
+    """
+    profiler = NodeProfiler(node, invocations, backend, output_dir, graph)
+    _profilers[node] = profiler
+    return profiler
+
+
+def disable_node_profiling(node: str, write_report: bool = True) -> Optional[str]:
+    """提前结束剖析，返回报告路径（没有剖析到任何调用时为 None）"""
+    profiler = _profilers.pop(node, None)
+    if profiler is None or not write_report or not profiler.profiled:
+        return None
+    return profiler.write_report()
+
+
+def _active(graph: str, name: str) -> Optional[NodeProfiler]:
+    profiler = _profilers.get(name)
+    if profiler is None or (profiler.graph is not None and profiler.graph != graph):
+        return None
+    return profiler
+
+
+def profiled_node(graph: str, name: str, fn: Callable) -> Callable:
+    """节点包装：该节点开启了剖析时在剖析器下执行，否则直通"""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            profiler = _active(graph, name)
+            if profiler is None:
+                return await fn(*args, **kwargs)
+            return await profiler.acall(fn, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profiler = _active(graph, name)
+        if profiler is None:
+            return fn(*args, **kwargs)
+        return profiler.call(fn, *args, **kwargs)
+    return wrapper
@@ -4,24 +4,54 @@ from .coder_prompts import (
     CODER_SYSTEM_PROMPT,
     CODER_TASK_PROMPT,
     CODER_REVISION_PROMPT,
+    CODER_PROMPT,
 )
 from .critic_prompts import (
     CRITIC_SYSTEM_PROMPT,
     CRITIC_REVIEW_PROMPT,
+    CRITIC_RULES_PROMPT,
+    CRITIC_PROMPT,
     CODE_QUALITY_RULES,
     SECURITY_RULES,
     STYLE_RULES,
     DOCUMENTATION_RULES,
+    format_rules,
+)
+from .registry import (
+    PromptRegistry,
+    RegisteredPrompt,
+    prompt_registry,
+    render_rules,
+)
+from .layout import (
+    CachedPrompt,
+    PrefixReport,
+    measure_prefix,
+    measure_cached_prompt,
+    format_prefix_report,
 )
 
 __all__ = [
     "CODER_SYSTEM_PROMPT",
     "CODER_TASK_PROMPT",
     "CODER_REVISION_PROMPT",
+    "CODER_PROMPT",
     "CRITIC_SYSTEM_PROMPT",
     "CRITIC_REVIEW_PROMPT",
+    "CRITIC_RULES_PROMPT",
+    "CRITIC_PROMPT",
     "CODE_QUALITY_RULES",
     "SECURITY_RULES",
     "STYLE_RULES",
     "DOCUMENTATION_RULES",
+    "format_rules",
+    "CachedPrompt",
+    "PrefixReport",
+    "measure_prefix",
+    "measure_cached_prompt",
+    "format_prefix_report",
+    "PromptRegistry",
+    "RegisteredPrompt",
+    "prompt_registry",
+    "render_rules",
 ]
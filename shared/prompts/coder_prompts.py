@@ -2,6 +2,8 @@
 Coder Agent 提示词
 """
 
+from .registry import prompt_registry
+
 CODER_SYSTEM_PROMPT = """You are an expert Python developer.
 
 Your responsibilities:
@@ -40,3 +42,10 @@ Focus on:
 2. Then addressing code quality concerns
 3. Finally, improving style and documentation
 """
+
+
+CODER_PROMPT = prompt_registry.register(
+    "coder",
+    [("system", CODER_SYSTEM_PROMPT), ("human", CODER_TASK_PROMPT)],
+    variables={"task", "requirements", "revision_instructions"},
+)
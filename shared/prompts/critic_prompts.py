@@ -1,7 +1,13 @@
 """
 Critic Agent 提示词
+
+静态说明和规则列表都放在系统提示词里，所有调用逐字相同，可以命中
+提供商的前缀缓存；用户消息只包含任务和代码（见 layout.CachedPrompt）。
 """
 
+from .layout import CachedPrompt
+from .registry import prompt_registry, render_rules
+
 CRITIC_SYSTEM_PROMPT = """You are an expert code reviewer with deep knowledge of Python best practices.
 
 Your role is to thoroughly review code for:
@@ -36,16 +42,14 @@ If the code meets ALL criteria satisfactorily, respond with exactly: "APPROVED"
 Otherwise, list the issues that need to be addressed.
 """
 
+# 只包含可变内容；审查说明在系统提示词中
 CRITIC_REVIEW_PROMPT = """Task that the code should accomplish:
 {task}
 
 Code to review:
 ```{language}
 {code}
-```
-
-Please provide your detailed code review:
-"""
+```"""
 
 # 各类审查规则
 CODE_QUALITY_RULES = [
@@ -81,3 +85,24 @@ DOCUMENTATION_RULES = [
     "Complex algorithms should have explanatory comments",
     "Include usage examples in docstrings",
 ]
+
+
+def format_rules(title: str, rules: list[str]) -> str:
+    """把规则列表格式化为提示词段落"""
+    return f"{title}:\n" + render_rules(rules)
+
+
+# 完整的系统前缀：审查说明 + 全部规则列表
+CRITIC_RULES_PROMPT = "\n\n".join([
+    format_rules("Code quality rules", CODE_QUALITY_RULES),
+    format_rules("Security rules", SECURITY_RULES),
+    format_rules("Style rules", STYLE_RULES),
+    format_rules("Documentation rules", DOCUMENTATION_RULES),
+])
+
+CRITIC_PROMPT = CachedPrompt(
+    system=f"{CRITIC_SYSTEM_PROMPT}\n{CRITIC_RULES_PROMPT}\n",
+    human=CRITIC_REVIEW_PROMPT,
+)
+
+prompt_registry.register_cached("critic", CRITIC_PROMPT)
@@ -0,0 +1,138 @@
+"""
+面向提示词缓存的布局
+====================
+
+OpenAI / Azure / Anthropic 都会缓存请求的最长公共前缀：两次调用从第一个
+token 开始逐字相同的部分可以命中缓存，命中部分的延迟和费用都更低。
+可变内容（任务、代码）一旦出现在提示词中间，其后的静态说明就无法再被缓存。
+
+CachedPrompt 把提示词固定为两段：
+- system：静态说明与规则列表，原样发送，不做格式化，所有调用逐字相同
+- human：只包含本次调用的任务/代码，可变字段放在末尾
+
+measure_prefix 通过两次不同取值的渲染，测出实际可缓存的前缀长度，
+以及被可变内容挡在后面、无法缓存的静态文本长度。
+"""
+
+import string
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from ..tokens import count_tokens
+
+
+# 提供商开始缓存的最短前缀（OpenAI / Anthropic 均为 1024 tokens）
+MIN_CACHEABLE_TOKENS = 1024
+
+# 可变字段之间的标签、代码围栏等少量静态文本不计为布局问题
+MAX_STATIC_TAIL_TOKENS = 32
+
+
+@dataclass(frozen=True)
+class CachedPrompt:
+    """静态 system 前缀 + 末尾可变的 human 消息
+
+    Attributes:
+        system: 静态系统提示词，原样发送（其中的花括号不会被当作占位符）
+        human: 用户消息模板，使用 str.format 占位符
+    """
+    system: str
+    human: str
+
+    @property
+    def variables(self) -> list[str]:
+        """human 模板中的占位符名"""
+        return [field for _, field, _, _ in string.Formatter().parse(self.human) if field]
+
+    def messages(self, **values) -> list[BaseMessage]:
+        """渲染为 [SystemMessage, HumanMessage]"""
+        return [SystemMessage(content=self.system), HumanMessage(content=self.human.format(**values))]
+
+
+# ==========================================
+# 前缀检查
+# ==========================================
+
+@dataclass
+class PrefixReport:
+    """单个提示词的可缓存前缀统计"""
+    name: str
+    prefix_tokens: int      # 两次调用之间逐字相同的前缀
+    static_tokens: int      # 提示词中全部静态文本
+
+    @property
+    def static_tail_tokens(self) -> int:
+        """位于可变内容之后、无法缓存的静态文本"""
+        return max(0, self.static_tokens - self.prefix_tokens)
+
+    @property
+    def well_ordered(self) -> bool:
+        """静态说明是否都在可变内容之前"""
+        return self.static_tail_tokens <= MAX_STATIC_TAIL_TOKENS
+
+    @property
+    def cacheable(self) -> bool:
+        """前缀是否达到提供商的最短缓存长度"""
+        return self.prefix_tokens >= MIN_CACHEABLE_TOKENS
+
+
+def _serialize(messages: Iterable) -> str:
+    """按发送顺序拼接消息，近似提供商看到的 token 序列"""
+    parts = []
+    for message in messages:
+        if isinstance(message, str):
+            role, content = "user", message
+        elif isinstance(message, tuple):
+            role, content = message
+        else:
+            role, content = message.type, message.content
+        parts.append(f"<{role}>\n{content}\n")
+    return "".join(parts)
+
+
+def measure_prefix(
+    name: str,
+    render: Callable[[str], Iterable],
+    model: Optional[str] = None
+) -> PrefixReport:
+    """测量提示词的可缓存前缀
+
+    Args:
+        name: 报表中的名称
+        render: 以同一个值填充全部可变字段并返回消息列表的函数
+        model: 用于 token 计数的模型名
+    """
+    first = _serialize(render("\x00first"))
+    second = _serialize(render("\x01second"))
+    common = 0
+    for a, b in zip(first, second):
+        if a != b:
+            break
+        common += 1
+    return PrefixReport(
+        name=name,
+        prefix_tokens=count_tokens(first[:common], model),
+        static_tokens=count_tokens(_serialize(render("")), model),
+    )
+
+
+def measure_cached_prompt(name: str, prompt: CachedPrompt, model: Optional[str] = None) -> PrefixReport:
+    """measure_prefix 的 CachedPrompt 版本"""
+    return measure_prefix(
+        name, lambda value: prompt.messages(**{field: value for field in prompt.variables}), model
+    )
+
+
+def format_prefix_report(reports: Iterable[PrefixReport]) -> str:
+    """格式化前缀报表"""
+    lines = []
+    for report in reports:
+        status = "✅" if report.well_ordered else "⚠️ "
+        note = "" if report.cacheable else f" (below {MIN_CACHEABLE_TOKENS}-token cache minimum)"
+        lines.append(
+            f"{status} {report.name}: prefix {report.prefix_tokens} / static {report.static_tokens} tokens, "
+            f"{report.static_tail_tokens} static tokens after variables{note}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,156 @@
+"""
+提示词模板注册表
+================
+
+每次调用都 ChatPromptTemplate.from_messages(...) 重新解析模板、每轮都
+"\\n".join(规则列表)，都是纯开销。注册表在导入时把模板编译一次：
+
+- 校验模板变量与声明的一致，拼写错误在导入时就暴露，而不是调用时 KeyError
+- 规则列表等固定内容通过 partial 预先填入（render_rules 结果按规则缓存）
+- 记录每个模板静态部分的 token 数，便于比较提示词开销
+
+用法：
+
+    CRITIC_PROMPT = prompt_registry.register(
+        "critic",
+        [("system", "Rules:\\n{criteria}"), ("human", "{code}")],
+        variables={"code"},
+        partials={"criteria": render_rules(RULES)},
+    )
+    chain = CRITIC_PROMPT | llm
+"""
+
+import string
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Optional, Sequence
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from ..tokens import count_tokens
+from .layout import CachedPrompt
+
+
+@lru_cache(maxsize=64)
+def _render_rules(rules: tuple[str, ...], bullet: str) -> str:
+    return "\n".join(f"{bullet}{rule}" for rule in rules)
+
+
+def render_rules(rules: Iterable[str], bullet: str = "- ") -> str:
+    """把规则列表渲染为项目符号文本，相同规则只渲染一次"""
+    return _render_rules(tuple(rules), bullet)
+
+
+def _escape(text: str) -> str:
+    """原样文本放进 f-string 模板前转义花括号"""
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+@dataclass(frozen=True)
+class RegisteredPrompt:
+    """注册表条目
+
+    Attributes:
+        name: 模板名
+        template: 编译好的模板（已填入 partials）
+        variables: 调用时需要提供的变量
+        static_tokens: 去掉调用变量后模板文本的 token 数（含 partials）
+    """
+    name: str
+    template: ChatPromptTemplate
+    variables: frozenset
+    static_tokens: int
+
+
+class PromptRegistry:
+    """按名称保存编译好的 ChatPromptTemplate"""
+
+    def __init__(self):
+        self._prompts: dict[str, RegisteredPrompt] = {}
+
+    def register(
+        self,
+        name: str,
+        messages: Sequence[tuple[str, str]],
+        variables: Optional[Iterable[str]] = None,
+        partials: Optional[dict[str, str]] = None,
+    ) -> ChatPromptTemplate:
+        """编译并注册模板
+
+        Args:
+            name: 模板名，重复注册会覆盖
+            messages: (role, template) 列表，同 ChatPromptTemplate.from_messages
+            variables: 期望的调用变量；给出时与模板实际变量不一致会报错
+            partials: 预先填入的固定内容（规则列表等）
+
+        Returns:
+            编译好的模板
+
+        Raises:
+            ValueError: 模板变量与 variables / partials 不一致
+        """
+        partials = dict(partials or {})
+        template = ChatPromptTemplate.from_messages(list(messages))
+
+        declared = set(template.input_variables)
+        unknown = set(partials) - declared
+        if unknown:
+            raise ValueError(f"prompt {name!r}: partials {sorted(unknown)} not used in template")
+        remaining = declared - set(partials)
+        if variables is not None and remaining != set(variables):
+            raise ValueError(
+                f"prompt {name!r}: template variables {sorted(remaining)} != declared {sorted(variables)}"
+            )
+        if partials:
+            template = template.partial(**partials)
+
+        static_text = "\n".join(
+            string.Formatter().vformat(text, (), _Blank(partials)) for _, text in messages
+        )
+        self._prompts[name] = RegisteredPrompt(
+            name=name,
+            template=template,
+            variables=frozenset(remaining),
+            static_tokens=count_tokens(static_text),
+        )
+        return template
+
+    def register_cached(self, name: str, prompt: CachedPrompt) -> ChatPromptTemplate:
+        """注册 CachedPrompt：system 原样保留，human 模板照常解析"""
+        return self.register(
+            name,
+            [("system", _escape(prompt.system)), ("human", prompt.human)],
+            variables=prompt.variables,
+        )
+
+    def get(self, name: str) -> ChatPromptTemplate:
+        """按名称取模板"""
+        try:
+            return self._prompts[name].template
+        except KeyError:
+            raise KeyError(f"prompt {name!r} is not registered") from None
+
+    def entry(self, name: str) -> RegisteredPrompt:
+        """按名称取注册表条目"""
+        return self._prompts[name]
+
+    def names(self) -> list[str]:
+        return list(self._prompts)
+
+    def token_counts(self) -> dict[str, int]:
+        """各模板静态部分的 token 数"""
+        return {name: entry.static_tokens for name, entry in self._prompts.items()}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._prompts
+
+
+class _Blank(dict):
+    """格式化时未提供的变量替换为空字符串"""
+
+    def __missing__(self, key):
+        return ""
+
+
+# 进程内共享的注册表
+prompt_registry = PromptRegistry()
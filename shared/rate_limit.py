@@ -0,0 +1,386 @@
+"""
+LLM 调用限流
+============
+
+并行跑多组 Critic 评审时，同一个 Azure 部署很快触发 429，而每个
+LangChain 客户端各自重试、各自退避，互相踩踏，实际吞吐反而下降。
+
+这里提供进程内共享的限流器，按部署分别执行两个配额：
+- 每分钟请求数（RPM）
+- 每分钟 token 数（TPM）：调用前按提示词估算并预扣，
+  调用结束后按 usage_metadata 的真实用量多退少补
+
+等待配额的调用按到达顺序（FIFO）放行，不会被后来的小请求插队饿死；
+限流器记录每次排队等待的时间。排队中的异步调用被取消时立即出队，
+已经拿到的配额原样退还。收到 429 时整个部署统一暂停，
+代替各客户端互不协调的重试。
+
+用法：
+
+    llm = get_llm(provider="azure", rate_limit=True)
+
+或手动挂到任意 Chat Model 上：
+
+    limiter = get_rate_limiter("azure:gpt-4o", requests_per_minute=60)
+    llm = ChatOpenAI(callbacks=[RateLimitCallbackHandler(limiter)])
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from itertools import count
+from typing import Any, Callable, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .tokens import count_message_tokens
+
+
+# 未设置 max_tokens 时，为回复预留的 token 数
+DEFAULT_COMPLETION_TOKENS = 512
+
+# 429 没有 Retry-After 时的统一暂停时间（秒）
+DEFAULT_BACKOFF_SECONDS = 5.0
+
+
+# ==========================================
+# 令牌桶
+# ==========================================
+
+class TokenBucket:
+    """令牌桶：容量 capacity，每秒补充 rate 个
+
+    余额允许为负（实际用量超过预估时记账），负债还清前不会放行新的请求。
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def wait_time(self, amount: float) -> float:
+        """取走 amount 还需要等待的秒数（超过容量的请求按容量计）"""
+        amount = min(amount, self.capacity)
+        deficit = amount - self.available
+        return max(0.0, deficit / self.rate)
+
+    def take(self, amount: float) -> None:
+        """扣减 amount（调用方需先确认 wait_time 为 0）"""
+        self._refill()
+        self._tokens -= amount
+
+    def give(self, amount: float) -> None:
+        """退还 amount；amount 为负时表示补扣"""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+
+# ==========================================
+# 部署级限流器
+# ==========================================
+
+class AcquireCancelled(Exception):
+    """排队等待配额期间调用被取消"""
+
+
+@dataclass
+class RateLimitStats:
+    """限流统计"""
+    requests: int = 0
+    waited: int = 0                 # 需要排队的请求数
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    estimated_tokens: int = 0
+    actual_tokens: int = 0
+    throttled: int = 0              # 收到 429 的次数
+
+    @property
+    def avg_wait_seconds(self) -> float:
+        return self.total_wait_seconds / self.requests if self.requests else 0.0
+
+
+class RateLimiter:
+    """单个部署的 RPM / TPM 限流器，线程安全
+
+    Args:
+        requests_per_minute: 每分钟请求数上限，None 表示不限
+        tokens_per_minute: 每分钟 token 上限，None 表示不限
+        burst_seconds: 桶容量对应的时间窗口。Azure 按 10 秒左右的短窗口
+            计算配额，一次性用掉整分钟的额度同样会被 429
+        clock: 时钟函数，测试时可替换
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        burst_seconds: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        def bucket(per_minute):
+            if per_minute is None:
+                return None
+            rate = per_minute / 60
+            return TokenBucket(rate, max(1.0, rate * burst_seconds), clock)
+
+        self.requests = bucket(requests_per_minute)
+        self.tokens = bucket(tokens_per_minute)
+        self.stats = RateLimitStats()
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._queue: deque[int] = deque()
+        self._tickets = count()
+        self._paused_until = 0.0
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = max(0.0, self._paused_until - self._clock())
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens))
+        return wait
+
+    def acquire(self, tokens: int = 0, cancel: Optional[threading.Event] = None) -> float:
+        """按到达顺序等待配额并预扣
+
+        Args:
+            tokens: 预估的 token 数
+            cancel: 取消信号；置位后需调用 wake() 唤醒排队中的线程
+
+        Returns:
+            排队等待的秒数
+
+        Raises:
+            AcquireCancelled: 拿到配额前 cancel 已置位
+        """
+        start = self._clock()
+        with self._cond:
+            ticket = next(self._tickets)
+            self._queue.append(ticket)
+            try:
+                while True:
+                    if cancel is not None and cancel.is_set():
+                        raise AcquireCancelled
+                    wait = self._wait_time(tokens) if self._queue[0] == ticket else None
+                    if wait == 0:
+                        break
+                    # 非队首只等待被唤醒；队首等到配额补足为止
+                    self._cond.wait(wait)
+
+                if self.requests is not None:
+                    self.requests.take(1)
+                if self.tokens is not None:
+                    self.tokens.take(tokens)
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+            waited = self._clock() - start
+            self.stats.requests += 1
+            self.stats.estimated_tokens += tokens
+            self.stats.total_wait_seconds += waited
+            self.stats.max_wait_seconds = max(self.stats.max_wait_seconds, waited)
+            if waited > 0:
+                self.stats.waited += 1
+        return waited
+
+    def reconcile(self, estimated: int, actual: Optional[int]) -> None:
+        """调用成功后用真实用量修正预扣的 token
+
+        actual 为 None（流式输出、提供商不返回用量）时保留预扣的估算值：
+        请求确实消耗了配额，全额退还会让这类调用完全绕过 TPM 限制。
+        """
+        if actual is None:
+            return
+        with self._cond:
+            self.stats.actual_tokens += actual
+            if self.tokens is not None:
+                self.tokens.give(estimated - actual)
+            self._cond.notify_all()
+
+    def refund(self, estimated: int) -> None:
+        """调用失败：退还全部预扣的 token"""
+        with self._cond:
+            if self.tokens is not None:
+                self.tokens.give(estimated)
+            self._cond.notify_all()
+
+    def release(self, estimated: int) -> None:
+        """拿到配额但请求没有发出：退还请求数和全部预扣的 token"""
+        with self._cond:
+            if self.requests is not None:
+                self.requests.give(1)
+            if self.tokens is not None:
+                self.tokens.give(estimated)
+            self._cond.notify_all()
+
+    def wake(self) -> None:
+        """唤醒所有排队线程，让它们重新检查取消信号"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def backoff(self, seconds: float = DEFAULT_BACKOFF_SECONDS) -> None:
+        """收到 429：暂停整个部署 seconds 秒"""
+        with self._cond:
+            self.stats.throttled += 1
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+            self._cond.notify_all()
+
+
+# ==========================================
+# 进程级注册表
+# ==========================================
+
+_limiters: dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(
+    key: str,
+    requests_per_minute: Optional[float] = None,
+    tokens_per_minute: Optional[float] = None,
+    **kwargs
+) -> RateLimiter:
+    """获取（或创建）某个部署的共享限流器
+
+    同一个 key 在进程内只创建一次，后续调用的配额参数会被忽略。
+
+    Args:
+        key: 部署标识，例如 "azure:gpt-4o"
+        requests_per_minute: 每分钟请求数
+        tokens_per_minute: 每分钟 token 数
+        **kwargs: 透传给 RateLimiter
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = RateLimiter(requests_per_minute, tokens_per_minute, **kwargs)
+        return limiter
+
+
+def rate_limit_report() -> dict[str, RateLimitStats]:
+    """所有部署的限流统计"""
+    with _limiters_lock:
+        return {key: limiter.stats for key, limiter in _limiters.items()}
+
+
+def print_rate_limit_report() -> None:
+    """打印各部署的排队情况"""
+    for key, stats in rate_limit_report().items():
+        print(
+            f"   ⏳ {key}: {stats.requests} requests, {stats.waited} queued, "
+            f"avg wait {stats.avg_wait_seconds:.2f}s, max {stats.max_wait_seconds:.2f}s, "
+            f"tokens {stats.actual_tokens}/{stats.estimated_tokens} (actual/estimated), "
+            f"429s {stats.throttled}"
+        )
+
+
+# ==========================================
+# LangChain 回调
+# ==========================================
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def _retry_after(error: BaseException) -> float:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", DEFAULT_BACKOFF_SECONDS))
+    except (TypeError, ValueError):
+        return DEFAULT_BACKOFF_SECONDS
+
+
+def _usage_tokens(response) -> Optional[int]:
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("total_tokens")
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    return token_usage.get("total_tokens")
+
+
+class RateLimitCallbackHandler(BaseCallbackHandler):
+    """在每次 Chat Model 调用前后接入限流器
+
+    以回调实现，with_structured_output、bind_tools 等包装后的调用同样受限。
+
+    on_chat_model_start 是协程：排队放到线程池里进行，不阻塞事件循环；
+    调用方在排队期间被取消时通知限流器出队，并退还已经拿到的配额，
+    不会留下永远等不到 on_llm_end / on_llm_error 的预扣记录。
+    同步调用时 LangChain 在临时事件循环中执行这个协程，行为一致。
+    """
+
+    raise_error = True
+
+    def __init__(self, limiter: RateLimiter, model: Optional[str] = None):
+        self.limiter = limiter
+        self.model = model
+        self._estimates: dict[UUID, int] = {}
+        self._lock = threading.Lock()
+
+    async def on_chat_model_start(
+        self, serialized, messages, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        params = kwargs.get("invocation_params") or {}
+        completion = (
+            params.get("max_tokens")
+            or params.get("max_completion_tokens")
+            or DEFAULT_COMPLETION_TOKENS
+        )
+        estimate = sum(count_message_tokens(batch, self.model) for batch in messages) + completion
+
+        cancel = threading.Event()
+        future = asyncio.get_running_loop().run_in_executor(
+            None, self.limiter.acquire, estimate, cancel
+        )
+        try:
+            # shield：取消只打断这里的等待，排队线程收到 cancel 后自行退出
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            cancel.set()
+            self.limiter.wake()
+            future.add_done_callback(lambda done: self._release_abandoned(done, estimate))
+            raise
+        with self._lock:
+            self._estimates[run_id] = estimate
+
+    def _release_abandoned(self, future: asyncio.Future, estimate: int) -> None:
+        # 取消信号到达前已经拿到配额：请求不会发出，原样退还
+        if not future.cancelled() and future.exception() is None:
+            self.limiter.release(estimate)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            estimate = self._estimates.pop(run_id, None)
+        if estimate is not None:
+            self.limiter.reconcile(estimate, _usage_tokens(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            estimate = self._estimates.pop(run_id, None)
+        if estimate is not None:
+            self.limiter.refund(estimate)
+        if _status_code(error) == 429:
+            self.limiter.backoff(_retry_after(error))
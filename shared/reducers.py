@@ -0,0 +1,190 @@
+"""
+LangGraph 状态 Reducer 库
+=========================
+
+`existing + new` 形式的 reducer 每次合并都会复制整个历史，历史越长越慢；
+`operator.add` 则让历史无限增长。这里的 reducer 都有容量上限，每次合并
+只复制仍然保留的条目，开销是 O(limit + len(new))，与运行累计的历史长度无关：
+
+- bounded_append(limit):          固定容量的环形缓冲（deque），超出后丢弃最旧的
+- dedupe_append(key, limit):      追加时按 key 去重
+- keyed_merge(key):               按 key 合并为 dict，同 key 覆盖
+- windowed_summary(window, ...):  保留最近 window 条，更早的折叠进一条摘要
+
+用法：
+
+    class MyState(TypedDict):
+        history: Annotated[Sequence[dict], bounded_append(20)]
+
+    def node(state: MyState) -> dict:
+        return {"history": [entry]}      # 只返回新增部分
+
+注意：LangGraph 的 channel 副本与 checkpoint 共享同一个值对象，
+reducer 必须返回新对象而不能原地修改 existing，否则一次写入会被应用多次。
+同样的原因，节点也不能原地修改状态里的值（state["history"].append(...)），
+那会改动 checkpoint 与其他副本看到的同一个 deque；节点只返回新增的条目。
+整体返回未修改的 state 是安全的：new 与 existing 是同一个对象时 reducer 原样保留。
+
+状态里的值是 deque（keyed_merge 为 dict），不支持切片与 list 的方法，
+字段按 Sequence / deque 标注，不要标成 list。
+
+序列化：状态值始终是 collections.deque / dict，LangGraph 的 checkpointer
+可以直接保存；从 checkpoint 恢复出的 deque 会丢失 maxlen，下一次合并时
+自动重新套上容量限制。需要普通列表（JSON 输出等）时用 as_list()。
+"""
+
+from collections import deque
+from itertools import islice
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+
+# 摘要条目的标记键
+SUMMARY_KEY = "__summary__"
+
+
+def _survivors(existing: Optional[Iterable], incoming: int, limit: int) -> Iterable:
+    """existing 中在追加 incoming 条之后仍会保留的部分（不复制被丢弃的条目）"""
+    existing = existing or ()
+    keep = max(0, limit - incoming)
+    return islice(existing, max(0, len(existing) - keep), None)
+
+
+def as_list(value: Optional[Iterable]) -> list:
+    """把 reducer 管理的值转成普通列表"""
+    return list(value or ())
+
+
+# ==========================================
+# 环形缓冲
+# ==========================================
+
+def bounded_append(limit: int) -> Callable[[Any, Any], deque]:
+    """创建固定容量的追加 reducer
+
+    Args:
+        limit: 最多保留的条目数
+    """
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+
+    def reducer(existing: Any, new: Any) -> deque:
+        if new is existing:
+            if isinstance(existing, deque) and existing.maxlen == limit:
+                return existing
+            new = ()
+        new = list(new or ())
+        buffer = deque(_survivors(existing, len(new), limit), maxlen=limit)
+        buffer.extend(new)
+        return buffer
+
+    return reducer
+
+
+# ==========================================
+# 去重追加
+# ==========================================
+
+def dedupe_append(
+    key: Optional[Callable[[Any], Hashable]] = None,
+    limit: Optional[int] = None
+) -> Callable[[Any, Any], deque]:
+    """创建按 key 去重的追加 reducer
+
+    Args:
+        key: 从条目中取去重键的函数，默认使用条目本身
+        limit: 最多保留的条目数；被挤出的条目可以再次加入
+    """
+    key = key or (lambda item: item)
+
+    def reducer(existing: Any, new: Any) -> deque:
+        buffer = deque(existing or (), maxlen=limit)
+        if new is existing:
+            return buffer
+
+        seen = {key(item) for item in buffer}
+        for item in new or ():
+            k = key(item)
+            if k in seen:
+                continue
+            if limit is not None and len(buffer) == limit:
+                seen.discard(key(buffer[0]))
+            buffer.append(item)
+            seen.add(k)
+        return buffer
+
+    return reducer
+
+
+# ==========================================
+# 按键合并
+# ==========================================
+
+def keyed_merge(key: str = "id") -> Callable[[Any, Any], dict]:
+    """创建按 key 合并的 reducer，状态值为 {key: item}
+
+    new 可以是条目列表，也可以是 {key: item} 字典；同 key 的条目整体覆盖。
+
+    Args:
+        key: 条目中作为主键的字段名（new 为列表时使用）
+    """
+    def reducer(existing: Any, new: Any) -> dict:
+        merged = dict(existing) if isinstance(existing, dict) else {}
+        if new is existing or not new:
+            return merged
+        if isinstance(new, dict):
+            merged.update(new)
+        else:
+            for item in new:
+                merged[item[key]] = item
+        return merged
+
+    return reducer
+
+
+# ==========================================
+# 窗口 + 摘要
+# ==========================================
+
+def _count_summary(previous: Optional[str], evicted: list) -> str:
+    """默认摘要：只记录被折叠的条目数"""
+    count = len(evicted)
+    if previous:
+        count += int(previous.split()[0])
+    return f"{count} earlier entries summarized"
+
+
+def is_summary(item: Any) -> bool:
+    """判断条目是否为 windowed_summary 生成的摘要"""
+    return isinstance(item, dict) and SUMMARY_KEY in item
+
+
+def windowed_summary(
+    window: int,
+    summarize: Callable[[Optional[str], list], str] = _count_summary
+) -> Callable[[Any, Any], deque]:
+    """创建"最近 window 条原文 + 一条滚动摘要"的 reducer
+
+    被挤出窗口的条目交给 summarize(上一版摘要, 被挤出的条目) 折叠，
+    摘要以 {SUMMARY_KEY: text} 的形式放在最前面。
+
+    Args:
+        window: 保留原文的条目数
+        summarize: 摘要函数，只处理被挤出的条目
+    """
+    if window <= 0:
+        raise ValueError("window must be positive")
+
+    def reducer(existing: Any, new: Any) -> deque:
+        buffer = deque(existing or ())
+        summary = buffer.popleft()[SUMMARY_KEY] if buffer and is_summary(buffer[0]) else None
+        if new is not existing:
+            buffer.extend(new or ())
+
+        evicted = [buffer.popleft() for _ in range(max(0, len(buffer) - window))]
+        if evicted:
+            summary = summarize(summary, evicted)
+        if summary is not None:
+            buffer.appendleft({SUMMARY_KEY: summary})
+        return buffer
+
+    return reducer
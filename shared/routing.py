@@ -0,0 +1,359 @@
+"""
+多提供商路由：对冲请求与故障转移
+================================
+
+Critic 轮次的尾延迟主要来自偶发的慢回复：大部分调用几秒返回，少数要
+几十秒。HedgedLLM 把同一个请求按顺序路由到多个提供商：
+
+1. 先发给主提供商
+2. 超过主提供商近期延迟的 p95 仍未返回时，向下一个提供商发出对冲请求，
+   取先返回的结果，放弃另一个
+3. 遇到 429 / 5xx / 连接错误时不等截止时间，立即转到下一个提供商
+   （get_llm 创建的路由会关闭前面几条路线的 SDK 重试，由路由负责转移）；
+   其他错误不再转移，但会等进行中的对冲请求结束，它成功时仍返回其结果
+
+同步调用在线程池中执行，落败的请求无法中断，只会被丢弃（结果不再使用）；
+异步调用（ainvoke）会真正取消落败的任务，底层 HTTP 请求随之关闭。
+两种方式都在放弃落败请求时记录一个截尾样本（已等待的时间，真实延迟只会更长），
+否则延迟样本里只有胜出的快请求，对冲截止时间会一路下滑、重复请求越来越多。
+
+用法：
+
+    llm = get_llm("azure", fallbacks=["openai"])
+    llm = HedgedLLM([get_llm("azure"), get_llm("anthropic")], names=["azure", "anthropic"])
+"""
+
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional, Sequence
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from .settings import get_settings
+from .singleflight import _model_identity
+
+
+# 样本不足时使用的对冲等待时间（秒）
+DEFAULT_HEDGE_DELAY = 10.0
+
+# 计算 p95 前至少需要的样本数
+MIN_LATENCY_SAMPLES = 20
+
+
+# ==========================================
+# 错误分类
+# ==========================================
+
+def is_retryable_error(error: BaseException) -> bool:
+    """429、5xx、超时和连接错误可以转到其他提供商重试"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # openai / anthropic SDK 的 APIConnectionError、APITimeoutError 没有状态码
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+# ==========================================
+# 延迟统计
+# ==========================================
+
+@dataclass
+class ProviderStats:
+    """单个提供商的延迟样本与路由计数"""
+    latencies: deque = field(default_factory=lambda: deque(maxlen=200))
+    calls: int = 0
+    wins: int = 0
+    errors: int = 0
+
+    def percentile(self, q: float) -> Optional[float]:
+        """最近样本的 q 分位数（q 取 0-1），样本不足时返回 None"""
+        if len(self.latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+@dataclass
+class _Attempt:
+    """发往某个提供商的一次请求；只记录一次（完成、失败或被放弃，取先发生的）"""
+    index: int
+    started: float = field(default_factory=time.monotonic)
+    recorded: bool = False
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_settings().runtime.hedge_executor_workers, thread_name_prefix="hedged-llm"
+            )
+        return _executor
+
+
+# ==========================================
+# 路由客户端
+# ==========================================
+
+class HedgedLLM(Runnable):
+    """按顺序路由到多个模型，支持对冲与故障转移
+
+    Args:
+        models: 候选模型（或任意 Runnable），第一个为主提供商
+        names: 各模型的名称，用于统计输出
+        hedge_percentile: 以主提供商延迟的哪个分位数作为对冲截止时间
+        default_delay: 样本不足时的对冲截止时间（秒）
+        min_delay: 截止时间下限，避免主提供商很快时频繁对冲
+    """
+
+    def __init__(
+        self,
+        models: Sequence[Runnable],
+        names: Optional[Sequence[str]] = None,
+        hedge_percentile: float = 0.95,
+        default_delay: float = DEFAULT_HEDGE_DELAY,
+        min_delay: float = 0.5,
+    ):
+        if not models:
+            raise ValueError("at least one model is required")
+        self.models = list(models)
+        self.names = list(names) if names else [type(m).__name__ for m in self.models]
+        self.hedge_percentile = hedge_percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.stats = {name: ProviderStats() for name in self.names}
+        self._counters = {"hedges": 0, "failovers": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def hedges(self) -> int:
+        return self._counters["hedges"]
+
+    @property
+    def failovers(self) -> int:
+        return self._counters["failovers"]
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _derive(self, models: Sequence[Runnable]) -> "HedgedLLM":
+        """以相同的路由参数包装另一组模型（共享统计）"""
+        routed = HedgedLLM(
+            models, self.names, self.hedge_percentile, self.default_delay, self.min_delay
+        )
+        routed.stats, routed._counters, routed._lock = self.stats, self._counters, self._lock
+        return routed
+
+    def _get_llm_string(self) -> str:
+        """稳定的模型指纹（各路线指纹的组合），供 CoalescingLLM 生成合并 key"""
+        return "HedgedLLM(" + ", ".join(_model_identity(model) for model in self.models) + ")"
+
+    def hedge_delay(self) -> float:
+        """发出对冲请求前等待主提供商的时间"""
+        with self._lock:
+            p = self.stats[self.names[0]].percentile(self.hedge_percentile)
+        return max(self.min_delay, p if p is not None else self.default_delay)
+
+    def _record(self, index: int, latency: Optional[float] = None, error: bool = False) -> None:
+        with self._lock:
+            stats = self.stats[self.names[index]]
+            stats.calls += 1
+            if error:
+                stats.errors += 1
+            elif latency is not None:
+                stats.latencies.append(latency)
+
+    def _finish(self, attempt: _Attempt, error: bool = False) -> None:
+        """记录一次请求的结果；被放弃的请求记录截至此刻的耗时（截尾样本）"""
+        with self._lock:
+            if attempt.recorded:
+                return
+            attempt.recorded = True
+        self._record(attempt.index, time.monotonic() - attempt.started, error)
+
+    def _won(self, index: int) -> None:
+        with self._lock:
+            self.stats[self.names[index]].wins += 1
+
+    def _call(self, attempt: _Attempt, input: Any, config: Optional[RunnableConfig], kwargs: dict) -> Any:
+        try:
+            result = self.models[attempt.index].invoke(input, config, **kwargs)
+        except Exception:
+            self._finish(attempt, error=True)
+            raise
+        self._finish(attempt)
+        return result
+
+    async def _acall(self, attempt: _Attempt, input: Any, config: Optional[RunnableConfig], kwargs: dict) -> Any:
+        try:
+            result = await self.models[attempt.index].ainvoke(input, config, **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._finish(attempt, error=True)
+            raise
+        self._finish(attempt)
+        return result
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        executor = _get_executor()
+        pending: dict = {}
+        launched = 0
+        last_error: Optional[Exception] = None
+        fatal: Optional[Exception] = None
+
+        def launch() -> float:
+            nonlocal launched
+            attempt = _Attempt(launched)
+            # 复制上下文，回调与 LangGraph 配置随调用一起进入工作线程
+            ctx = contextvars.copy_context()
+            pending[executor.submit(ctx.run, self._call, attempt, input, config, kwargs)] = attempt
+            launched += 1
+            return time.monotonic() + self.hedge_delay()
+
+        deadline = launch()
+        try:
+            while pending:
+                can_hedge = fatal is None and launched < len(self.models)
+                timeout = max(0.0, deadline - time.monotonic()) if can_hedge else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    self._count("hedges")
+                    deadline = launch()
+                    continue
+
+                for future in done:
+                    attempt = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        if not is_retryable_error(e):
+                            # 不再转移，等进行中的请求结束后再抛出
+                            fatal = fatal or e
+                        else:
+                            last_error = e
+                            if fatal is None and launched < len(self.models):
+                                self._count("failovers")
+                                deadline = launch()
+                        continue
+                    self._won(attempt.index)
+                    return result
+        finally:
+            # 尚未开始的请求可以取消；已在执行的只能丢弃结果
+            for future, attempt in pending.items():
+                future.cancel()
+                self._finish(attempt)
+        raise fatal or last_error
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        pending: dict = {}
+        launched = 0
+        last_error: Optional[Exception] = None
+        fatal: Optional[Exception] = None
+
+        def launch() -> float:
+            nonlocal launched
+            attempt = _Attempt(launched)
+            pending[asyncio.ensure_future(self._acall(attempt, input, config, kwargs))] = attempt
+            launched += 1
+            return time.monotonic() + self.hedge_delay()
+
+        deadline = launch()
+        try:
+            while pending:
+                can_hedge = fatal is None and launched < len(self.models)
+                timeout = max(0.0, deadline - time.monotonic()) if can_hedge else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self._count("hedges")
+                    deadline = launch()
+                    continue
+
+                for task in done:
+                    attempt = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        if not is_retryable_error(e):
+                            # 不再转移，等进行中的请求结束后再抛出
+                            fatal = fatal or e
+                        else:
+                            last_error = e
+                            if fatal is None and launched < len(self.models):
+                                self._count("failovers")
+                                deadline = launch()
+                        continue
+                    self._won(attempt.index)
+                    return result
+        finally:
+            for task, attempt in pending.items():
+                task.cancel()
+                self._finish(attempt)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        raise fatal or last_error
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator:
+        """流式调用不做对冲：第一个块到达之前出错则转到下一个提供商"""
+        last_error: Optional[Exception] = None
+        for index, model in enumerate(self.models):
+            started = False
+            try:
+                for chunk in model.stream(input, config, **kwargs):
+                    started = True
+                    yield chunk
+                self._won(index)
+                return
+            except Exception as e:
+                if started or not is_retryable_error(e):
+                    raise
+                self._record(index, error=True)
+                last_error = e
+                self._count("failovers")
+        raise last_error
+
+    def with_structured_output(self, schema, **kwargs) -> "HedgedLLM":
+        """对每个模型分别启用结构化输出，未指定 method 时按提供商选择"""
+        from .llm_providers import get_structured_output_method
+
+        structured = []
+        for model in self.models:
+            model_kwargs = dict(kwargs)
+            if not model_kwargs.get("method"):
+                method = get_structured_output_method(model)
+                if method:
+                    model_kwargs["method"] = method
+                else:
+                    model_kwargs.pop("method", None)
+            structured.append(model.with_structured_output(schema, **model_kwargs))
+        return self._derive(structured)
+
+    def bind_tools(self, tools, **kwargs) -> "HedgedLLM":
+        return self._derive([model.bind_tools(tools, **kwargs) for model in self.models])
+
+    def report(self) -> str:
+        """路由统计摘要"""
+        lines = [f"hedges {self.hedges}, failovers {self.failovers}, hedge delay {self.hedge_delay():.2f}s"]
+        for name, stats in self.stats.items():
+            p95 = stats.percentile(0.95)
+            p95_text = f"{p95:.2f}s" if p95 is not None else "n/a"
+            lines.append(
+                f"{name}: {stats.calls} calls, {stats.wins} wins, {stats.errors} errors, p95 {p95_text}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,337 @@
+"""
+类型化配置
+==========
+
+所有性能相关的开关集中在一个经过校验的 Settings 对象里，按用途分节：
+
+- llm: 提供商、模型、配额
+- observability: 链路追踪、指标、剖析
+- runtime: 进程池、对冲请求线程池、限流突发等共享组件
+- multi_critic / critic_agent: 各工作流的迭代次数、阈值、并发与超时
+
+取值优先级（高到低）：
+1. 嵌套环境变量，例如 MULTI_CRITIC__MAX_ITERATIONS=4
+2. 旧的扁平环境变量（OPENAI_API_KEY、MAX_ITERATIONS 等，见 LEGACY_ENV）
+3. 配置文件（SETTINGS_FILE，默认 settings.toml；也支持 .json），可热加载
+4. 字段默认值
+
+读取很便宜：get_settings() 返回当前的不可变对象，最多每 RELOAD_CHECK_INTERVAL
+秒检查一次配置文件的修改时间，文件变化时重新加载；新配置校验失败时保留旧配置。
+调用方每次使用时读取 get_settings().xxx 即可拿到最新值：
+
+    settings = get_settings()
+    if state["iteration"] >= settings.multi_critic.max_iterations:
+        ...
+
+进程池大小、状态里的列表上限等在创建时就确定的值，修改后需要重启才生效。
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Literal, Optional
+
+from dotenv import load_dotenv
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+from pydantic_settings import BaseSettings, PydanticBaseSettingsSource, SettingsConfigDict
+
+load_dotenv()
+
+
+# 配置文件变化的最短检查间隔（秒）
+RELOAD_CHECK_INTERVAL = 2.0
+
+DEFAULT_SETTINGS_FILE = "settings.toml"
+
+
+# ==========================================
+# 配置分节
+# ==========================================
+
+class _Section(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+
+class LLMSettings(_Section):
+    """LLM 提供商"""
+    openai_api_key: str = ""
+    openai_model: str = "gpt-4"
+    temperature: float = Field(0.0, ge=0, le=2)
+    anthropic_api_key: str = ""
+    azure_api_key: str = ""
+    azure_endpoint: str = ""
+    azure_deployment: str = ""
+    azure_api_version: str = "2024-02-01"
+    requests_per_minute: int = Field(0, ge=0, description="每个部署的请求配额，0 表示不限")
+    tokens_per_minute: int = Field(0, ge=0, description="每个部署的 token 配额，0 表示不限")
+    fallback_providers: list[str] = Field(default_factory=list)
+
+    @field_validator("fallback_providers", mode="before")
+    @classmethod
+    def _split(cls, value):
+        if isinstance(value, str):
+            return [p.strip() for p in value.split(",") if p.strip()]
+        return value
+
+
+class ObservabilitySettings(_Section):
+    """追踪、指标与剖析"""
+    langchain_tracing_v2: str = "false"
+    langchain_api_key: str = ""
+    langchain_project: str = "multiagent-tutorial"
+    trace_exporter: Literal["", "console", "file"] = ""
+    trace_file: str = "traces.jsonl"
+    metrics_file: str = ""
+    profile_node: str = ""
+    profile_invocations: int = Field(20, ge=1)
+    profile_backend: Literal["cprofile", "pyinstrument"] = "cprofile"
+
+
+class RuntimeSettings(_Section):
+    """共享组件的线程池 / 进程池与限流参数"""
+    process_pool_workers: Optional[int] = Field(None, ge=1, description="默认 CPU 核数")
+    hedge_executor_workers: int = Field(32, ge=1)
+    hedge_percentile: float = Field(0.95, gt=0, lt=1)
+    hedge_default_delay: float = Field(10.0, gt=0)
+    hedge_min_delay: float = Field(0.5, ge=0)
+    rate_limit_burst_seconds: float = Field(10.0, gt=0)
+
+
+class VetoRule(_Section):
+    """Critic 的一票否决条件（满足任一即否决）"""
+    max_score: Optional[float] = Field(None, ge=0, le=10, description="分数不高于此值时否决")
+    risk_levels: list[str] = Field(default_factory=list, description="命中这些 risk_level 时否决")
+
+
+class MultiCriticSettings(_Section):
+    """01_langgraph 多 Critic 系统"""
+    max_iterations: int = Field(3, ge=1)
+    pass_threshold: float = Field(7.0, ge=0, le=10)
+    require_human_review: bool = False
+    human_review_threshold: float = Field(6.0, ge=0, le=10)
+    critic_weights: dict[str, float] = Field(
+        default_factory=lambda: {"Code Quality": 0.4, "Security": 0.35, "Style": 0.25},
+        description="Critic 显示名 -> 聚合权重",
+    )
+    default_critic_weight: float = Field(0.33, gt=0, description="未配置权重的 Critic")
+    conflict_score_range: Optional[float] = Field(3.0, ge=0, description="Critic 最高分与最低分之差超过此值视为冲突")
+    conflict_score_std: Optional[float] = Field(None, ge=0, description="Critic 分数标准差超过此值视为冲突")
+    prompt_token_budget: int = Field(4000, ge=256, description="Writer 单次提示词的 token 上限")
+    writer_candidates: int = Field(1, ge=1, le=8, description="大于 1 时并行生成多个候选，静态检查选优")
+    writer_temperatures: list[float] = Field(default_factory=lambda: [0.3, 0.7, 1.0], min_length=1)
+    revision_history_limit: int = Field(20, ge=1, description="需重启生效")
+    review_rounds_limit: int = Field(10, ge=1, description="需重启生效")
+    max_concurrency: Optional[int] = Field(None, ge=1, description="同时执行的节点数，默认不限")
+    step_timeout_seconds: Optional[float] = Field(300.0, gt=0, description="单个超步的超时")
+    early_exit: bool = Field(True, description="出现否决结果时取消其余进行中的 Critic")
+    adaptive_critics: bool = Field(True, description="修订后只重跑结论可能改变的 Critic")
+    diff_review: bool = Field(False, description="第二轮起 Critic 只看 unified diff 和上一轮结论")
+    diff_context_lines: int = Field(3, ge=0, description="diff 中每处改动保留的上下文行数")
+    veto_rules: dict[str, VetoRule] = Field(
+        default_factory=lambda: {"security_critic": VetoRule(risk_levels=["critical"])},
+        description="Critic 名 -> 否决条件",
+    )
+
+
+class CriticAgentSettings(_Section):
+    """05_critic_agent 工作流"""
+    max_iterations: int = Field(3, ge=1)
+    adaptive_critics: bool = Field(True, description="层级工作流修订后只重跑受影响的 Critic")
+    chunk_max_tokens: int = Field(1500, ge=200, description="分片评审时每个代码片段的 token 上限")
+    chunk_concurrency: int = Field(4, ge=1, description="同时评审的片段数")
+    repo_index_file: str = Field(".critic_review_index.sqlite", description="仓库评审索引（相对仓库根目录）")
+    repo_file_concurrency: int = Field(4, ge=1, description="仓库评审时同时评审的文件数")
+    repo_max_file_bytes: int = Field(1_000_000, ge=1, description="超过此大小的文件不评审")
+    diff_context_lines: int = Field(10, ge=0, description="git diff 评审时改动前后附带的上下文行数")
+    max_concurrency: Optional[int] = Field(None, ge=1)
+    step_timeout_seconds: Optional[float] = Field(300.0, gt=0)
+
+
+# ==========================================
+# 旧环境变量
+# ==========================================
+
+# 旧的扁平环境变量 / Config 属性 -> 对应的配置字段（可以有多个）
+# TIMEOUT_SECONDS 是单次请求的超时，不映射到超步超时 step_timeout_seconds
+LEGACY_ENV: dict[str, tuple[str, ...]] = {
+    "OPENAI_API_KEY": ("llm.openai_api_key",),
+    "OPENAI_MODEL": ("llm.openai_model",),
+    "OPENAI_TEMPERATURE": ("llm.temperature",),
+    "ANTHROPIC_API_KEY": ("llm.anthropic_api_key",),
+    "AZURE_OPENAI_API_KEY": ("llm.azure_api_key",),
+    "AZURE_OPENAI_ENDPOINT": ("llm.azure_endpoint",),
+    "AZURE_OPENAI_DEPLOYMENT": ("llm.azure_deployment",),
+    "AZURE_OPENAI_API_VERSION": ("llm.azure_api_version",),
+    "LLM_REQUESTS_PER_MINUTE": ("llm.requests_per_minute",),
+    "LLM_TOKENS_PER_MINUTE": ("llm.tokens_per_minute",),
+    "LLM_FALLBACK_PROVIDERS": ("llm.fallback_providers",),
+    "LANGCHAIN_TRACING_V2": ("observability.langchain_tracing_v2",),
+    "LANGCHAIN_API_KEY": ("observability.langchain_api_key",),
+    "LANGCHAIN_PROJECT": ("observability.langchain_project",),
+    "TRACE_EXPORTER": ("observability.trace_exporter",),
+    "TRACE_FILE": ("observability.trace_file",),
+    "METRICS_FILE": ("observability.metrics_file",),
+    "PROFILE_NODE": ("observability.profile_node",),
+    "PROFILE_INVOCATIONS": ("observability.profile_invocations",),
+    "PROFILE_BACKEND": ("observability.profile_backend",),
+    "MAX_ITERATIONS": ("multi_critic.max_iterations", "critic_agent.max_iterations"),
+}
+
+
+class _LegacyEnvSource(PydanticBaseSettingsSource):
+    """把旧的扁平环境变量映射到分节字段"""
+
+    def get_field_value(self, field, field_name):  # 整体由 __call__ 提供
+        return None, field_name, False
+
+    def __call__(self) -> dict[str, Any]:
+        data: dict[str, dict] = {}
+        for env, paths in LEGACY_ENV.items():
+            value = os.environ.get(env)
+            if value is None:
+                continue
+            for path in paths:
+                section, name = path.split(".")
+                data.setdefault(section, {})[name] = value
+        return data
+
+
+class _FileSource(PydanticBaseSettingsSource):
+    """TOML / JSON 配置文件"""
+
+    def get_field_value(self, field, field_name):
+        return None, field_name, False
+
+    def __call__(self) -> dict[str, Any]:
+        path = _settings_path
+        if not path or not os.path.exists(path):
+            return {}
+        if path.endswith(".json"):
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        try:
+            import tomllib
+        except ImportError:  # Python 3.10
+            import tomli as tomllib
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+
+
+class Settings(BaseSettings):
+    """全部配置"""
+    model_config = SettingsConfigDict(env_nested_delimiter="__", extra="ignore", frozen=True)
+
+    llm: LLMSettings = Field(default_factory=LLMSettings)
+    observability: ObservabilitySettings = Field(default_factory=ObservabilitySettings)
+    runtime: RuntimeSettings = Field(default_factory=RuntimeSettings)
+    multi_critic: MultiCriticSettings = Field(default_factory=MultiCriticSettings)
+    critic_agent: CriticAgentSettings = Field(default_factory=CriticAgentSettings)
+
+    @classmethod
+    def settings_customise_sources(
+        cls, settings_cls, init_settings, env_settings, dotenv_settings, file_secret_settings
+    ):
+        return (
+            init_settings,
+            env_settings,
+            _LegacyEnvSource(settings_cls),
+            _FileSource(settings_cls),
+        )
+
+    def legacy_value(self, name: str) -> Any:
+        """按旧的 Config 属性名取值"""
+        paths = LEGACY_ENV.get(name)
+        if not paths:
+            raise AttributeError(name)
+        section, field = paths[0].split(".")
+        return getattr(getattr(self, section), field)
+
+
+# ==========================================
+# 加载与热更新
+# ==========================================
+
+_current: Optional[Settings] = None
+_settings_path: Optional[str] = os.environ.get("SETTINGS_FILE", DEFAULT_SETTINGS_FILE)
+_overrides: dict = {}
+_mtime: Optional[float] = None
+_next_check = 0.0
+_listeners: list[Callable[[Settings], None]] = []
+_lock = threading.Lock()
+
+
+def _file_mtime() -> Optional[float]:
+    try:
+        return os.stat(_settings_path).st_mtime if _settings_path else None
+    except OSError:
+        return None
+
+
+def reload_settings(path: Optional[str] = None, **overrides) -> Settings:
+    """重新加载配置
+
+    Args:
+        path: 换用的配置文件；None 表示沿用当前文件
+        **overrides: 优先级最高的分节取值，例如 multi_critic={"max_iterations": 1}；
+            会一直保留到下次显式调用 reload_settings
+
+    Returns:
+        新的配置
+
+    Raises:
+        ValidationError: 配置不合法（已有的配置保持不变）
+    """
+    global _current, _settings_path, _overrides, _mtime, _next_check
+    with _lock:
+        if path is not None:
+            _settings_path = path
+        _overrides = overrides
+        _mtime = _file_mtime()
+        _next_check = time.monotonic() + RELOAD_CHECK_INTERVAL
+        _current = Settings(**_overrides)
+        settings = _current
+    for listener in list(_listeners):
+        listener(settings)
+    return settings
+
+
+def get_settings() -> Settings:
+    """当前配置；配置文件修改后自动重新加载"""
+    global _mtime, _next_check
+    if _current is None:
+        return reload_settings()
+    if time.monotonic() < _next_check:
+        return _current
+    with _lock:
+        _next_check = time.monotonic() + RELOAD_CHECK_INTERVAL
+        mtime = _file_mtime()
+        changed = mtime != _mtime
+        _mtime = mtime
+    if changed:
+        try:
+            return reload_settings(**_overrides)
+        except (ValidationError, ValueError) as e:
+            print(f"⚠️ Invalid settings in {_settings_path}, keeping previous values: {e}")
+    return _current
+
+
+def on_settings_reload(callback: Callable[[Settings], None]) -> None:
+    """注册配置重新加载后的回调（用于重建依赖配置的对象）"""
+    _listeners.append(callback)
+
+
+def apply_graph_settings(app, section):
+    """把工作流分节的并发与超时设置应用到编译好的图
+
+    Args:
+        app: workflow.compile() 的结果
+        section: 含 max_concurrency / step_timeout_seconds 的配置分节
+
+    Returns:
+        设置后的图（max_concurrency 通过 with_config 绑定，返回的是副本）
+    """
+    if section.max_concurrency:
+        app = app.with_config(max_concurrency=section.max_concurrency)
+    app.step_timeout = section.step_timeout_seconds
+    return app
@@ -0,0 +1,217 @@
+"""
+并发请求合并（single-flight）
+=============================
+
+批量评审时，多个评审经常在同一时刻发出逐字节相同的 Critic 提示词
+（同一份生成代码、同一个 Critic），每个都会单独请求 API。
+
+SingleFlight 让同一 key 的并发调用共享一次执行：第一个调用方（leader）
+真正执行，其余调用方等待并拿到同一个结果；执行出错时所有等待者收到同一个
+异常。异步调用在独立的任务中执行，某个调用方（包括 leader）被取消不影响
+其他调用方；所有调用方都取消时才取消执行。调用结束后 key 立即释放，不保留结果——这不是缓存，只覆盖第一个
+响应返回之前的那段时间窗口。
+
+CoalescingLLM 把它接到 LangChain 模型上，key 由模型参数和输入消息决定：
+
+    llm = get_llm("azure", coalesce=True)
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from langchain_core.load import dumps
+from langchain_core.runnables import Runnable, RunnableConfig
+
+
+@dataclass
+class SingleFlightStats:
+    """合并统计"""
+    calls: int = 0
+    executed: int = 0
+    coalesced: int = 0
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class _AsyncCall:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按 key 合并并发调用，线程与 asyncio 均可使用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._async_calls: dict[tuple, _AsyncCall] = {}
+        self.stats = SingleFlightStats()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> tuple[Any, bool]:
+        """执行 fn，或等待同 key 正在进行的调用
+
+        Returns:
+            (结果, 是否共享了别人的调用)
+        """
+        with self._lock:
+            self.stats.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats.executed += 1
+            else:
+                self.stats.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """do 的异步版本，只合并同一事件循环内的调用
+
+        fn 在独立的任务中执行，不属于任何一个调用方：调用方被取消时只有它自己
+        收到 CancelledError，最后一个调用方取消时才取消执行。
+        """
+        loop = asyncio.get_running_loop()
+        loop_key = (id(loop), key)
+        with self._lock:
+            self.stats.calls += 1
+            call = self._async_calls.get(loop_key)
+            leader = call is None
+            if leader:
+                call = self._async_calls[loop_key] = _AsyncCall(asyncio.ensure_future(fn()))
+                call.task.add_done_callback(lambda task: self._release(loop_key, call))
+                self.stats.executed += 1
+            else:
+                self.stats.coalesced += 1
+            call.waiters += 1
+
+        try:
+            result = await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+        return result, not leader
+
+    def _release(self, loop_key: tuple, call: _AsyncCall) -> None:
+        with self._lock:
+            if self._async_calls.get(loop_key) is call:
+                del self._async_calls[loop_key]
+        # 没有等待者时避免 "exception was never retrieved" 警告
+        if not call.task.cancelled():
+            call.task.exception()
+
+
+# ==========================================
+# LangChain 接入
+# ==========================================
+
+def _model_identity(runnable: Runnable) -> str:
+    """模型参数指纹：参数相同的模型实例视为同一个调用目标"""
+    get_llm_string = getattr(runnable, "_get_llm_string", None)
+    if get_llm_string is not None:
+        try:
+            return get_llm_string()
+        except Exception:
+            pass
+    return f"{type(runnable).__qualname__}@{id(runnable)}"
+
+
+def _fingerprint(*parts: Any) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        try:
+            text = dumps(part)
+        except Exception:
+            text = json.dumps(part, sort_keys=True, default=repr)
+        digest.update(text.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class CoalescingLLM(Runnable):
+    """合并相同输入的并发模型调用
+
+    结果由 leader 原样返回，等待者拿到深拷贝，避免多个节点共享同一个可变对象。
+
+    Args:
+        model: 被包装的模型（或任意 Runnable）
+        group: 共享的 SingleFlight，默认新建
+    """
+
+    def __init__(self, model: Runnable, group: Optional[SingleFlight] = None, identity: Optional[str] = None):
+        self.model = model
+        self.group = group or SingleFlight()
+        self.identity = identity or _model_identity(model)
+
+    @property
+    def stats(self) -> SingleFlightStats:
+        return self.group.stats
+
+    def _derive(self, model: Runnable, *extra: Any) -> "CoalescingLLM":
+        return CoalescingLLM(model, self.group, _fingerprint(self.identity, *extra))
+
+    def _key(self, input: Any, kwargs: dict) -> str:
+        return _fingerprint(self.identity, input, kwargs)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        result, shared = self.group.do(
+            self._key(input, kwargs), lambda: self.model.invoke(input, config, **kwargs)
+        )
+        return copy.deepcopy(result) if shared else result
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        result, shared = await self.group.ado(
+            self._key(input, kwargs), lambda: self.model.ainvoke(input, config, **kwargs)
+        )
+        return copy.deepcopy(result) if shared else result
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any):
+        # 流式输出逐块消费，无法共享
+        return self.model.stream(input, config, **kwargs)
+
+    def with_structured_output(self, schema, **kwargs) -> "CoalescingLLM":
+        from .llm_providers import get_structured_output_method
+
+        if not kwargs.get("method"):
+            kwargs.pop("method", None)
+            method = get_structured_output_method(self.model)
+            if method:
+                kwargs["method"] = method
+        schema_key = schema.model_json_schema() if hasattr(schema, "model_json_schema") else schema
+        return self._derive(
+            self.model.with_structured_output(schema, **kwargs), "structured", schema_key, kwargs
+        )
+
+    def bind_tools(self, tools, **kwargs) -> "CoalescingLLM":
+        return self._derive(self.model.bind_tools(tools, **kwargs), "tools", tools, kwargs)
@@ -0,0 +1,84 @@
+"""
+Token 计数
+==========
+
+安装了 tiktoken 且编码文件可用时使用对应模型的真实编码；否则按字符估算
+（英文/代码约 4 字符 1 token，中日韩字符约 1 字符 1 token）。
+估算值只用于预算控制和报表，不用于计费。
+"""
+
+from functools import lru_cache
+from typing import Iterable, Optional
+
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# 每条 chat 消息的固定开销（role、分隔符）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=16)
+def _get_encoding(model: Optional[str]):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(DEFAULT_ENCODING)
+        except KeyError:
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception:
+        # 编码文件需要联网下载，离线时退回估算
+        return None
+
+
+def _estimate(text: str) -> int:
+    wide = sum(1 for ch in text if ord(ch) > 0x2E7F)
+    return (len(text) - wide + 3) // 4 + wide
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """统计文本的 token 数"""
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return _estimate(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: Iterable, model: Optional[str] = None) -> int:
+    """统计一组 chat 消息的 token 数
+
+    消息可以是 LangChain BaseMessage、(role, content) 元组或纯字符串。
+    """
+    total = 0
+    for message in messages:
+        if isinstance(message, str):
+            content = message
+        elif isinstance(message, tuple):
+            content = message[1]
+        else:
+            content = message.content
+        if not isinstance(content, str):
+            content = str(content)
+        total += count_tokens(content, model) + MESSAGE_OVERHEAD_TOKENS
+    return total
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """把文本截断到不超过 max_tokens，截断处追加省略标记"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    marker = "\n...[truncated]"
+    budget = max_tokens - count_tokens(marker, model)
+    if budget <= 0:
+        return ""
+    end = len(text) * budget // max(count_tokens(text, model), 1)
+    while end > 0 and count_tokens(text[:end], model) > budget:
+        end = end * 9 // 10
+    return text[:end] + marker
@@ -0,0 +1,323 @@
+"""
+OpenTelemetry 链路追踪
+======================
+
+为每个 LangGraph 节点和每次 LLM 调用创建 span：
+
+- 节点 span（node:<名称>）：iteration、输入状态大小、返回更新的大小
+- LLM span（llm:<模型>）：挂在所在节点的 span 下，记录 token 数与迭代轮次
+
+一轮评审里并行的 Critic 各自是一个 span，span 的起止时间即可看出关键路径；
+critical_path() 直接从导出的 span 中算出来。
+
+用法：
+
+    configure_tracing("file", "traces.jsonl")   # 或 "console"
+    workflow = TracedStateGraph(MyState)        # 代替 StateGraph，add_node 自动包装
+    with trace_run("review"):                   # 一次运行归为一条 trace
+        app.invoke(state)
+
+未安装 opentelemetry 或未调用 configure_tracing 时，所有包装都是直通的，
+不计算状态大小，也不产生额外开销。
+"""
+
+import functools
+import inspect
+import json
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import Runnable
+from langgraph.graph import StateGraph
+
+from .metrics import timed_node
+from .profiling import profiled_node
+from .usage import current_labels
+
+try:
+    from opentelemetry import trace
+except ImportError:  # pragma: no cover - 可选依赖
+    trace = None
+
+
+TRACER_NAME = "multiagent-tutorial"
+
+_enabled = False
+
+
+def tracing_enabled() -> bool:
+    """是否已通过 configure_tracing 启用追踪"""
+    return _enabled
+
+
+def configure_tracing(exporter: Optional[str] = "console", path: str = "traces.jsonl") -> bool:
+    """配置全局 TracerProvider
+
+    Args:
+        exporter: "console" 输出到终端，"file" 每行一个 span 写入 path，None / "" 不启用
+        path: file 导出器的输出文件
+
+    Returns:
+        是否成功启用（缺少 opentelemetry-sdk 时返回 False）
+    """
+    global _enabled
+    if not exporter:
+        return False
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter, SimpleSpanProcessor
+    except ImportError:
+        print("⚠️ opentelemetry-sdk not installed, tracing disabled")
+        return False
+
+    if exporter == "console":
+        span_exporter = ConsoleSpanExporter()
+    elif exporter == "file":
+        span_exporter = ConsoleSpanExporter(
+            out=open(path, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+    else:
+        raise ValueError(f"Unknown trace exporter: {exporter}")
+
+    provider = TracerProvider(resource=Resource.create({"service.name": TRACER_NAME}))
+    provider.add_span_processor(SimpleSpanProcessor(span_exporter))
+    trace.set_tracer_provider(provider)
+    _enabled = True
+    return True
+
+
+def _tracer():
+    return trace.get_tracer(TRACER_NAME)
+
+
+def _size(value: Any) -> int:
+    """状态的近似大小（序列化后的字符数）"""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+
+@contextmanager
+def trace_run(name: str) -> Iterator[None]:
+    """为一次图运行创建根 span，运行中所有节点 / LLM span 归到同一条 trace"""
+    if trace is None or not _enabled:
+        yield
+        return
+    with _tracer().start_as_current_span(f"run:{name}"):
+        yield
+
+
+# ==========================================
+# 节点 span
+# ==========================================
+
+def _start_node_span(name: str, state: Any):
+    span = _tracer().start_span(f"node:{name}")
+    if span.is_recording():
+        span.set_attribute("langgraph.node", name)
+        if isinstance(state, dict):
+            if isinstance(state.get("iteration"), int):
+                span.set_attribute("iteration", state["iteration"])
+            span.set_attribute("state.keys", len(state))
+        span.set_attribute("state.size", _size(state))
+    return span
+
+
+def _end_node_span(span, update: Any = None, error: Optional[BaseException] = None) -> None:
+    if span.is_recording():
+        if error is not None:
+            span.record_exception(error)
+            span.set_status(trace.Status(trace.StatusCode.ERROR, str(error)))
+        elif update is not None:
+            span.set_attribute("update.size", _size(update))
+    span.end()
+
+
+def traced_node(name: str, fn: Callable) -> Callable:
+    """用 span 包装节点函数（同步或异步），签名保持不变"""
+    if trace is None:
+        return fn
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state, *args, **kwargs):
+            if not _enabled:
+                return await fn(state, *args, **kwargs)
+            span = _start_node_span(name, state)
+            with trace.use_span(span, end_on_exit=False):
+                try:
+                    update = await fn(state, *args, **kwargs)
+                except BaseException as e:
+                    _end_node_span(span, error=e)
+                    raise
+            _end_node_span(span, update)
+            return update
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state, *args, **kwargs):
+        if not _enabled:
+            return fn(state, *args, **kwargs)
+        span = _start_node_span(name, state)
+        with trace.use_span(span, end_on_exit=False):
+            try:
+                update = fn(state, *args, **kwargs)
+            except BaseException as e:
+                _end_node_span(span, error=e)
+                raise
+        _end_node_span(span, update)
+        return update
+    return wrapper
+
+
+class TracedStateGraph(StateGraph):
+    """add_node 时自动为节点函数加 span、记录延迟指标的 StateGraph
+
+    节点耗时记入 shared.metrics 的全局注册表，键为 (name, 节点名)；
+    enable_node_profiling 开启剖析的节点在剖析器下执行。
+    编译好的子图等 Runnable 保持原样（其内部节点由子图自己追踪）。
+
+    Args:
+        name: 指标中的图名，默认为状态类型名
+    """
+
+    def __init__(self, state_schema, *args, name: Optional[str] = None, **kwargs):
+        super().__init__(state_schema, *args, **kwargs)
+        self.graph_name = name or getattr(state_schema, "__name__", "graph")
+
+    def add_node(self, node, action=None, **kwargs):
+        if action is None and callable(node) and not isinstance(node, str):
+            name = getattr(node, "__name__", None) or node.__class__.__name__
+            action, node = node, name
+        if callable(action) and not isinstance(action, Runnable):
+            action = profiled_node(self.graph_name, node, action)
+            action = timed_node(self.graph_name, node, action)
+            action = traced_node(node, action)
+        return super().add_node(node, action, **kwargs)
+
+
+# ==========================================
+# LLM span
+# ==========================================
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """为每次 Chat Model 调用创建 span，父 span 为调用所在的节点"""
+
+    def __init__(self):
+        self._spans: dict[UUID, Any] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs: Any
+    ) -> None:
+        if not _enabled:
+            return
+        metadata = metadata or {}
+        model = metadata.get("ls_model_name") or "unknown"
+        span = _tracer().start_span(f"llm:{model}")
+        if span.is_recording():
+            span.set_attribute("llm.model", model)
+            span.set_attribute("llm.messages", sum(len(batch) for batch in messages))
+            if metadata.get("langgraph_node"):
+                span.set_attribute("langgraph.node", metadata["langgraph_node"])
+            iteration = current_labels().get("iteration", metadata.get("iteration"))
+            if isinstance(iteration, int):
+                span.set_attribute("iteration", iteration)
+        with self._lock:
+            self._spans[run_id] = span
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        if span.is_recording():
+            for generations in response.generations:
+                for generation in generations:
+                    usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                    if usage:
+                        span.set_attribute("llm.prompt_tokens", usage.get("input_tokens", 0))
+                        span.set_attribute("llm.completion_tokens", usage.get("output_tokens", 0))
+                        break
+        span.end()
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        span.record_exception(error)
+        span.set_status(trace.Status(trace.StatusCode.ERROR, str(error)))
+        span.end()
+
+
+# ==========================================
+# 关键路径
+# ==========================================
+
+def load_spans(path: str) -> list[dict]:
+    """读取 file 导出器写出的 span（每行一个 JSON）"""
+    from datetime import datetime
+
+    def ts(value: str) -> float:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            raw = json.loads(line)
+            spans.append({
+                "name": raw["name"],
+                "trace_id": raw["context"]["trace_id"],
+                "start": ts(raw["start_time"]),
+                "end": ts(raw["end_time"]),
+                "attributes": raw.get("attributes", {}),
+            })
+    return spans
+
+
+def critical_path(spans: Iterable[dict]) -> list[dict]:
+    """节点 span 的关键路径
+
+    从最后结束的节点往回走，每一步选择在它开始之前最后结束的节点：
+    并行的 Critic 中最慢的那个会落在路径上。
+
+    Args:
+        spans: 含 name / start / end 的 span（只取 node: 开头的）
+    """
+    nodes = sorted((s for s in spans if s["name"].startswith("node:")), key=lambda s: s["end"])
+    if not nodes:
+        return []
+    path = [nodes[-1]]
+    while True:
+        current = path[-1]
+        before = [s for s in nodes if s["end"] <= current["start"]]
+        if not before:
+            break
+        path.append(before[-1])
+    return list(reversed(path))
+
+
+def format_critical_path(path: list[dict]) -> str:
+    """格式化关键路径"""
+    if not path:
+        return "(no node spans)"
+    origin = path[0]["start"]
+    total = path[-1]["end"] - origin
+    lines = []
+    for span in path:
+        duration = span["end"] - span["start"]
+        share = duration / total if total else 0.0
+        lines.append(
+            f"  +{span['start'] - origin:7.3f}s  {span['name']:<28} {duration:7.3f}s ({share:.0%})"
+        )
+    lines.append(f"  total {total:.3f}s")
+    return "\n".join(lines)
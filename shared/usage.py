@@ -0,0 +1,290 @@
+"""
+Token 用量与费用记账
+====================
+
+get_llm 创建的模型都挂着 UsageCallbackHandler，每次调用结束时把
+token 用量、延迟、模型、所在的 LangGraph 节点和迭代轮次记到当前的账本里。
+账本放在 contextvar 中，只有在 track_usage() 范围内的调用才会被记录，
+并发运行的多个图各记各的账：
+
+    with track_usage("multi-critic") as ledger:
+        app.invoke(state)
+    print(ledger.format_summary())
+
+迭代轮次等额外标签用 usage_scope 标注，作用于范围内的全部调用：
+
+    with usage_scope(iteration=state["iteration"]):
+        llm.invoke(messages)
+
+不是通过 get_llm 创建的模型，可以把 handler 放进图的调用配置：
+
+    app.invoke(state, config={"callbacks": [UsageCallbackHandler()]})
+
+同一次调用被多个 handler 看到时只记一次。
+"""
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+# 每百万 token 的价格 (输入, 输出)，美元；按模型名前缀匹配，最长前缀优先
+MODEL_PRICES: dict[str, tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4": (30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "claude-3-5-sonnet": (3.00, 15.00),
+    "claude-3-5-haiku": (0.80, 4.00),
+    "claude-3-opus": (15.00, 75.00),
+    "claude-3-sonnet": (3.00, 15.00),
+    "claude-3-haiku": (0.25, 1.25),
+}
+
+
+def estimate_cost(model: Optional[str], prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """按 MODEL_PRICES 估算费用，未知模型返回 None"""
+    if not model:
+        return None
+    name = model.lower()
+    matches = [prefix for prefix in MODEL_PRICES if name.startswith(prefix)]
+    if not matches:
+        return None
+    input_price, output_price = MODEL_PRICES[max(matches, key=len)]
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+# ==========================================
+# 账本
+# ==========================================
+
+@dataclass
+class UsageRecord:
+    """一次模型调用的用量"""
+    model: Optional[str]
+    node: Optional[str]
+    iteration: Optional[int]
+    prompt_tokens: int
+    completion_tokens: int
+    latency_seconds: float
+    cost_usd: Optional[float]
+    labels: dict = field(default_factory=dict)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+@dataclass
+class UsageSummary:
+    """一组调用的汇总"""
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_seconds: float = 0.0
+    max_latency_seconds: float = 0.0
+    cost_usd: float = 0.0
+    unpriced_calls: int = 0
+
+    def add(self, record: UsageRecord) -> None:
+        self.calls += 1
+        self.prompt_tokens += record.prompt_tokens
+        self.completion_tokens += record.completion_tokens
+        self.latency_seconds += record.latency_seconds
+        self.max_latency_seconds = max(self.max_latency_seconds, record.latency_seconds)
+        if record.cost_usd is None:
+            self.unpriced_calls += 1
+        else:
+            self.cost_usd += record.cost_usd
+
+
+class UsageLedger:
+    """一次图运行的用量账本，线程安全"""
+
+    def __init__(self, name: str = "run"):
+        self.name = name
+        self.records: list[UsageRecord] = []
+        self._seen: set[UUID] = set()
+        self._lock = threading.Lock()
+
+    def add(self, record: UsageRecord, run_id: Optional[UUID] = None) -> bool:
+        """记录一次调用；同一个 run_id 只记一次"""
+        with self._lock:
+            if run_id is not None:
+                if run_id in self._seen:
+                    return False
+                self._seen.add(run_id)
+            self.records.append(record)
+        return True
+
+    def total(self) -> UsageSummary:
+        summary = UsageSummary()
+        for record in list(self.records):
+            summary.add(record)
+        return summary
+
+    def summary(self, by: str = "node") -> dict[Any, UsageSummary]:
+        """按字段分组汇总，by 可以是 node / model / iteration 或 usage_scope 的标签名"""
+        groups: dict[Any, UsageSummary] = defaultdict(UsageSummary)
+        for record in list(self.records):
+            key = getattr(record, by) if hasattr(record, by) else record.labels.get(by)
+            groups[key].add(record)
+        return dict(groups)
+
+    def format_summary(self, by: str = "node") -> str:
+        """格式化汇总，按费用（其次延迟）从高到低排列"""
+        total = self.total()
+        lines = [
+            f"{self.name}: {total.calls} calls, {total.prompt_tokens} prompt + "
+            f"{total.completion_tokens} completion tokens, ${total.cost_usd:.4f}, "
+            f"{total.latency_seconds:.1f}s total latency"
+        ]
+        groups = sorted(
+            self.summary(by).items(),
+            key=lambda item: (item[1].cost_usd, item[1].latency_seconds),
+            reverse=True,
+        )
+        for key, s in groups:
+            share = s.cost_usd / total.cost_usd if total.cost_usd else 0.0
+            unpriced = f" ({s.unpriced_calls} unpriced)" if s.unpriced_calls else ""
+            lines.append(
+                f"  {by}={key}: {s.calls} calls, {s.prompt_tokens}+{s.completion_tokens} tokens, "
+                f"${s.cost_usd:.4f} ({share:.0%}){unpriced}, "
+                f"latency {s.latency_seconds:.1f}s (max {s.max_latency_seconds:.1f}s)"
+            )
+        return "\n".join(lines)
+
+
+_current_ledger: ContextVar[Optional[UsageLedger]] = ContextVar("usage_ledger", default=None)
+_current_labels: ContextVar[dict] = ContextVar("usage_labels", default={})
+
+
+def current_ledger() -> Optional[UsageLedger]:
+    """当前上下文的账本，不在 track_usage 范围内时为 None"""
+    return _current_ledger.get()
+
+
+def current_labels() -> dict:
+    """usage_scope 设置的当前标签"""
+    return _current_labels.get()
+
+
+@contextmanager
+def track_usage(name: str = "run") -> Iterator[UsageLedger]:
+    """在范围内记录所有模型调用的用量"""
+    ledger = UsageLedger(name)
+    token = _current_ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _current_ledger.reset(token)
+
+
+@contextmanager
+def usage_scope(**labels) -> Iterator[None]:
+    """为范围内的调用附加标签（iteration 等）"""
+    token = _current_labels.set({**_current_labels.get(), **labels})
+    try:
+        yield
+    finally:
+        _current_labels.reset(token)
+
+
+# ==========================================
+# LangChain 回调
+# ==========================================
+
+@dataclass
+class _PendingCall:
+    ledger: UsageLedger
+    started: float
+    model: Optional[str]
+    node: Optional[str]
+    labels: dict
+
+
+def _token_usage(response) -> tuple[int, int, Optional[str]]:
+    """从 LLMResult 取 (prompt, completion, 实际模型名)"""
+    model = None
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            if message is None:
+                continue
+            model = (message.response_metadata or {}).get("model_name") or model
+            usage = message.usage_metadata
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0), model
+    llm_output = response.llm_output or {}
+    token_usage = llm_output.get("token_usage") or llm_output.get("usage") or {}
+    return (
+        token_usage.get("prompt_tokens", token_usage.get("input_tokens", 0)),
+        token_usage.get("completion_tokens", token_usage.get("output_tokens", 0)),
+        llm_output.get("model_name") or model,
+    )
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """把每次 Chat Model 调用的用量写入当前账本"""
+
+    def __init__(self):
+        self._pending: dict[UUID, _PendingCall] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id: UUID, metadata: Optional[dict] = None, **kwargs: Any
+    ) -> None:
+        ledger = _current_ledger.get()
+        if ledger is None:
+            return
+        metadata = metadata or {}
+        params = kwargs.get("invocation_params") or {}
+        labels = dict(_current_labels.get())
+        if "iteration" not in labels and "iteration" in metadata:
+            labels["iteration"] = metadata["iteration"]
+        with self._lock:
+            self._pending[run_id] = _PendingCall(
+                ledger=ledger,
+                started=time.perf_counter(),
+                model=metadata.get("ls_model_name") or params.get("model") or params.get("model_name"),
+                node=metadata.get("langgraph_node"),
+                labels=labels,
+            )
+
+    def _finish(self, run_id: UUID, response=None) -> None:
+        with self._lock:
+            pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return
+        prompt, completion, model = _token_usage(response) if response is not None else (0, 0, None)
+        model = model or pending.model
+        labels = dict(pending.labels)
+        iteration = labels.pop("iteration", None)
+        pending.ledger.add(
+            UsageRecord(
+                model=model,
+                node=pending.node,
+                iteration=iteration,
+                prompt_tokens=prompt,
+                completion_tokens=completion,
+                latency_seconds=time.perf_counter() - pending.started,
+                cost_usd=estimate_cost(model, prompt, completion),
+                labels=labels,
+            ),
+            run_id=run_id,
+        )
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, response)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        # 失败的调用同样占用延迟，记为 0 token
+        self._finish(run_id)
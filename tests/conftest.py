@@ -0,0 +1,19 @@
+"""
+shared/ 包测试配置
+"""
+
+import os
+import sys
+
+import pytest
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def override_settings():
+    """临时覆盖配置：override_settings(llm={"anthropic_api_key": "..."})，测试结束后恢复"""
+    from shared.settings import reload_settings
+    yield reload_settings
+    reload_settings()
@@ -0,0 +1,65 @@
+"""
+shared.batch_aggregation 单元测试
+"""
+
+import numpy as np
+import pytest
+
+from shared.batch_aggregation import aggregate_batch, critic_weights, score_matrix
+
+CRITICS = ["Code Quality", "Security", "Style"]
+WEIGHTS = {"Code Quality": 0.4, "Security": 0.35, "Style": 0.25}
+
+
+def loop_score(review: dict) -> float:
+    """逐条循环的参考实现（原聚合器的算法）"""
+    total = weight_sum = 0.0
+    for name, score in review.items():
+        weight = WEIGHTS.get(name, 0.33)
+        total += score * weight
+        weight_sum += weight
+    return total / weight_sum if weight_sum else 0.0
+
+
+class TestAggregateBatch:
+    """测试加权分、阈值与冲突检测"""
+
+    def test_matches_loop_reference_with_missing_scores(self):
+        rng = np.random.default_rng(0)
+        reviews = [
+            {name: float(rng.integers(0, 11)) for name in CRITICS if rng.random() > 0.2}
+            for _ in range(200)
+        ]
+        decision = aggregate_batch(
+            score_matrix(reviews, CRITICS), critic_weights(CRITICS, WEIGHTS, 0.33)
+        )
+        np.testing.assert_allclose(decision.scores, [loop_score(r) for r in reviews])
+
+    def test_thresholds_conflicts_and_veto(self):
+        matrix = score_matrix([
+            {"Code Quality": 8, "Security": 8, "Style": 8},   # 通过
+            {"Code Quality": 9, "Security": 4, "Style": 9},   # 冲突
+            {"Code Quality": 5, "Security": 5, "Style": 5},   # 低于复核阈值
+            {"Code Quality": 9, "Security": 8, "Style": 9},   # 被否决
+            {},                                               # 全部取消
+        ], CRITICS)
+        decision = aggregate_batch(
+            matrix, critic_weights(CRITICS, WEIGHTS),
+            human_review_threshold=6.0, vetoed=[False, False, False, True, False],
+        )
+        assert decision.passed.tolist() == [True, True, False, False, False]
+        assert decision.conflicts.tolist() == [False, True, False, False, False]
+        assert decision.needs_human.tolist() == [False, True, True, False, True]
+        assert decision.scores[4] == 0
+        assert decision.conflict_reason(1) == "Large score variance: 4-9 (std 2.4)"
+        assert decision.conflict_reason(0) is None
+
+    def test_std_based_conflicts(self):
+        matrix = np.array([[6.0, 9.0, 9.0], [7.0, 7.5, 8.0]])
+        decision = aggregate_batch(matrix, np.ones(3), conflict_range=None, conflict_std=1.0)
+        assert decision.conflicts.tolist() == [True, False]
+        np.testing.assert_allclose(decision.std, np.nanstd(matrix, axis=1))
+
+    def test_rejects_mismatched_weights(self):
+        with pytest.raises(ValueError):
+            aggregate_batch(np.zeros((2, 3)), np.ones(2))
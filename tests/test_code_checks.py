@@ -0,0 +1,75 @@
+"""
+shared.code_checks 单元测试
+"""
+
+from shared.code_checks import MAX_SCORE, rank_candidates, static_check
+
+CLEAN = '''
+import sqlite3
+from typing import Optional
+
+
+def get_user(conn: sqlite3.Connection, user_id: int) -> Optional[dict]:
+    """Fetch a user by id."""
+    try:
+        row = conn.execute("SELECT id, name FROM users WHERE id = ?", (user_id,)).fetchone()
+    except sqlite3.Error as exc:
+        raise RuntimeError("query failed") from exc
+    return dict(row) if row else None
+'''
+
+INSECURE = '''
+DB_PASSWORD = "hunter2"
+
+
+def get_user(conn, user_id):
+    try:
+        return conn.cursor().execute(f"SELECT * FROM users WHERE id = {user_id}")
+    except:
+        return None
+'''
+
+
+class TestStaticCheck:
+    """测试静态打分"""
+
+    def test_clean_code_scores_full(self):
+        report = static_check(CLEAN)
+        assert report.syntax_ok
+        assert report.score == MAX_SCORE
+        assert report.summary() == "no static issues"
+
+    def test_insecure_code_flags_each_rule(self):
+        report = static_check(INSECURE)
+        text = " ".join(report.issues)
+        for expected in ("hard-coded DB_PASSWORD", "bare except", "SQL built", "missing docstring", "type hints"):
+            assert expected in text
+        assert report.score < 2
+
+    def test_syntax_error(self):
+        report = static_check("def broken(:\n    pass")
+        assert not report.syntax_ok
+        assert report.score == 0.0
+
+    def test_dangerous_calls_and_stubs(self):
+        code = '''
+import subprocess
+
+
+def run(cmd: str) -> None:
+    """Run a command."""
+    subprocess.run(cmd, shell=True)
+
+
+def todo(x: int) -> int:
+    """Not done."""
+    raise NotImplementedError
+'''
+        issues = " ".join(static_check(code).issues)
+        assert "shell=True" in issues
+        assert "todo: placeholder body" in issues
+
+
+def test_rank_candidates_is_stable():
+    ranked = rank_candidates([INSECURE, CLEAN, CLEAN, "not python ("])
+    assert [index for index, _, _ in ranked] == [1, 2, 0, 3]
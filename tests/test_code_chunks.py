@@ -0,0 +1,93 @@
+"""
+shared.code_chunks 单元测试
+"""
+
+import pytest
+
+from shared.code_chunks import chunk_code, module_context, source_lines
+
+
+def make_class(name: str, methods: int) -> str:
+    body = "".join(
+        f"\n    def method_{i}(self, value: int) -> int:\n"
+        f'        """Return value plus {i}."""\n'
+        + "".join(f"        value += {j}\n" for j in range(15))
+        + "        return value\n"
+        for i in range(methods)
+    )
+    return f"class {name}:\n    \"\"\"Big class.\"\"\"\n{body}"
+
+
+SOURCE = (
+    "import os\nfrom typing import Optional\n\nLIMIT = 3; RETRIES = 2\n\n\n"
+    "# helper comment belongs to the function below\n"
+    "@staticmethod\ndef small() -> None:\n    pass\n\n\n"
+    + make_class("Service", 8)
+)
+
+
+def assert_covers(chunks, code):
+    assert chunks[0].start_line == 1
+    assert chunks[-1].end_line == len(source_lines(code))
+    for before, after in zip(chunks, chunks[1:]):
+        assert before.end_line + 1 == after.start_line
+    assert "\n".join(c.text for c in chunks) == "\n".join(source_lines(code))
+
+
+class TestChunkCode:
+    """测试按 AST 边界切分"""
+
+    def test_small_code_is_one_chunk(self):
+        chunks = chunk_code(SOURCE, max_tokens=10_000)
+        assert len(chunks) == 1
+        assert chunks[0].symbols == ("small", "Service")
+
+    @pytest.mark.parametrize("max_tokens", [60, 150, 400])
+    def test_splits_cover_all_lines_within_budget(self, max_tokens):
+        chunks = chunk_code(SOURCE, max_tokens=max_tokens)
+        assert_covers(chunks, SOURCE)
+        assert all(c.tokens <= max_tokens for c in chunks)
+
+    def test_large_class_splits_at_methods(self):
+        chunks = chunk_code(SOURCE, max_tokens=150)
+        starts = {c.text.splitlines()[0].strip() for c in chunks}
+        method_chunks = [c for c in chunks if any(s.startswith("Service.method_") for s in c.symbols)]
+        assert len(method_chunks) > 1
+        # 每个片段都从定义或定义前的空行 / 注释开始，而不是从函数体中间开始
+        assert not any(s.startswith("value +=") for s in starts)
+
+    def test_comments_and_decorators_stay_with_definition(self):
+        chunks = chunk_code(SOURCE, max_tokens=60)
+        small = next(c for c in chunks if "small" in c.symbols)
+        assert "# helper comment" in small.text and "@staticmethod" in small.text
+
+    def test_comment_before_definition_starts_its_chunk(self):
+        body = "".join(f"    x_{i} = {i}\n" for i in range(12))
+        code = f"def f():\n{body}\n\n# comment about g\ndef g():\n{body}"
+        chunks = chunk_code(code, max_tokens=80)
+        assert [c.symbols for c in chunks] == [("f",), ("g",)]
+        assert chunks[1].text.lstrip("\n").startswith("# comment about g")
+        assert "# comment" not in chunks[0].text
+
+    def test_line_numbers_follow_ast_line_breaks(self):
+        code = "x = 1\n\x0c\ndef f():\n    return 1\n"
+        [chunk] = chunk_code(code)
+        assert chunk.end_line == 4
+        assert source_lines(code)[2] == "def f():"
+        assert chunk.text.split("\n")[2] == "def f():"
+
+    def test_unparseable_falls_back_to_lines(self):
+        code = "def broken(:\n" + "x = 1\n" * 200
+        chunks = chunk_code(code, max_tokens=100)
+        assert_covers(chunks, code)
+        assert len(chunks) > 1
+
+    def test_to_file_line(self):
+        chunk = chunk_code(SOURCE, max_tokens=60)[1]
+        assert chunk.to_file_line(1) == chunk.start_line
+        assert chunk.to_file_line(10_000) is None
+        assert chunk.to_file_line(None) is None
+
+
+def test_module_context():
+    assert module_context(SOURCE) == "import os\nfrom typing import Optional"
@@ -0,0 +1,83 @@
+"""
+shared.diff_analysis 单元测试
+"""
+
+import pytest
+
+from shared.diff_analysis import (
+    ALL_CONCERNS,
+    DEFAULT_CRITIC_CONCERNS,
+    analyze_diff,
+    select_critics,
+    unified_diff,
+)
+
+BASE = '''"""Users."""
+import sqlite3
+
+LIMIT = 10
+
+
+def get_user(conn, user_id):
+    """Fetch a user."""
+    # parameterized query
+    return conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+'''
+
+
+class TestAnalyzeDiff:
+    """测试变化分类"""
+
+    @pytest.mark.parametrize("old, new, region, concerns", [
+        ('"""Fetch a user."""', '"""Fetch a user by id."""', "get_user", {"docs"}),
+        ("# parameterized query", "# bound parameters", "get_user", {"comments"}),
+        ("def get_user(conn, user_id):", "def get_user(conn, user_id: int):", "get_user", {"annotations"}),
+        ("import sqlite3", "import sqlite3\nimport pickle", "<module>", {"imports"}),
+        ("LIMIT = 10", "LIMIT = 20", "<module>", {"code"}),
+        ("(user_id,)).fetchone()", "(user_id,)\n    ).fetchone()", "get_user", {"format"}),
+    ])
+    def test_classifies_change(self, old, new, region, concerns):
+        analysis = analyze_diff(BASE, BASE.replace(old, new))
+        assert analysis.regions == {region: frozenset(concerns)}
+
+    def test_identical_and_unparseable(self):
+        assert analyze_diff(BASE, BASE).concerns == frozenset()
+        broken = analyze_diff(BASE, BASE + "def oops(:\n")
+        assert not broken.parsed
+        assert broken.concerns == ALL_CONCERNS
+
+    def test_form_feed_does_not_shift_regions(self):
+        old = "x = 1\n\x0c\ndef f():\n    return 1\n"
+        analysis = analyze_diff(old, old.replace("return 1", "return 2"))
+        assert analysis.regions == {"f": frozenset({"code"})}
+
+    def test_new_definition(self):
+        analysis = analyze_diff(BASE, BASE + "\n\ndef helper():\n    return 1\n")
+        assert "code" in analysis.regions["helper"]
+
+
+class TestSelectCritics:
+    """测试 Critic 选择"""
+
+    def test_docs_change_skips_security(self):
+        analysis = analyze_diff(BASE, BASE.replace("Fetch a user.", "Fetch one user."))
+        concerns = {name: DEFAULT_CRITIC_CONCERNS[name] for name in ("quality", "security", "style")}
+        assert select_critics(analysis, concerns) == ["quality", "style"]
+
+    def test_missing_or_cancelled_previous_reruns(self):
+        analysis = analyze_diff(BASE, BASE)
+        concerns = {"security": {"code"}, "style": None, "logic": {"code"}}
+        previous = {"security": {"score": 8}, "style": {"cancelled": True}}
+        assert select_critics(analysis, concerns, previous) == ["style", "logic"]
+
+    def test_first_round_runs_all(self):
+        assert select_critics(None, {"a": {"code"}, "b": {"docs"}}) == ["a", "b"]
+
+
+def test_unified_diff_keeps_only_context():
+    new = BASE.replace("LIMIT = 10", "LIMIT = 20")
+    diff = unified_diff(BASE, new, context=1)
+    assert diff.startswith("--- a/code.py\n+++ b/code.py")
+    assert "-LIMIT = 10\n+LIMIT = 20" in diff
+    assert "get_user" not in diff
+    assert unified_diff(BASE, BASE) == ""
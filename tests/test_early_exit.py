@@ -0,0 +1,80 @@
+"""
+shared.early_exit 单元测试
+"""
+
+import asyncio
+
+from shared.early_exit import VetoBoard, check_veto
+from shared.settings import VetoRule
+
+
+class TestVetoBoard:
+    """测试否决与取消"""
+
+    def test_veto_cancels_in_flight_calls(self):
+        board = VetoBoard()
+        cancelled = []
+
+        async def slow(name):
+            try:
+                await asyncio.sleep(5)
+                return name
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+
+        async def security():
+            await asyncio.sleep(0.01)
+            board.veto("r1", "security", "risk level critical")
+            return "critical"
+
+        async def scenario():
+            return await asyncio.gather(
+                board.run("r1", "security", security()),
+                board.run("r1", "quality", slow("quality")),
+                board.run("r1", "style", slow("style")),
+            )
+
+        (sec, sec_veto), (quality, veto), (style, _) = asyncio.run(asyncio.wait_for(scenario(), 1))
+        assert sec == "critical" and sec_veto is None
+        assert quality is None and style is None
+        assert veto.critic == "security"
+        assert sorted(cancelled) == ["quality", "style"]
+
+    def test_first_veto_wins_and_late_calls_skip(self):
+        board = VetoBoard()
+        assert board.veto("r", "security", "critical")
+        assert not board.veto("r", "quality", "score 1")
+        assert board.vetoed("r").critic == "security"
+
+        async def never_started():
+            raise AssertionError("should not run")
+
+        result, veto = asyncio.run(board.run("r", "style", never_started()))
+        assert result is None and veto.critic == "security"
+
+        board.close("r")
+        assert board.vetoed("r") is None
+
+    def test_no_veto_returns_result(self):
+        board = VetoBoard()
+
+        async def ok():
+            return 8.5
+
+        assert asyncio.run(board.run("r", "quality", ok())) == (8.5, None)
+
+    def test_rounds_are_bounded(self):
+        board = VetoBoard(max_rounds=2)
+        for key in ("a", "b", "c"):
+            board.veto(key, "security", "critical")
+        assert board.vetoed("a") is None
+        assert board.vetoed("c") is not None
+
+
+def test_check_veto():
+    rule = VetoRule(risk_levels=["critical"], max_score=2)
+    assert check_veto(rule, 6.0, "critical") == "risk level critical"
+    assert check_veto(rule, 1.5, "high") == "score 1.5 <= 2.0"
+    assert check_veto(rule, 6.0, "high") is None
+    assert check_veto(None, 0.0, "critical") is None
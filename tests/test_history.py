@@ -0,0 +1,52 @@
+"""
+shared.history 单元测试
+"""
+
+from shared.history import HistoryCompactor
+from shared.tokens import count_tokens, truncate_to_tokens
+
+TEMPLATE = "Task: {task}\nCode:\n{code}\nFeedback:\n{feedback}\nHistory:\n{history}"
+
+
+def make_rounds(n: int) -> list[dict]:
+    return [
+        {
+            "iteration": i,
+            "score": 5.0 + i * 0.1,
+            "feedback": f"Round {i} feedback. " + "detail " * 200,
+            "suggestions": ["Use parameterized queries", f"Fix issue {i}"],
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+class TestHistoryCompactor:
+    """测试评审历史压缩"""
+
+    def test_digest_is_bounded(self):
+        compactor = HistoryCompactor(max_rounds=3)
+        lines = compactor.digest_lines(make_rounds(10))
+        # 最近 3 轮（新的在前）+ 反复出现的建议
+        assert lines[0].startswith("- Iteration 10")
+        assert len([line for line in lines if line.startswith("- Iteration")]) == 3
+        assert any("(x10) Use parameterized queries" in line for line in lines)
+
+    def test_prompt_respects_budget_and_keeps_code(self):
+        code = "def f():\n    return 1\n"
+        compactor = HistoryCompactor(token_budget=300)
+        prompt = compactor.build_prompt(
+            TEMPLATE,
+            task="demo",
+            code=code,
+            latest_feedback="latest " * 500,
+            earlier_rounds=make_rounds(8),
+        )
+        assert code in prompt
+        assert count_tokens(prompt) <= 300 + 5
+
+    def test_truncate_to_tokens(self):
+        text = "word " * 1000
+        truncated = truncate_to_tokens(text, 50)
+        assert count_tokens(truncated) <= 50
+        assert truncated.endswith("[truncated]")
+        assert truncate_to_tokens("short", 50) == "short"
@@ -0,0 +1,99 @@
+"""
+shared.json_stream 单元测试
+"""
+
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+from shared.json_stream import (
+    JsonExtractionError,
+    JsonObjectExtractor,
+    astream_json,
+    extract_json,
+    stream_json,
+)
+
+
+class Review(BaseModel):
+    score: float
+    feedback: str = ""
+
+
+class FakeStreamingLLM:
+    """按块输出文本，并记录被消费了多少块"""
+
+    def __init__(self, chunks: list[str]):
+        self.chunks = chunks
+        self.consumed = 0
+
+    def stream(self, messages, **kwargs):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+    async def astream(self, messages, **kwargs):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+
+class TestJsonObjectExtractor:
+    """测试增量提取"""
+
+    def test_skips_prose_and_fences(self):
+        text = 'Review of {code}:\n```json\n{"score": 8, "feedback": "use {x} safely"}\n```\nThanks'
+        assert extract_json(text) == {"score": 8, "feedback": "use {x} safely"}
+
+    def test_braces_and_escapes_inside_strings(self):
+        text = '{"feedback": "a \\"}\\" b", "nested": {"k": [1, 2]}}'
+        assert extract_json(text)["nested"] == {"k": [1, 2]}
+
+    def test_tolerates_trailing_commas(self):
+        assert extract_json('{"score": 7, "tags": ["a",],}') == {"score": 7, "tags": ["a"]}
+
+    def test_incremental_feed(self):
+        extractor = JsonObjectExtractor()
+        assert extractor.feed('prefix {"sco') is None
+        assert extractor.feed('re": 9') is None
+        assert extractor.feed("} trailing") == {"score": 9}
+        assert extractor.done
+
+    def test_rescans_after_unclosed_brace(self):
+        extractor = JsonObjectExtractor()
+        assert extractor.feed("pre {unclosed and ") is None
+        assert extractor.feed('{"a": 1}') is None
+        assert extractor.finish() == {"a": 1}
+        assert extract_json('Use {x or "y" then:\n{"score": 4}') == {"score": 4}
+
+    def test_no_object(self):
+        with pytest.raises(JsonExtractionError):
+            extract_json("APPROVED")
+
+
+class TestStreamJson:
+    """测试流式调用与提前停止"""
+
+    def test_stops_after_object_closes(self):
+        llm = FakeStreamingLLM(['Sure. {"score": ', '6.5}', " and more", " text"])
+        review, raw = stream_json(llm, [], Review)
+        assert review.score == 6.5
+        assert llm.consumed == 2
+        assert raw.endswith("6.5}")
+
+    def test_stray_brace_before_object(self):
+        llm = FakeStreamingLLM(["Fix the {dict literal. ", '{"score": 3}'])
+        review, _ = stream_json(llm, [], Review)
+        assert review.score == 3
+
+    def test_schema_mismatch(self):
+        llm = FakeStreamingLLM(['{"feedback": "missing score"}'])
+        with pytest.raises(JsonExtractionError):
+            stream_json(llm, [], Review)
+
+    def test_async_stops_after_object_closes(self):
+        llm = FakeStreamingLLM(['{"score": 3}', " and more", " text"])
+        review, _ = asyncio.run(astream_json(llm, [], Review))
+        assert review.score == 3
+        assert llm.consumed == 1
@@ -0,0 +1,110 @@
+"""
+shared.llm_providers 结构化输出与延迟导入单元测试
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import BaseModel
+
+from shared.json_stream import JsonExtractionError
+from shared.llm_providers import get_llm, invoke_structured
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Review(BaseModel):
+    score: float
+    feedback: str = ""
+
+
+class FakeStructured:
+    def __init__(self, result: dict):
+        self.result = result
+
+    def invoke(self, messages):
+        return self.result
+
+
+class FakeStructuredLLM:
+    """支持 with_structured_output 的假模型，记录调用参数"""
+
+    def __init__(self, result: dict):
+        self.result = result
+        self.calls = []
+
+    def with_structured_output(self, schema, **kwargs):
+        self.calls.append(kwargs)
+        return FakeStructured(self.result)
+
+
+class TestInvokeStructured:
+    """测试结构化输出与回退"""
+
+    def test_uses_provider_structured_output(self):
+        llm = FakeStructuredLLM({"parsed": Review(score=8), "raw": AIMessage(content="")})
+        review = invoke_structured(llm, [HumanMessage(content="review")], Review, method="json_schema")
+        assert review.score == 8
+        assert llm.calls == [{"include_raw": True, "method": "json_schema"}]
+
+    def test_parses_raw_content_when_tool_call_missing(self):
+        raw = AIMessage(content='Here you go: {"score": 6, "feedback": "ok"}')
+        llm = FakeStructuredLLM({"parsed": None, "raw": raw})
+        assert invoke_structured(llm, ["review"], Review).feedback == "ok"
+
+    def test_falls_back_to_json_stream(self):
+        # FakeListChatModel 没有实现 with_structured_output
+        llm = FakeListChatModel(responses=['```json\n{"score": 7}\n```'])
+        assert invoke_structured(llm, [HumanMessage(content="review")], Review).score == 7
+
+    def test_invalid_output_raises(self):
+        llm = FakeListChatModel(responses=["no json here"])
+        with pytest.raises(JsonExtractionError):
+            invoke_structured(llm, [HumanMessage(content="review")], Review)
+
+
+class TestLazyImports:
+    """提供商 SDK 只在创建对应模型时导入"""
+
+    def _loaded(self, code: str) -> set:
+        result = subprocess.run(
+            [sys.executable, "-c", code + "\nimport sys; print(' '.join(sys.modules))"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+            env={**os.environ, "OPENAI_API_KEY": "sk-test"},
+        )
+        return set(result.stdout.split())
+
+    def test_import_shared_skips_provider_sdks(self):
+        loaded = self._loaded("import shared; shared.config.OPENAI_MODEL")
+        assert not {"langchain_openai", "langchain_anthropic", "langgraph"} & loaded
+
+    def test_get_llm_imports_only_requested_provider(self):
+        loaded = self._loaded("from shared import get_llm; get_llm('openai')")
+        assert "langchain_openai" in loaded
+        assert "langchain_anthropic" not in loaded
+
+    def test_get_llm_still_builds_models(self, override_settings):
+        override_settings(llm={"anthropic_api_key": "sk-test"})
+        llm = get_llm("anthropic")
+        assert type(llm).__name__ == "ChatAnthropic"
+
+
+class TestHedgedRouting:
+    """备用提供商路由"""
+
+    def test_router_is_shared_and_coalescable(self, override_settings):
+        override_settings(llm={"openai_api_key": "sk-test", "anthropic_api_key": "sk-test"})
+        router = get_llm("openai", "gpt-4o", fallbacks=["anthropic"])
+        # 同一配置复用同一个路由，延迟统计才能累积到对冲截止时间
+        assert get_llm("openai", "gpt-4o", fallbacks=["anthropic"]) is router
+        assert get_llm("openai", "gpt-4o", temperature=0.7, fallbacks=["anthropic"]) is not router
+        # 可以转移的路线不在 SDK 里重试，最后一条保留
+        assert [model.max_retries for model in router.models] == [0, 2]
+
+        coalescing = get_llm("openai", "gpt-4o", fallbacks=["anthropic"], coalesce=True)
+        assert coalescing.identity.startswith("HedgedLLM(")
+        assert "@" not in coalescing.identity
@@ -0,0 +1,178 @@
+"""
+shared.metrics / shared.profiling 单元测试
+"""
+
+import asyncio
+import json
+import os
+import pstats
+import random
+from typing import TypedDict
+
+import pytest
+from langgraph.graph import END
+
+from shared import profiling
+from shared.metrics import LatencyHistogram, MetricsRegistry, metrics, timed_node
+from shared.profiling import (
+    disable_node_profiling,
+    enable_node_profiling,
+    profiled_node,
+)
+from shared.tracing import TracedStateGraph
+
+
+class TestLatencyHistogram:
+    """测试直方图"""
+
+    def test_percentiles_within_relative_error(self):
+        rng = random.Random(0)
+        values = sorted(rng.lognormvariate(-3, 1) for _ in range(5000))
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(value)
+
+        for q in (50, 90, 99):
+            exact = values[round(q / 100 * len(values)) - 1]
+            assert histogram.percentile(q) == pytest.approx(exact, rel=1 / 32)
+        assert histogram.count == 5000
+        assert histogram.percentile(100) == values[-1]
+
+    def test_small_values_are_exact(self):
+        histogram = LatencyHistogram()
+        for us in (1, 2, 3, 60):
+            histogram.record(us / 1_000_000)
+        assert histogram.percentile(50) == pytest.approx(2e-6)
+        assert histogram.max == pytest.approx(60e-6)
+
+    def test_merge(self):
+        a, b = LatencyHistogram(), LatencyHistogram()
+        a.record(0.010)
+        b.record(0.500)
+        a.merge(b)
+        assert a.count == 2
+        assert a.min == 0.010 and a.max == 0.500
+
+    def test_empty(self):
+        assert LatencyHistogram().percentile(99) == 0.0
+
+
+class TestMetricsRegistry:
+    """测试注册表与节点包装"""
+
+    def test_timed_node_records_errors(self):
+        registry = MetricsRegistry()
+
+        def failing(state):
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            timed_node("g", "bad", failing, registry)({})
+        timed_node("g", "good", lambda state: {}, registry)({})
+
+        snapshot = registry.snapshot()
+        assert snapshot["g"]["bad"]["errors"] == 1
+        assert snapshot["g"]["good"]["count"] == 1
+        assert "good" in registry.report()
+
+    def test_async_node(self):
+        registry = MetricsRegistry()
+
+        async def node(state):
+            await asyncio.sleep(0.01)
+            return {"done": True}
+
+        wrapped = timed_node("g", "async", node, registry)
+        assert asyncio.run(wrapped({})) == {"done": True}
+        assert registry.histogram("g", "async").percentile(50) >= 0.009
+
+    def test_dump(self, tmp_path):
+        registry = MetricsRegistry()
+        registry.record("g", "n", 0.02)
+        path = tmp_path / "metrics.json"
+        registry.dump(str(path))
+        assert json.loads(path.read_text())["g"]["n"]["count"] == 1
+
+
+class State(TypedDict):
+    value: int
+
+
+def test_traced_state_graph_populates_global_metrics():
+    graph = TracedStateGraph(State, name="metrics-test")
+    graph.add_node("inc", lambda state: {"value": state["value"] + 1})
+    graph.set_entry_point("inc")
+    graph.add_edge("inc", END)
+    app = graph.compile()
+
+    metrics.reset()
+    for _ in range(3):
+        app.invoke({"value": 0})
+    assert metrics.snapshot()["metrics-test"]["inc"]["count"] == 3
+
+
+class TestProfiling:
+    """测试节点剖析"""
+
+    def test_profiles_n_invocations_then_stops(self, tmp_path):
+        profiler = enable_node_profiling("work", invocations=2, output_dir=str(tmp_path))
+        node = profiled_node("g", "work", lambda state: sum(range(1000)))
+        for _ in range(3):
+            node({})
+
+        assert profiler.profiled == 2
+        assert "work" not in profiling._profilers
+        assert os.path.exists(tmp_path / "work.prof")
+        assert "node=work" in open(profiler.report_path).read()
+
+    def test_graph_filter_and_early_disable(self, tmp_path):
+        profiler = enable_node_profiling("work", invocations=5, output_dir=str(tmp_path), graph="a")
+        profiled_node("b", "work", lambda state: None)({})
+        assert profiler.profiled == 0
+        profiled_node("a", "work", lambda state: None)({})
+
+        path = disable_node_profiling("work")
+        assert profiler.profiled == 1
+        assert path == str(tmp_path / "a.work.txt")
+
+    def test_finished_profiler_keeps_newer_one(self, tmp_path):
+        old = enable_node_profiling("work", invocations=1, output_dir=str(tmp_path))
+        new = enable_node_profiling("work", invocations=5, output_dir=str(tmp_path))
+        old.call(lambda: None)
+
+        assert old.done
+        assert profiling._profilers["work"] is new
+        disable_node_profiling("work", write_report=False)
+
+    def test_async_node_excludes_other_coroutines(self, tmp_path):
+        def node_work():
+            return sum(range(1000))
+
+        def other_work():
+            return sum(range(1000))
+
+        async def node(state):
+            node_work()
+            await asyncio.sleep(0.01)
+            return node_work()
+
+        async def other():
+            await asyncio.sleep(0.001)
+            return other_work()
+
+        async def run():
+            wrapped = profiled_node("g", "work", node)
+            result, _ = await asyncio.gather(wrapped({}), other())
+            return result
+
+        profiler = enable_node_profiling("work", invocations=1, output_dir=str(tmp_path))
+        assert asyncio.run(run()) == sum(range(1000))
+
+        profiled = {name for _, _, name in pstats.Stats(profiler._profiler).stats}
+        assert "node_work" in profiled
+        assert "other_work" not in profiled
+        assert profiler.profiled == 1
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            enable_node_profiling("work", backend="perf")
@@ -0,0 +1,130 @@
+"""
+01_langgraph/02_patterns/planner_worker.py DAG 调度测试
+"""
+
+import importlib.util
+import os
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _load_planner_worker():
+    # 目录名以数字开头，不能作为包导入
+    path = os.path.join(ROOT, "01_langgraph", "02_patterns", "planner_worker.py")
+    spec = importlib.util.spec_from_file_location("planner_worker", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+pw = _load_planner_worker()
+
+
+def subtask(task_id, status="pending", dependencies=()):
+    return {
+        "id": task_id,
+        "description": f"task {task_id}",
+        "status": status,
+        "result": None,
+        "dependencies": list(dependencies),
+    }
+
+
+def initial_state():
+    return {
+        "original_task": "Build a user authentication system",
+        "subtasks": [],
+        "current_index": 0,
+        "final_result": "",
+        "execution_log": [],
+    }
+
+
+@pytest.fixture
+def fast_workers(monkeypatch):
+    monkeypatch.setattr(pw, "WORKER_LATENCY_SECONDS", 0.1)
+    monkeypatch.setattr(pw, "FAILING_SUBTASK_IDS", set())
+
+
+class TestCriticalPath:
+    """测试关键路径优先"""
+
+    def test_lengths(self):
+        plan = [
+            subtask("1"),
+            subtask("2", dependencies=["1"]),
+            subtask("3", dependencies=["2"]),
+            subtask("4", dependencies=["2"]),
+        ]
+        assert pw.critical_path_lengths(plan) == {"1": 3, "2": 2, "3": 1, "4": 1}
+
+    def test_ready_subtasks_longest_chain_first(self):
+        plan = [
+            subtask("leaf"),
+            subtask("head"),
+            subtask("middle", dependencies=["head"]),
+            subtask("tail", dependencies=["middle"]),
+        ]
+        assert [st["id"] for st in pw.ready_subtasks(plan)] == ["head", "leaf"]
+
+
+class TestScheduler:
+    """测试剪枝与环检测"""
+
+    def test_failure_prunes_downstream(self):
+        state = {"subtasks": [
+            subtask("1", status="failed"),
+            subtask("2", dependencies=["1"]),
+            subtask("3", dependencies=["2"]),
+            subtask("4"),
+        ]}
+        update = pw.scheduler_node(state)
+        pruned = {st["id"]: st for st in update["subtasks"]}
+        assert sorted(pruned) == ["2", "3"]
+        assert all(st["status"] == "skipped" for st in pruned.values())
+        assert pruned["2"]["result"] == "Dependency not satisfied: 1"
+
+    def test_cycle_is_skipped(self):
+        state = {"subtasks": [
+            subtask("1", dependencies=["2"]),
+            subtask("2", dependencies=["1"]),
+        ]}
+        update = pw.scheduler_node(state)
+        assert [(st["id"], st["result"]) for st in update["subtasks"]] == [
+            ("1", "Dependency cycle"),
+            ("2", "Dependency cycle"),
+        ]
+        next_step = pw.dispatch_ready_subtasks({"subtasks": update["subtasks"]})
+        assert next_step == "synthesizer"
+
+
+class TestDagMode:
+    """测试端到端调度"""
+
+    def test_failed_subtask_skips_dependents(self, fast_workers, monkeypatch):
+        monkeypatch.setattr(pw, "FAILING_SUBTASK_IDS", {"2"})
+        result = pw.create_planner_worker_graph(mode="dag").invoke(initial_state())
+        status = {st["id"]: st["status"] for st in result["subtasks"]}
+        assert status == {
+            "1": "completed", "2": "failed", "3": "skipped", "4": "skipped",
+        }
+
+    def test_faster_than_sequential(self, fast_workers):
+        timings = {}
+        for mode in ("sequential", "dag"):
+            start = time.perf_counter()
+            result = pw.create_planner_worker_graph(mode=mode).invoke(initial_state())
+            timings[mode] = time.perf_counter() - start
+            assert all(st["status"] == "completed" for st in result["subtasks"])
+
+        # 依赖链 1 -> 2 -> {3, 4}：串行 4 个子任务，DAG 3 波
+        assert timings["sequential"] >= 0.4
+        assert timings["dag"] < timings["sequential"] - 0.05
+
+    def test_parallel_rejects_dependencies(self, fast_workers):
+        app = pw.create_planner_worker_graph(mode="parallel", planner=pw.planner_node)
+        with pytest.raises(ValueError, match="mode='dag'"):
+            app.invoke(initial_state())
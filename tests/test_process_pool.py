@@ -0,0 +1,81 @@
+"""
+shared.process_pool 单元测试
+
+被装饰的节点必须定义在模块顶层，子进程按模块名 + 限定名找回它们。
+"""
+
+import os
+
+import pytest
+
+from shared.process_pool import (
+    merge_partial_update,
+    run_in_process,
+    shutdown_process_pool,
+)
+
+
+@run_in_process(reads=["code", "missing"], max_workers=2)
+def sliced_node(state):
+    return {"seen": sorted(state), "pid": os.getpid()}
+
+
+@run_in_process(max_workers=2)
+def full_state_node(state):
+    return {"seen": sorted(state)}
+
+
+@run_in_process(reads=["code", "count"], max_workers=2)
+def mutating_node(state):
+    # 修改 state 后整体返回
+    state["count"] += 1
+    return state
+
+
+@run_in_process(max_workers=2)
+def failing_node(state):
+    raise ValueError(f"boom: {state['code']}")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def process_pool():
+    yield
+    shutdown_process_pool()
+
+
+class TestMergePartialUpdate:
+    """测试部分更新合并"""
+
+    def test_drops_unchanged_keys(self):
+        state_slice = {"code": "x = 1", "count": 1, "tags": ["a"]}
+        update = {"code": "x = 1", "count": 2, "tags": ["a"], "result": "ok"}
+        assert merge_partial_update(state_slice, update) == {"count": 2, "result": "ok"}
+
+    def test_empty_update(self):
+        assert merge_partial_update({"code": "x"}, None) == {}
+        assert merge_partial_update({"code": "x"}, {}) == {}
+
+
+class TestRunInProcess:
+    """测试进程池节点执行"""
+
+    def test_sends_only_read_keys(self):
+        result = sliced_node({"code": "x = 1", "history": ["large"] * 100})
+        assert result["seen"] == ["code"]
+        assert result["pid"] != os.getpid()
+
+    def test_sends_full_state_without_reads(self):
+        assert full_state_node({"code": "x", "count": 1}) == {"seen": ["code", "count"]}
+
+    def test_returns_only_changed_keys(self):
+        assert mutating_node({"code": "x = 1", "count": 1, "other": True}) == {"count": 2}
+
+    def test_worker_exception_propagates(self):
+        with pytest.raises(ValueError, match="boom: x = 1"):
+            failing_node({"code": "x = 1"})
+
+    def test_rejects_local_functions(self):
+        with pytest.raises(ValueError, match="module level"):
+            @run_in_process()
+            def node(state):
+                return state
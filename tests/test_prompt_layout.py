@@ -0,0 +1,41 @@
+"""
+shared.prompts.layout 单元测试
+"""
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from shared.prompts import (
+    CRITIC_PROMPT,
+    CachedPrompt,
+    measure_cached_prompt,
+    measure_prefix,
+)
+
+INSTRUCTIONS = "Review the code carefully. " * 40
+
+
+class TestPrefixMeasurement:
+    """测试可缓存前缀检查"""
+
+    def test_static_system_prefix(self):
+        prompt = CachedPrompt(system=INSTRUCTIONS, human="Code:\n{code}")
+        assert prompt.variables == ["code"]
+
+        report = measure_cached_prompt("good", prompt)
+        assert report.prefix_tokens >= report.static_tokens - 2
+        assert report.well_ordered
+
+    def test_variable_in_middle_is_flagged(self):
+        def render(value):
+            return [HumanMessage(content=f"Code:\n{value}\n\n{INSTRUCTIONS}")]
+
+        report = measure_prefix("bad", render)
+        assert report.prefix_tokens < 5
+        assert not report.well_ordered
+
+    def test_shared_critic_prompt_layout(self):
+        messages = CRITIC_PROMPT.messages(task="t", language="python", code="x = 1")
+        assert isinstance(messages[0], SystemMessage)
+        assert "Security rules" in messages[0].content
+        assert messages[1].content.endswith("x = 1\n```")
+        assert measure_cached_prompt("critic", CRITIC_PROMPT).well_ordered
@@ -0,0 +1,46 @@
+"""
+shared.prompts.registry 单元测试
+"""
+
+import pytest
+
+from shared.prompts import CachedPrompt, PromptRegistry, prompt_registry, render_rules
+
+
+class TestPromptRegistry:
+    """测试模板注册与校验"""
+
+    def test_register_with_partials(self):
+        registry = PromptRegistry()
+        template = registry.register(
+            "review",
+            [("system", "Rules:\n{criteria}"), ("human", "{code}")],
+            variables={"code"},
+            partials={"criteria": render_rules(["a", "b"])},
+        )
+        messages = template.invoke({"code": "x = 1"}).messages
+        assert messages[0].content == "Rules:\n- a\n- b"
+        assert registry.get("review") is template
+        assert registry.token_counts()["review"] > 0
+
+    def test_variable_mismatch_raises(self):
+        registry = PromptRegistry()
+        with pytest.raises(ValueError):
+            registry.register("bad", [("human", "{cod}")], variables={"code"})
+        with pytest.raises(ValueError):
+            registry.register("bad", [("human", "{code}")], partials={"rules": "x"})
+
+    def test_cached_prompt_system_is_verbatim(self):
+        registry = PromptRegistry()
+        template = registry.register_cached(
+            "cached", CachedPrompt(system='Return {"score": 1}', human="{code}")
+        )
+        assert template.invoke({"code": "x"}).messages[0].content == 'Return {"score": 1}'
+
+    def test_render_rules_is_cached(self):
+        rules = ["x", "y"]
+        assert render_rules(rules) is render_rules(list(rules))
+
+    def test_builtin_prompts_registered(self):
+        assert "critic" in prompt_registry
+        assert "coder" in prompt_registry
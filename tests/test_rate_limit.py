@@ -0,0 +1,182 @@
+"""
+shared.rate_limit 单元测试
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from shared.rate_limit import (
+    AcquireCancelled,
+    RateLimitCallbackHandler,
+    RateLimiter,
+    TokenBucket,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    """测试令牌桶"""
+
+    def test_refill_and_debt(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, capacity=10, clock=clock)
+        bucket.take(10)
+        assert bucket.wait_time(5) == pytest.approx(0.5)
+
+        clock.now = 0.5
+        assert bucket.wait_time(5) == 0
+
+        # 实际用量超出预估：余额为负，需要更久才能放行
+        bucket.give(-10)
+        assert bucket.wait_time(5) == pytest.approx(1.0)
+
+    def test_oversized_request_waits_for_full_bucket(self):
+        bucket = TokenBucket(rate=1, capacity=5, clock=FakeClock())
+        assert bucket.wait_time(100) == 0
+
+
+class TestRateLimiter:
+    """测试部署级限流"""
+
+    def test_requests_per_minute(self):
+        # 600 RPM、0.1 秒突发窗口：每 0.1 秒放行一个
+        limiter = RateLimiter(requests_per_minute=600, burst_seconds=0.1)
+        start = time.monotonic()
+        for _ in range(4):
+            limiter.acquire()
+        assert time.monotonic() - start >= 0.25
+        assert limiter.stats.requests == 4
+        assert limiter.stats.waited >= 2
+
+    def test_fifo_order(self):
+        limiter = RateLimiter(requests_per_minute=600, burst_seconds=0.1)
+        limiter.acquire()
+        order = []
+
+        def worker(i):
+            limiter.acquire()
+            order.append(i)
+
+        threads = []
+        for i in range(4):
+            t = threading.Thread(target=worker, args=(i,))
+            t.start()
+            threads.append(t)
+            time.sleep(0.01)
+        for t in threads:
+            t.join()
+        assert order == [0, 1, 2, 3]
+
+    def test_reconcile_refunds_unused_tokens(self):
+        limiter = RateLimiter(tokens_per_minute=600, burst_seconds=1, clock=FakeClock())
+        limiter.acquire(10)
+        assert limiter.tokens.available == 0
+        limiter.reconcile(estimated=10, actual=4)
+        assert limiter.tokens.available == 6
+        assert limiter.stats.actual_tokens == 4
+
+    def test_missing_usage_keeps_estimate_and_errors_refund(self):
+        limiter = RateLimiter(tokens_per_minute=600, burst_seconds=1, clock=FakeClock())
+        limiter.acquire(10)
+        limiter.reconcile(estimated=10, actual=None)
+        assert limiter.tokens.available == 0
+        limiter.refund(10)
+        assert limiter.tokens.available == 10
+
+    def test_cancel_leaves_queue(self):
+        limiter = RateLimiter(requests_per_minute=1)
+        limiter.acquire()
+        cancel = threading.Event()
+        errors = []
+
+        def waiter():
+            try:
+                limiter.acquire(cancel=cancel)
+            except AcquireCancelled as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(0.05)
+        cancel.set()
+        limiter.wake()
+        thread.join(timeout=1)
+        assert not thread.is_alive()
+        assert len(errors) == 1
+        assert limiter.stats.requests == 1
+
+    def test_release_returns_request_and_tokens(self):
+        limiter = RateLimiter(requests_per_minute=6, tokens_per_minute=60, clock=FakeClock())
+        limiter.acquire(10)
+        limiter.release(10)
+        assert limiter.requests.available == 1
+        assert limiter.tokens.available == 10
+
+    def test_backoff_pauses_deployment(self):
+        limiter = RateLimiter(requests_per_minute=6000)
+        limiter.backoff(0.1)
+        assert limiter.acquire() >= 0.09
+        assert limiter.stats.throttled == 1
+
+
+class TestCallbackHandler:
+    """测试 LangChain 回调接入"""
+
+    def test_counts_model_calls(self):
+        limiter = RateLimiter(requests_per_minute=6000, tokens_per_minute=600000)
+        llm = FakeListChatModel(
+            responses=["ok", "ok"], callbacks=[RateLimitCallbackHandler(limiter)]
+        )
+        llm.invoke("hello")
+        llm.invoke("hello again")
+        assert limiter.stats.requests == 2
+        assert limiter.stats.estimated_tokens > 0
+
+    def test_success_without_usage_is_charged(self):
+        limiter = RateLimiter(tokens_per_minute=600000, clock=FakeClock())
+        llm = FakeListChatModel(responses=["ok"], callbacks=[RateLimitCallbackHandler(limiter)])
+        full = limiter.tokens.available
+        llm.invoke("hello")
+        # FakeListChatModel 不返回用量：预扣的估算值不退还
+        assert limiter.tokens.available == full - limiter.stats.estimated_tokens
+
+    def test_cancelled_while_queued_refunds(self):
+        limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=600000)
+        handler = RateLimitCallbackHandler(limiter)
+        llm = FakeListChatModel(responses=["ok"], callbacks=[handler])
+        limiter.acquire(100)
+        tokens = limiter.tokens.available
+
+        async def call():
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(llm.ainvoke("hello"), timeout=0.05)
+
+        asyncio.run(call())
+        deadline = time.monotonic() + 1
+        while limiter._queue and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        # 排队中被取消：已出队，没有遗留的预扣记录，也没有多扣 token
+        assert not limiter._queue
+        assert handler._estimates == {}
+        assert limiter.stats.requests == 1
+        assert limiter.tokens.available >= tokens
+
+    def test_async_call_is_counted(self):
+        limiter = RateLimiter(requests_per_minute=6000, tokens_per_minute=600000)
+        handler = RateLimitCallbackHandler(limiter)
+        llm = FakeListChatModel(responses=["ok"], callbacks=[handler])
+        assert asyncio.run(llm.ainvoke("hello")).content == "ok"
+        assert limiter.stats.requests == 1
+        assert handler._estimates == {}
@@ -0,0 +1,124 @@
+"""
+shared.reducers 单元测试
+"""
+
+from collections import deque
+from typing import Annotated, Sequence, TypedDict
+
+import pytest
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, StateGraph
+
+from shared.reducers import (
+    as_list,
+    bounded_append,
+    dedupe_append,
+    is_summary,
+    keyed_merge,
+    windowed_summary,
+)
+
+
+class TestBoundedAppend:
+    """测试环形缓冲 reducer"""
+
+    def test_keeps_last_entries(self):
+        reducer = bounded_append(3)
+        value = reducer([], [1, 2])
+        value = reducer(value, [3, 4])
+        assert as_list(value) == [2, 3, 4]
+
+    def test_does_not_mutate_existing(self):
+        """channel 副本共享值对象，reducer 必须返回新对象"""
+        reducer = bounded_append(3)
+        first = reducer([], [1])
+        second = reducer(first, [2])
+        assert second is not first
+        assert as_list(first) == [1]
+
+    def test_unchanged_state_is_not_duplicated(self):
+        """节点整体返回未修改的 state 时 new 就是 existing"""
+        reducer = bounded_append(3)
+        value = reducer([], [1, 2])
+        assert reducer(value, value) is value
+        assert as_list(value) == [1, 2]
+
+    def test_rebounds_restored_deque(self):
+        """checkpoint 恢复出的 deque 没有 maxlen"""
+        reducer = bounded_append(2)
+        assert reducer(deque([1, 2, 3]), [4]).maxlen == 2
+
+    def test_invalid_limit(self):
+        with pytest.raises(ValueError):
+            bounded_append(0)
+
+
+class TestOtherReducers:
+    """测试去重、按键合并与窗口摘要"""
+
+    def test_dedupe_append(self):
+        reducer = dedupe_append(key=lambda item: item["id"], limit=2)
+        value = reducer([], [{"id": 1}, {"id": 1}, {"id": 2}])
+        assert [item["id"] for item in value] == [1, 2]
+        # 1 被挤出窗口后可以再次加入
+        value = reducer(value, [{"id": 3}, {"id": 1}])
+        assert [item["id"] for item in value] == [3, 1]
+
+    def test_keyed_merge(self):
+        reducer = keyed_merge("id")
+        value = reducer({}, [{"id": "a", "v": 1}, {"id": "b", "v": 1}])
+        value = reducer(value, [{"id": "a", "v": 2}])
+        assert value == {"a": {"id": "a", "v": 2}, "b": {"id": "b", "v": 1}}
+
+    def test_windowed_summary(self):
+        reducer = windowed_summary(2)
+        value = reducer([], ["a", "b", "c"])
+        value = reducer(value, ["d"])
+        items = as_list(value)
+        assert is_summary(items[0])
+        assert items[0]["__summary__"] == "2 earlier entries summarized"
+        assert items[1:] == ["c", "d"]
+
+
+class HistoryState(TypedDict):
+    history: Annotated[Sequence[int], bounded_append(3)]
+    step: int
+
+
+def test_bounded_history_survives_checkpoint():
+    """在图中使用并经过 checkpointer 序列化；节点只返回新增的条目"""
+    def step(state: HistoryState) -> dict:
+        return {"history": [state["step"]], "step": state["step"] + 1}
+
+    workflow = StateGraph(HistoryState)
+    workflow.add_node("step", step)
+    workflow.set_entry_point("step")
+    workflow.add_conditional_edges("step", lambda s: END if s["step"] >= 5 else "step")
+    app = workflow.compile(checkpointer=InMemorySaver())
+
+    config = {"configurable": {"thread_id": "t1"}}
+    result = app.invoke({"history": [], "step": 0}, config)
+    assert as_list(result["history"]) == [2, 3, 4]
+
+    restored = app.get_state(config).values["history"]
+    assert as_list(restored) == [2, 3, 4]
+
+
+def test_node_sees_unchanged_history_objects():
+    """节点只返回新增条目时，之前步骤看到的 history 对象不会被后续写入改动"""
+    seen = []
+
+    def step(state: HistoryState) -> dict:
+        seen.append((state["history"], as_list(state["history"])))
+        return {"history": [state["step"]], "step": state["step"] + 1}
+
+    workflow = StateGraph(HistoryState)
+    workflow.add_node("step", step)
+    workflow.set_entry_point("step")
+    workflow.add_conditional_edges("step", lambda s: END if s["step"] >= 5 else "step")
+    workflow.compile(checkpointer=InMemorySaver()).invoke(
+        {"history": [], "step": 0}, {"configurable": {"thread_id": "t2"}}
+    )
+
+    assert [snapshot for _, snapshot in seen] == [[], [0], [0, 1], [0, 1, 2], [1, 2, 3]]
+    assert all(as_list(value) == snapshot for value, snapshot in seen)
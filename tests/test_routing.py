@@ -0,0 +1,150 @@
+"""
+shared.routing 单元测试
+"""
+
+import asyncio
+import time
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from shared.routing import HedgedLLM, is_retryable_error
+
+
+class APIError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def sleeper(seconds, value):
+    def call(_):
+        time.sleep(seconds)
+        return value
+    return RunnableLambda(call)
+
+
+def failing(status_code):
+    def call(_):
+        raise APIError(status_code)
+    return RunnableLambda(call)
+
+
+class TestRetryableErrors:
+    """测试错误分类"""
+
+    def test_classification(self):
+        assert is_retryable_error(APIError(429))
+        assert is_retryable_error(APIError(503))
+        assert not is_retryable_error(APIError(400))
+        assert is_retryable_error(TimeoutError())
+        assert not is_retryable_error(ValueError())
+
+
+class TestHedgedLLM:
+    """测试对冲与故障转移"""
+
+    def test_fast_primary_no_hedge(self):
+        llm = HedgedLLM([sleeper(0, "primary"), sleeper(0, "secondary")], names=["a", "b"])
+        assert llm.invoke("q") == "primary"
+        assert llm.hedges == 0
+
+    def test_slow_primary_is_hedged(self):
+        llm = HedgedLLM(
+            [sleeper(1.0, "primary"), sleeper(0, "secondary")],
+            names=["a", "b"], default_delay=0.1, min_delay=0.1,
+        )
+        start = time.monotonic()
+        assert llm.invoke("q") == "secondary"
+        assert time.monotonic() - start < 0.5
+        assert llm.hedges == 1
+        assert llm.stats["b"].wins == 1
+
+    def test_failover_on_429(self):
+        llm = HedgedLLM([failing(429), sleeper(0, "secondary")], names=["a", "b"])
+        assert llm.invoke("q") == "secondary"
+        assert llm.failovers == 1
+        assert llm.stats["a"].errors == 1
+
+    def test_non_retryable_error_raises(self):
+        llm = HedgedLLM([failing(400), sleeper(0, "secondary")], names=["a", "b"])
+        with pytest.raises(APIError):
+            llm.invoke("q")
+
+    def test_all_failed_raises_last_error(self):
+        llm = HedgedLLM([failing(500), failing(429)], names=["a", "b"])
+        with pytest.raises(APIError) as info:
+            llm.invoke("q")
+        assert info.value.status_code == 429
+
+    def test_hedge_delay_tracks_p95(self):
+        llm = HedgedLLM([sleeper(0, "x")], names=["a"], min_delay=0)
+        llm.stats["a"].latencies.extend([0.1] * 19 + [2.0])
+        assert llm.hedge_delay() == pytest.approx(0.1)
+        llm.stats["a"].latencies.extend([2.0] * 5)
+        assert llm.hedge_delay() == pytest.approx(2.0)
+
+    def test_async_cancels_loser(self):
+        cancelled = []
+
+        async def slow(_):
+            try:
+                await asyncio.sleep(1.0)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return "primary"
+
+        async def fast(_):
+            return "secondary"
+
+        llm = HedgedLLM(
+            [RunnableLambda(slow), RunnableLambda(fast)],
+            names=["a", "b"], default_delay=0.05, min_delay=0.05,
+        )
+        assert asyncio.run(llm.ainvoke("q")) == "secondary"
+        assert cancelled == [True]
+        # 落败的请求记录截尾样本，p95 不会只剩胜出的快请求
+        assert llm.stats["a"].calls == 1
+        assert llm.stats["a"].latencies[0] >= 0.05
+
+    def test_sync_records_abandoned_loser_once(self):
+        llm = HedgedLLM(
+            [sleeper(0.3, "primary"), sleeper(0, "secondary")],
+            names=["a", "b"], default_delay=0.05, min_delay=0.05,
+        )
+        assert llm.invoke("q") == "secondary"
+        assert len(llm.stats["a"].latencies) == 1
+        assert 0.05 <= llm.stats["a"].latencies[0] < 0.3
+
+        # 被丢弃的请求稍后完成时不再重复记录
+        time.sleep(0.4)
+        assert llm.stats["a"].calls == 1
+        assert len(llm.stats["a"].latencies) == 1
+
+    def test_non_retryable_error_waits_for_pending_request(self):
+        llm = HedgedLLM(
+            [sleeper(0.2, "primary"), failing(400)],
+            names=["a", "b"], default_delay=0.05, min_delay=0.05,
+        )
+        assert llm.invoke("q") == "primary"
+        assert llm.stats["b"].errors == 1
+        assert llm.failovers == 0
+
+    def test_async_non_retryable_error_raised_after_pending_request(self):
+        async def slow_failure(_):
+            await asyncio.sleep(0.2)
+            raise APIError(503)
+
+        async def bad_request(_):
+            raise APIError(400)
+
+        llm = HedgedLLM(
+            [RunnableLambda(slow_failure), RunnableLambda(bad_request)],
+            names=["a", "b"], default_delay=0.05, min_delay=0.05,
+        )
+        with pytest.raises(APIError) as info:
+            asyncio.run(llm.ainvoke("q"))
+        assert info.value.status_code == 400
+        # 主请求没有被取消，而是跑完并记为错误
+        assert llm.stats["a"].errors == 1
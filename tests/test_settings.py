@@ -0,0 +1,156 @@
+"""
+shared.settings 单元测试
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from pydantic import ValidationError
+
+from shared import settings as settings_module
+from shared.config import Config, config
+from shared.settings import (
+    MultiCriticSettings,
+    Settings,
+    apply_graph_settings,
+    get_settings,
+    on_settings_reload,
+    reload_settings,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def settings_file(tmp_path, monkeypatch):
+    """写入临时配置文件并切换过去，测试后恢复"""
+    original = settings_module._settings_path
+    monkeypatch.setattr(settings_module, "RELOAD_CHECK_INTERVAL", 0.0)
+    path = tmp_path / "settings.toml"
+    writes = 0
+
+    def write(text: str):
+        nonlocal writes
+        path.write_text(text)
+        # 保证 mtime 变化（部分文件系统精度为秒）
+        writes += 1
+        os.utime(path, (os.stat(path).st_atime, os.stat(path).st_mtime + writes))
+        return str(path)
+
+    yield write
+    reload_settings(path=original)
+
+
+class TestSources:
+    """测试取值来源与优先级"""
+
+    def test_defaults(self, monkeypatch):
+        monkeypatch.delenv("MAX_ITERATIONS", raising=False)
+        settings = Settings()
+        assert settings.multi_critic.max_iterations == 3
+        assert settings.runtime.hedge_percentile == 0.95
+
+    def test_legacy_env_maps_to_sections(self, monkeypatch):
+        monkeypatch.setenv("MAX_ITERATIONS", "6")
+        monkeypatch.setenv("LLM_FALLBACK_PROVIDERS", "anthropic, openai")
+        settings = Settings()
+        assert settings.multi_critic.max_iterations == 6
+        assert settings.critic_agent.max_iterations == 6
+        assert settings.llm.fallback_providers == ["anthropic", "openai"]
+
+    def test_nested_env_beats_legacy(self, monkeypatch):
+        monkeypatch.setenv("MAX_ITERATIONS", "6")
+        monkeypatch.setenv("MULTI_CRITIC__MAX_ITERATIONS", "2")
+        settings = Settings()
+        assert settings.multi_critic.max_iterations == 2
+        assert settings.critic_agent.max_iterations == 6
+
+    def test_validation(self):
+        with pytest.raises(ValidationError):
+            Settings(multi_critic={"max_iterations": 0})
+        with pytest.raises(ValidationError):
+            Settings(runtime={"unknown_knob": 1})
+
+
+class TestReload:
+    """测试热加载"""
+
+    def test_file_change_is_picked_up(self, settings_file):
+        reload_settings(path=settings_file("[multi_critic]\nmax_iterations = 4\n"))
+        assert get_settings().multi_critic.max_iterations == 4
+
+        settings_file("[multi_critic]\nmax_iterations = 5\n")
+        assert get_settings().multi_critic.max_iterations == 5
+
+    def test_invalid_file_keeps_previous(self, settings_file):
+        reload_settings(path=settings_file("[multi_critic]\npass_threshold = 8.0\n"))
+        settings_file("[multi_critic]\npass_threshold = 42\n")
+        assert get_settings().multi_critic.pass_threshold == 8.0
+
+    def test_json_file_and_listener(self, tmp_path, settings_file):
+        seen = []
+        on_settings_reload(seen.append)
+        try:
+            path = tmp_path / "settings.json"
+            path.write_text(json.dumps({"runtime": {"process_pool_workers": 2}}))
+            reload_settings(path=str(path))
+            assert get_settings().runtime.process_pool_workers == 2
+            assert seen[-1] is get_settings()
+        finally:
+            settings_module._listeners.remove(seen.append)
+
+
+class TestCompat:
+    """测试 Config 兼容层"""
+
+    def test_legacy_keys_read_environment(self, monkeypatch):
+        monkeypatch.setenv("OPENAI_MODEL", "gpt-4o-mini")
+        monkeypatch.delenv("MAX_ITERATIONS", raising=False)
+        assert Config.OPENAI_MODEL == "gpt-4o-mini"
+        assert config.get_llm_config()["model"] == "gpt-4o-mini"
+        assert config.MAX_ITERATIONS == 5
+        with pytest.raises(AttributeError):
+            config.NOT_A_SETTING
+
+    def test_timeout_keeps_request_meaning(self, monkeypatch):
+        monkeypatch.setenv("TIMEOUT_SECONDS", "30")
+        assert config.TIMEOUT_SECONDS == 30
+        assert Settings().multi_critic.step_timeout_seconds == 300.0
+
+    def test_new_keys_read_settings(self, override_settings):
+        override_settings(observability={"trace_exporter": "file"})
+        assert config.TRACE_EXPORTER == "file"
+
+    def test_legacy_keys_skip_settings_import(self):
+        code = (
+            "import sys; from shared.config import Config; Config.OPENAI_MODEL; "
+            "print('pydantic_settings' in sys.modules)"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        assert result.stdout.strip() == "False"
+
+
+def test_apply_graph_settings():
+    from typing import TypedDict
+
+    from langgraph.graph import END, StateGraph
+
+    class State(TypedDict):
+        value: int
+
+    graph = StateGraph(State)
+    graph.add_node("inc", lambda state: {"value": state["value"] + 1})
+    graph.set_entry_point("inc")
+    graph.add_edge("inc", END)
+
+    app = apply_graph_settings(
+        graph.compile(), MultiCriticSettings(max_concurrency=2, step_timeout_seconds=5)
+    )
+    assert app.config["max_concurrency"] == 2
+    assert app.step_timeout == 5
+    assert app.invoke({"value": 0}) == {"value": 1}
@@ -0,0 +1,169 @@
+"""
+shared.singleflight 单元测试
+"""
+
+import asyncio
+import threading
+import time
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+
+from shared.singleflight import CoalescingLLM, SingleFlight
+
+
+class TestSingleFlight:
+    """测试按 key 合并"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        group = SingleFlight()
+        executions = []
+        barrier = threading.Barrier(5)
+        results = []
+
+        def work():
+            executions.append(1)
+            time.sleep(0.2)
+            return "result"
+
+        def caller():
+            barrier.wait()
+            results.append(group.do("key", work))
+
+        threads = [threading.Thread(target=caller) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(executions) == 1
+        assert [r for r, _ in results] == ["result"] * 5
+        assert sorted(shared for _, shared in results) == [False] + [True] * 4
+        assert group.stats.coalesced == 4
+
+    def test_sequential_calls_are_not_cached(self):
+        group = SingleFlight()
+        counter = iter(range(10))
+        assert group.do("key", lambda: next(counter)) == (0, False)
+        assert group.do("key", lambda: next(counter)) == (1, False)
+
+    def test_error_reaches_all_waiters(self):
+        group = SingleFlight()
+
+        def fail():
+            time.sleep(0.1)
+            raise RuntimeError("boom")
+
+        errors = []
+
+        def caller():
+            try:
+                group.do("key", fail)
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=caller) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(errors) == 3
+
+    def test_async_coalescing(self):
+        group = SingleFlight()
+        executions = []
+
+        async def work():
+            executions.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def main():
+            return await asyncio.gather(*(group.ado("key", work) for _ in range(4)))
+
+        results = asyncio.run(main())
+        assert len(executions) == 1
+        assert [r for r, _ in results] == ["result"] * 4
+
+    def test_cancelled_leader_does_not_cancel_waiters(self):
+        group = SingleFlight()
+        executions = []
+
+        async def work():
+            executions.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def main():
+            leader = asyncio.ensure_future(group.ado("key", work))
+            await asyncio.sleep(0)
+            waiters = [asyncio.ensure_future(group.ado("key", work)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            results = await asyncio.gather(*waiters)
+            return leader, results
+
+        leader, results = asyncio.run(main())
+        assert leader.cancelled()
+        assert results == [("result", True)] * 2
+        assert len(executions) == 1
+
+    def test_execution_cancelled_when_all_callers_cancel(self):
+        group = SingleFlight()
+        cancelled = []
+
+        async def work():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        async def main():
+            callers = [asyncio.ensure_future(group.ado("key", work)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            for caller in callers:
+                caller.cancel()
+            await asyncio.gather(*callers, return_exceptions=True)
+            await asyncio.sleep(0)
+
+        asyncio.run(main())
+        assert cancelled == [1]
+        assert group._async_calls == {}
+
+
+class TestCoalescingLLM:
+    """测试模型调用合并"""
+
+    def test_identical_prompts_share_call(self):
+        calls = []
+
+        def slow(prompt):
+            calls.append(prompt)
+            time.sleep(0.2)
+            return {"answer": prompt}
+
+        llm = CoalescingLLM(RunnableLambda(slow))
+        results = []
+        threads = [
+            threading.Thread(target=lambda p=p: results.append(llm.invoke(p)))
+            for p in ["same", "same", "same", "other"]
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert sorted(calls) == ["other", "same"]
+        assert len(results) == 4
+        # 等待者拿到的是副本
+        same = [r for r in results if r["answer"] == "same"]
+        assert len({id(r) for r in same}) == 3
+
+    def test_chat_model_identity(self):
+        a = CoalescingLLM(FakeListChatModel(responses=["x"]))
+        b = CoalescingLLM(FakeListChatModel(responses=["x"]))
+        c = CoalescingLLM(FakeListChatModel(responses=["y"]))
+        assert a._key("hi", {}) == b._key("hi", {})
+        assert a._key("hi", {}) != c._key("hi", {})
+        assert a.invoke("hi").content == "x"
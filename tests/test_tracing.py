@@ -0,0 +1,111 @@
+"""
+shared.tracing 单元测试
+"""
+
+import operator
+import time
+from typing import Annotated, TypedDict
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langgraph.graph import END
+
+from shared import tracing
+from shared.tracing import (
+    TracedStateGraph,
+    TracingCallbackHandler,
+    critical_path,
+    trace_run,
+)
+
+pytest.importorskip("opentelemetry.sdk.trace")
+from opentelemetry import trace
+from opentelemetry.sdk import trace as sdk_trace
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+EXPORTER = InMemorySpanExporter()
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    if not isinstance(trace.get_tracer_provider(), sdk_trace.TracerProvider):
+        provider = sdk_trace.TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(EXPORTER))
+        trace.set_tracer_provider(provider)
+    monkeypatch.setattr(tracing, "_enabled", True)
+    EXPORTER.clear()
+    yield EXPORTER
+    EXPORTER.clear()
+
+
+class State(TypedDict):
+    iteration: int
+    log: Annotated[list, operator.add]
+
+
+def build_graph(llm):
+    def writer(state: State) -> dict:
+        return {"iteration": state["iteration"] + 1}
+
+    def fast_critic(state: State) -> dict:
+        llm.invoke("review")
+        return {"log": ["fast"]}
+
+    def slow_critic(state: State) -> dict:
+        time.sleep(0.05)
+        return {"log": ["slow"]}
+
+    graph = TracedStateGraph(State)
+    graph.add_node("writer", writer)
+    graph.add_node(fast_critic)
+    graph.add_node("slow_critic", slow_critic)
+    graph.add_node("aggregator", lambda state: {})
+    graph.set_entry_point("writer")
+    graph.add_edge("writer", "fast_critic")
+    graph.add_edge("writer", "slow_critic")
+    graph.add_edge(["fast_critic", "slow_critic"], "aggregator")
+    graph.add_edge("aggregator", END)
+    return graph.compile()
+
+
+class TestTracing:
+    """测试节点与 LLM span"""
+
+    def test_node_and_llm_spans(self, spans):
+        llm = FakeListChatModel(responses=["ok"], callbacks=[TracingCallbackHandler()])
+        app = build_graph(llm)
+        with trace_run("test"):
+            app.invoke({"iteration": 0, "log": []})
+
+        finished = {span.name: span for span in spans.get_finished_spans()}
+        assert {"run:test", "node:writer", "node:fast_critic", "node:slow_critic", "node:aggregator"} <= set(finished)
+        assert len({span.context.trace_id for span in finished.values()}) == 1
+
+        writer = finished["node:writer"]
+        assert writer.attributes["iteration"] == 0
+        assert writer.attributes["state.size"] > 0
+
+        llm_span = next(span for name, span in finished.items() if name.startswith("llm:"))
+        assert llm_span.parent.span_id == finished["node:fast_critic"].context.span_id
+
+    def test_disabled_tracing_is_passthrough(self, monkeypatch):
+        monkeypatch.setattr(tracing, "_enabled", False)
+        EXPORTER.clear()
+        app = build_graph(FakeListChatModel(responses=["ok"]))
+        assert app.invoke({"iteration": 0, "log": []})["iteration"] == 1
+        assert EXPORTER.get_finished_spans() == ()
+
+
+class TestCriticalPath:
+    """测试关键路径"""
+
+    def test_slowest_parallel_branch(self):
+        spans = [
+            {"name": "node:writer", "start": 0.0, "end": 1.0},
+            {"name": "node:fast", "start": 1.0, "end": 1.5},
+            {"name": "node:slow", "start": 1.0, "end": 3.0},
+            {"name": "llm:gpt-4o", "start": 1.1, "end": 2.9},
+            {"name": "node:aggregator", "start": 3.0, "end": 3.1},
+        ]
+        assert [s["name"] for s in critical_path(spans)] == ["node:writer", "node:slow", "node:aggregator"]
@@ -0,0 +1,87 @@
+"""
+shared.usage 单元测试
+"""
+
+from typing import TypedDict
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langgraph.graph import END, StateGraph
+
+from shared.usage import UsageCallbackHandler, estimate_cost, track_usage, usage_scope
+
+
+def reply(input_tokens: int, output_tokens: int) -> AIMessage:
+    return AIMessage(
+        content="ok",
+        usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        },
+        response_metadata={"model_name": "gpt-4o-2024-08-06"},
+    )
+
+
+class State(TypedDict):
+    iteration: int
+
+
+def build_graph(llm):
+    def writer(state: State) -> dict:
+        with usage_scope(iteration=state["iteration"]):
+            llm.invoke("write")
+        return {"iteration": state["iteration"] + 1}
+
+    def critic(state: State) -> dict:
+        llm.invoke("review")
+        return {}
+
+    graph = StateGraph(State)
+    graph.add_node("writer", writer)
+    graph.add_node("critic", critic)
+    graph.set_entry_point("writer")
+    graph.add_edge("writer", "critic")
+    graph.add_edge("critic", END)
+    return graph.compile()
+
+
+class TestUsageLedger:
+    """测试用量记账"""
+
+    def test_records_per_node(self):
+        handler = UsageCallbackHandler()
+        llm = GenericFakeChatModel(
+            messages=iter([reply(1000, 200), reply(3000, 100)]), callbacks=[handler]
+        )
+        app = build_graph(llm)
+
+        with track_usage("test") as ledger:
+            app.invoke({"iteration": 1})
+
+        by_node = ledger.summary("node")
+        assert by_node["writer"].prompt_tokens == 1000
+        assert by_node["critic"].prompt_tokens == 3000
+        assert ledger.summary("iteration")[1].calls == 1
+        assert ledger.total().cost_usd == pytest.approx(estimate_cost("gpt-4o", 4000, 300))
+        assert "node=critic" in ledger.format_summary().splitlines()[1]
+
+    def test_not_recorded_outside_scope(self):
+        handler = UsageCallbackHandler()
+        llm = GenericFakeChatModel(messages=iter([reply(10, 1), reply(10, 1)]), callbacks=[handler])
+        llm.invoke("hello")
+        with track_usage() as ledger:
+            llm.invoke("hello")
+        assert ledger.total().calls == 1
+
+    def test_duplicate_handlers_count_once(self):
+        handler = UsageCallbackHandler()
+        llm = GenericFakeChatModel(messages=iter([reply(10, 1)]), callbacks=[handler])
+        with track_usage() as ledger:
+            llm.invoke("hello", config={"callbacks": [UsageCallbackHandler()]})
+        assert ledger.total().calls == 1
+
+    def test_cost_table(self):
+        assert estimate_cost("gpt-4o-mini-2024-07-18", 1_000_000, 0) == pytest.approx(0.15)
+        assert estimate_cost("my-deployment", 100, 100) is None